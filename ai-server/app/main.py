@@ -1,6 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.routers.tag import router as tag_router
+from app.utils.metrics import REGISTRY
+from mindlog_common.log import configure_logging
+from mindlog_common.profiling import PROFILE_HEADER, finish_session, route_key, should_profile, start_session
+from mindlog_common.tracing import SPAN_KIND_SERVER, current_span, set_service_name, span
+
+# ✅ 로그 설정 (LOG_LEVEL / LOG_FORMAT 환경변수) + trace의 서비스 이름
+configure_logging()
+set_service_name("mindlog-ai-server")
 
 # ✅ FastAPI 앱 생성
 app = FastAPI(title="MindLog AI Server", description="Handles AI-based tagging")
@@ -14,6 +23,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ✅ 요청 단위 샘플링 프로파일링 (PROFILE_TOKEN 헤더 또는 PROFILE_SAMPLE_RATE로 선택, route별로 저장)
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if request.url.path == "/metrics" or not should_profile(request.headers.get(PROFILE_HEADER)):
+        return await call_next(request)
+    profiler = start_session()
+    if profiler is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        route = request.scope.get("route")
+        request_span = current_span()
+        finish_session(profiler, route_key(request.method, getattr(route, "path", request.url.path)),
+                       request_span.trace_id if request_span else "")
+    return response
+
+# ✅ 요청 단위 trace (백엔드가 보낸 traceparent를 이어받아 서버 span 생성, 응답에 trace id 포함)
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    with span(f"{request.method} {request.url.path}", kind=SPAN_KIND_SERVER,
+              traceparent=request.headers.get("traceparent"),
+              **{"http.method": request.method, "http.target": request.url.path}) as request_span:
+        response = await call_next(request)
+        request_span.set(**{"http.status_code": response.status_code})
+        response.headers["X-Trace-Id"] = request_span.trace_id
+        return response
+
 # ✅ 라우터 등록
 app.include_router(tag_router, prefix="/ai")
 
@@ -21,3 +60,8 @@ app.include_router(tag_router, prefix="/ai")
 @app.get("/")
 def root():
     return {"message": "AI Server is running"}
+
+# ✅ Prometheus 메트릭 (단계별 지연 시간 / 배치 크기 / 캐시 / 대기열)
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,12 +1,26 @@
+import os
 import requests
 import exifread
 import time
-from typing import Dict
+from typing import Dict, Optional
 from io import BytesIO
+from app.utils.tracing import stage
+from mindlog_common.log import get_logger
+
+logger = get_logger(__name__)
+
+# ✅ 역지오코딩 API (로컬 Nominatim / 벤치마크 스텁으로 교체 가능)
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+
+# ✅ 역지오코딩 요청 전 대기 시간 (초, 공개 Nominatim 사용 정책: 초당 1회)
+NOMINATIM_INTERVAL = float(os.getenv("NOMINATIM_INTERVAL", "1"))
 
 class LocationTagger:
-    def __init__(self, user_agent="Mozilla/5.0"):
+    def __init__(self, user_agent="Mozilla/5.0", nominatim_url: str = NOMINATIM_URL,
+                 nominatim_interval: float = NOMINATIM_INTERVAL):
         self.headers = {"User-Agent": user_agent}
+        self.nominatim_url = nominatim_url
+        self.nominatim_interval = nominatim_interval
 
     def convert_to_decimal(self, gps_value):
         """ 🔹 GPS 좌표를 소수점 형식으로 변환 """
@@ -17,8 +31,17 @@ class LocationTagger:
         try:
             response = requests.get(image_url, headers=self.headers, timeout=5)
             response.raise_for_status()
-            image_bytes = BytesIO(response.content)  # 🔹 URL에서 이미지 바이트로 변환
-            tags = exifread.process_file(image_bytes)  # 🔹 EXIF 데이터 처리
+            return self.get_gps_from_bytes(response.content, image_url)  # 🔹 URL에서 이미지 바이트로 변환
+        except requests.exceptions.RequestException as e:
+            logger.warning("⚠️ %s → 이미지 요청 실패: %s", image_url, e)
+
+        return None, None
+
+    def get_gps_from_bytes(self, image_data: bytes, image_url: str = ""):
+        """ 🔹 이미 받아둔 이미지 바이트의 EXIF에서 GPS 정보를 추출 """
+        try:
+            with stage("exif"):
+                tags = exifread.process_file(BytesIO(image_data), details=False)  # 🔹 EXIF 데이터 처리
 
             if 'GPS GPSLatitude' in tags and 'GPS GPSLongitude' in tags:
                 lat_values = tags['GPS GPSLatitude'].values
@@ -32,39 +55,38 @@ class LocationTagger:
                 if lat_ref != 'N': lat = -lat
                 if lon_ref != 'E': lon = -lon
 
-                print(f"✅ {image_url} → GPS 좌표: ({lat}, {lon})")
+                logger.debug("✅ %s → GPS 좌표: (%s, %s)", image_url, lat, lon)
                 return lat, lon
-        except requests.exceptions.RequestException as e:
-            print(f"⚠️ {image_url} → 이미지 요청 실패: {e}")
         except Exception as e:
-            print(f"⚠️ {image_url} → EXIF 데이터 처리 실패: {e}")
+            logger.warning("⚠️ %s → EXIF 데이터 처리 실패: %s", image_url, e)
 
         return None, None  # GPS 정보가 없는 경우
 
     def get_full_address(self, lat, lon):
         """ 🔹 OpenStreetMap API를 활용한 GPS → 주소 변환 """
         if lat is None or lon is None:
-            print("⚠️ GPS 정보 없음 → 주소 변환 불가")
+            logger.debug("⚠️ GPS 정보 없음 → 주소 변환 불가")
             return None
 
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&zoom=14&addressdetails=1"
+        url = f"{self.nominatim_url}?format=json&lat={lat}&lon={lon}&zoom=14&addressdetails=1"
 
         try:
-            time.sleep(1)  # API 요청 제한 방지
-            response = requests.get(url, headers=self.headers, timeout=5)
+            with stage("geocode"):
+                time.sleep(self.nominatim_interval)  # API 요청 제한 방지
+                response = requests.get(url, headers=self.headers, timeout=5)
             if response.status_code == 200:
                 address = response.json().get("address", {})
-                print(f"📍 주소 변환 성공: {address}")
+                logger.debug("📍 주소 변환 성공: %s", address)
                 return address
         except requests.exceptions.RequestException as e:
-            print(f"⚠️ 주소 변환 실패: {e}")
+            logger.warning("⚠️ 주소 변환 실패: %s", e)
 
         return None
 
     def extract_best_region_tag(self, address):
         """ 🔹 OpenStreetMap에서 최적의 지역 태그 추출 """
         if not address:
-            print("🚨 주소 정보 없음 → 지역 태그 생성 불가")
+            logger.debug("🚨 주소 정보 없음 → 지역 태그 생성 불가")
             return None
 
         region_priority = ["quarter", "suburb", "town", "village", "borough", "county", "city_district"]
@@ -74,14 +96,26 @@ class LocationTagger:
 
         return None
 
-    def predict_locations(self, image_urls: list[str]) -> dict:
-        """ 🔹 이미지 URL 리스트에 대한 지역 태깅 수행 (원래 방식 복원) """
+    def predict_locations(self, image_urls: list[str], image_bytes: Optional[Dict[str, bytes]] = None,
+                          coordinates: Optional[Dict[str, tuple]] = None) -> dict:
+        """ 🔹 이미지 URL 리스트에 대한 지역 태깅 수행
+
+        coordinates(호출자가 이미 추출한 (위도, 경도))가 있으면 EXIF를 읽지 않고,
+        image_bytes에 있는 이미지는 다시 다운로드하지 않는다.
+        """
+        image_bytes = image_bytes or {}
+        coordinates = coordinates or {}
         results = {}
         for image_url in image_urls:
             try:
-                lat, lon = self.get_gps_from_exif(image_url)  # ✅ 이미지 URL에서 직접 GPS 추출
+                if image_url in coordinates:
+                    lat, lon = coordinates[image_url]
+                elif image_url in image_bytes:
+                    lat, lon = self.get_gps_from_bytes(image_bytes[image_url], image_url)
+                else:
+                    lat, lon = self.get_gps_from_exif(image_url)  # ✅ 이미지 URL에서 직접 GPS 추출
                 if lat is None or lon is None:
-                    print(f"⚠️ {image_url} → GPS 정보 없음 → 기본값 반환")
+                    logger.debug("⚠️ %s → GPS 정보 없음 → 기본값 반환", image_url)
                     results[image_url] = {"error": "지역 태그 없음"}
                     continue
 
@@ -89,10 +123,10 @@ class LocationTagger:
                 best_tag = self.extract_best_region_tag(full_address)
 
                 results[image_url] = {"region": best_tag} if best_tag else {"error": "지역 태그 없음"}
-                print(f"📍 {image_url} → 지역 태그: {results[image_url]}")
+                logger.debug("📍 %s → 지역 태그: %s", image_url, results[image_url])
 
             except Exception as e:
-                print(f"⚠️ {image_url} → 지역 태그 생성 실패: {e}")
+                logger.warning("⚠️ %s → 지역 태그 생성 실패: %s", image_url, e)
                 results[image_url] = {"error": "지역 태그 생성 실패"}
 
         return results
\ No newline at end of file
@@ -3,23 +3,61 @@ import clip
 import torch.nn.functional as F
 from PIL import Image
 import logging
+import os
 import time
 from app.utils.places import places
+from app.utils.tracing import stage
+from mindlog_common.log import get_logger
+
+logger = get_logger(__name__)
+
+# ✅ 프롬프트 세트 (여러 템플릿이면 클래스별 텍스트 특징을 정규화 후 평균)
+PROMPT_SETS = {
+    "photo": ["a photo of {}"],
+    "scene": ["a photo of {}", "a photo of the {}, a type of place", "a picture taken at the {}"],
+    "ensemble": [
+        "a photo of {}", "a photo of the {}, a type of place", "a picture taken at the {}",
+        "a blurry photo of {}", "a photo of a {} during the day", "a photo of a {} at night",
+        "a snapshot of {}", "a travel photo of {}",
+    ],
+}
+
+# ✅ 장소 태깅 설정 (평가 결과: python -m benchmarks.eval_places)
+PLACE_MODEL = os.getenv("PLACE_MODEL", "ViT-L/14")
+PLACE_THRESHOLD = float(os.getenv("PLACE_THRESHOLD", "0.4"))
+PLACE_PRECISION = os.getenv("PLACE_PRECISION", "auto")  # auto(clip.load 기본: GPU fp16 / CPU fp32) / fp32 / fp16
+PLACE_PROMPT_SET = os.getenv("PLACE_PROMPT_SET", "photo")
+PLACE_TTA = os.getenv("PLACE_TTA", "true").lower() == "true"  # 좌우 반전 이미지 평균
+
+def ensemble_text_features(features: torch.Tensor) -> torch.Tensor:
+    """🔹 (템플릿, 클래스, dim) 텍스트 특징 → 클래스별 앙상블 특징 (클래스, dim)
+
+    템플릿마다 노름이 달라 그대로 평균하면 노름이 큰 템플릿이 방향을 좌우하므로, 템플릿별로
+    정규화한 뒤 평균하고 다시 정규화한다. 로짓은 정규화하지 않은 이미지 특징과의 내적이고
+    PLACE_THRESHOLD가 그 스케일에 맞춰져 있으므로, 클래스별 원래 노름의 평균을 곱해 되돌린다
+    (템플릿이 하나면 원래 특징과 같음).
+    """
+    features = features.float()
+    norms = features.norm(dim=-1, keepdim=True)
+    ensembled = F.normalize((features / norms).mean(dim=0), dim=-1)
+    return ensembled * norms.mean(dim=0)
 
-# 로깅 설정
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-logger = logging.getLogger(__name__)
 
 class PlaceTagger:
-    def __init__(self, model_name="ViT-L/14", threshold=0.4):
+    def __init__(self, model_name=PLACE_MODEL, threshold=PLACE_THRESHOLD, precision=PLACE_PRECISION,
+                 prompt_set=PLACE_PROMPT_SET, tta=PLACE_TTA):
         try:
-            logger.info(f"🔧 PlaceTagger 초기화 시작 (model: {model_name}, threshold: {threshold})")
+            logger.info("🔧 PlaceTagger 초기화 시작 (model: %s, threshold: %s, precision: %s, prompts: %s, tta: %s)",
+                        model_name, threshold, precision, prompt_set, tta)
+            if precision not in ("auto", "fp32", "fp16"):
+                raise ValueError(f"알 수 없는 precision: {precision}")
+            if prompt_set not in PROMPT_SETS:
+                raise ValueError(f"알 수 없는 프롬프트 세트: {prompt_set}")
             self.model_name = model_name
             self.threshold = threshold
+            self.precision = precision
+            self.prompt_set = prompt_set
+            self.tta = tta
             
             # GPU 설정 및 검증
             if torch.backends.mps.is_available():
@@ -27,21 +65,36 @@ class PlaceTagger:
                 logger.info("✅ MPS 사용 가능: Apple Silicon GPU 사용")
             else:
                 self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-                logger.info(f"⚠️ MPS 사용 불가: {self.device} 사용")
+                logger.info("⚠️ MPS 사용 불가: %s 사용", self.device)
             
             # CLIP 모델 로드
             start_time = time.time()
             self.model, self.preprocess = clip.load(model_name, self.device)
+            if precision == "fp32":
+                self.model.float()
+            elif precision == "fp16":
+                self.model.half()
             load_time = time.time() - start_time
-            logger.info(f"✅ CLIP 모델 로드 완료 (소요시간: {load_time:.2f}초)")
+            logger.info("✅ CLIP 모델 로드 완료 (소요시간: %.2f초)", load_time)
             
             # 프롬프트 수정 - outdoor scene 제거
-            self.prompt_template = "a photo of {}"  # 더 일반적인 프롬프트로 변경
-            self.labels = [self.prompt_template.format(place) for place in places.keys()]
-            logger.info(f"✅ 프롬프트 설정 완료 (레이블 수: {len(self.labels)}개)")
+            templates = PROMPT_SETS[prompt_set]
+            self.prompt_template = templates[0]
+            self.classes = list(places.keys())
+            self.labels = [self.prompt_template.format(place) for place in self.classes]
+            logger.info("✅ 프롬프트 설정 완료 (레이블 수: %d개, 템플릿 %d개)", len(self.labels), len(templates))
+            
+            # 텍스트 특징은 레이블이 고정이므로 한 번만 계산해 재사용 (템플릿이 여러 개면 앙상블)
+            with torch.no_grad():
+                features = torch.stack([
+                    self.model.encode_text(clip.tokenize([t.format(place) for place in self.classes]).to(self.device))
+                    for t in templates
+                ])
+                self.text_features = ensemble_text_features(features).to(features.dtype)
+            self.input_resolution = self.model.visual.input_resolution
             
         except Exception as e:
-            logger.error(f"❌ PlaceTagger 초기화 실패: {str(e)}", exc_info=True)
+            logger.error("❌ PlaceTagger 초기화 실패: %s", e, exc_info=True)
             raise
 
     def _validate_image(self, image):
@@ -51,148 +104,150 @@ class PlaceTagger:
         
         # 이미지 모드 검사
         if image.mode != 'RGB':
-            logger.info(f"⚠️ 이미지 모드 변환: {image.mode} → RGB")
+            logger.debug("⚠️ 이미지 모드 변환: %s → RGB", image.mode)
             image = image.convert('RGB')
         
         # 이미지 크기 검사
         min_size = 224
         original_size = image.size
         if image.size[0] < min_size or image.size[1] < min_size:
-            logger.warning(f"⚠️ 이미지 크기가 너무 작음: {original_size} → ({min_size}, {min_size})")
+            logger.warning("⚠️ 이미지 크기가 너무 작음: %s → (%d, %d)", original_size, min_size, min_size)
             image = image.resize((min_size, min_size), Image.LANCZOS)
         
-        logger.debug(f"✅ 이미지 검증 완료: 크기={image.size}, 모드={image.mode}")
+        logger.debug("✅ 이미지 검증 완료: 크기=%s, 모드=%s", image.size, image.mode)
         return image
 
+    @staticmethod
+    def _format_candidates(best_places: list) -> str:
+        return ", ".join(f"{p[0]}={p[1]:.4f}" for p in best_places[:3])
+
     def predict_places(self, image_data_dict: dict, top_k=3) -> dict:
-        """장소 태깅 (배치 처리)"""
+        """장소 태깅 (PIL 이미지 입력, tta면 원본 + 좌우 반전 평균)"""
+        image_urls = []
+        image_transforms = []
         results = {}
-        total_images = len(image_data_dict)
-        processed_count = 0
+        
+        for image_url, image in image_data_dict.items():
+            try:
+                # 이미지 검증 및 전처리
+                image = self._validate_image(image)
+                image_transforms.append(self.preprocess(image))
+                if self.tta:
+                    image_transforms.append(self.preprocess(image.transpose(Image.FLIP_LEFT_RIGHT)))
+                image_urls.append(image_url)
+            except Exception as e:
+                results[image_url] = {"error": str(e)}
+                logger.error("❌ 처리 실패: %s", image_url, exc_info=True)
+        
+        if image_urls:
+            image_tensors = torch.stack(image_transforms)
+            results.update(self.predict_places_batch(image_urls, image_tensors, views=2 if self.tta else 1, top_k=top_k))
+        return results
+
+    def predict_places_batch(self, image_urls: list, image_tensors: torch.Tensor, views: int = 2, top_k=3) -> dict:
+        """장소 태깅 (전처리된 CLIP 입력 텐서, 이미지당 views개씩 연속 배치)
+
+        모든 이미지를 한 번의 encode_image로 처리하고, 텍스트 특징은 초기화 시 계산한 값을 재사용한다.
+        """
+        results = {}
+        total_images = len(image_urls)
         error_count = 0
+        if not total_images:
+            return results
         
-        logger.info(f"🚀 장소 태깅 시작: 총 {total_images}개 이미지")
+        logger.debug("🚀 장소 태깅 시작: 총 %d개 이미지", total_images)
         batch_start_time = time.time()
 
-        for image_url, image in image_data_dict.items():
+        try:
+            logger.debug("이미지 텐서 shape: %s", tuple(image_tensors.shape))
+            
+            # 예측 수행
+            with torch.no_grad():
+                # 이미지 특징 추출 (배치 전체 1회)
+                with stage("clip_encode", images=total_images, views=views):
+                    image_features = self.model.encode_image(image_tensors.to(self.device))
+                logits = (image_features @ self.text_features.T).view(total_images, views, -1).mean(dim=1)
+                similarities = F.softmax(logits.float(), dim=-1).cpu()
+                # 검색용 이미지 임베딩 (views 평균 후 L2 정규화)
+                embeddings = F.normalize(image_features.float().view(total_images, views, -1).mean(dim=1), dim=-1).cpu().numpy()
+        except Exception as e:
+            logger.error("❌ 배치 처리 실패", exc_info=True)
+            return {image_url: {"error": str(e)} for image_url in image_urls}
+
+        per_image_time = (time.time() - batch_start_time) / total_images
+        verbose = logger.isEnabledFor(logging.DEBUG)
+        for processed_count, image_url in enumerate(image_urls, 1):
             try:
-                processed_count += 1
-                logger.info(f"🔍 [{processed_count}/{total_images}] 이미지 처리 중: {image_url}")
-                image_start_time = time.time()
+                similarity = similarities[processed_count - 1].unsqueeze(0)
 
-                # 이미지 검증 및 전처리
-                image = self._validate_image(image)
+                # 상위 결과 추출
+                best_match_indices = similarity.argsort(descending=True)[0][:top_k]
+                best_places = [
+                    (self.classes[idx], float(similarity[0, idx].item()))
+                    for idx in best_match_indices
+                ]
                 
-                # CLIP 입력 준비 부분 수정
-                try:
-                    # 이미지 변환 수정
-                    image_transforms = []
-                    transforms = [
-                        lambda x: x,  # 원본
-                        lambda x: x.transpose(Image.FLIP_LEFT_RIGHT)  # 좌우 반전
-                    ]
-                    
-                    for transform in transforms:
-                        processed = self.preprocess(transform(image))
-                        image_transforms.append(processed)
-                    
-                    # 텐서 스택 수정 (배치 차원 올바르게 처리)
-                    image_tensors = torch.cat([t.unsqueeze(0) for t in image_transforms], dim=0).to(self.device)
-                    
-                    # 텐서 shape 로깅 추가
-                    logger.debug(f"이미지 텐서 shape: {image_tensors.shape}")
+                # 임계값 기반 필터링
+                valid_places = [
+                    place for place in best_places 
+                    if place[1] >= self.threshold
+                ]
+
+                # 결과 저장
+                if valid_places:
+                    place_name = valid_places[0][0]
+                    results[image_url] = {
+                        "place": places.get(place_name, place_name),
+                        "confidence": valid_places[0][1],
+                        "all_predictions": [
+                            {"place": p[0], "confidence": p[1]} 
+                            for p in best_places[:3]
+                        ],
+                        "embedding": embeddings[processed_count - 1],
+                    }
                     
-                    text_inputs = clip.tokenize(self.labels).to(self.device)
-
-                    # 예측 수행
-                    with torch.no_grad():
-                        # 이미지 특징 추출
-                        image_features = self.model.encode_image(image_tensors)
-                        text_features = self.model.encode_text(text_inputs)
-                        
-                        # 유사도 계산
-                        similarity = F.softmax(
-                            (image_features @ text_features.T).mean(dim=0).unsqueeze(0), 
-                            dim=-1
+                    # 상세 로그 (후보 문자열은 DEBUG일 때만 만든다)
+                    if verbose:
+                        logger.debug(
+                            "✅ [%d/%d] 태깅 완료: %s → %s (신뢰도: %.4f, 후보: %s, 처리시간: %.2f초)",
+                            processed_count, total_images, image_url,
+                            results[image_url]["place"], results[image_url]["confidence"],
+                            self._format_candidates(best_places), per_image_time,
                         )
-
-                        # 상위 결과 추출
-                        best_match_indices = similarity.argsort(descending=True)[0][:top_k]
-                        best_places = [
-                            (self.labels[idx], float(similarity[0, idx].item()))
-                            for idx in best_match_indices
-                        ]
-                        
-                        # 임계값 기반 필터링
-                        valid_places = [
-                            place for place in best_places 
-                            if place[1] >= self.threshold
-                        ]
-
-                        # 결과 저장
-                        if valid_places:
-                            place_name = valid_places[0][0].replace("a photo of ", "")
-                            results[image_url] = {
-                                "place": places.get(place_name, place_name),
-                                "confidence": valid_places[0][1],
-                                "all_predictions": [
-                                    {"place": p[0], "confidence": p[1]} 
-                                    for p in best_places[:3]
-                                ]
-                            }
-                            
-                            process_time = time.time() - image_start_time
-                            # 상세 로깅 추가
-                            logger.info(
-                                f"✅ 태깅 완료: {image_url}\n"
-                                f"   - 최종 선택 장소: {results[image_url]['place']} (신뢰도: {results[image_url]['confidence']:.4f})\n"
-                                f"   - 상위 3개 후보:\n" + 
-                                "\n".join([
-                                    f"     {i+1}. {p[0].replace('a photo of ', '')} "  # outdoor scene 제거
-                                    f"(신뢰도: {p[1]:.4f})"
-                                    for i, p in enumerate(best_places[:3])
-                                ]) + f"\n"
-                                f"   - 처리시간: {process_time:.2f}초"
-                            )
-                        else:
-                            error_count += 1
-                            results[image_url] = {
-                                "error": "임계값을 넘는 장소가 없음",
-                                "best_guess": best_places[0] if best_places else None
-                            }
-                            # 임계값을 넘지 못한 경우에도 상위 후보 로깅
-                            logger.warning(
-                                f"⚠️ 유효한 장소 없음: {image_url}\n" +
-                                "   - 상위 3개 후보 (임계값 {self.threshold} 미만):\n" +
-                                "\n".join([
-                                    f"     {i+1}. {p[0].replace('a photo of ', '')} "  # outdoor scene 제거
-                                    f"(신뢰도: {p[1]:.4f})"
-                                    for i, p in enumerate(best_places[:3])
-                                ])
-                            )
-
-                except Exception as e:
+                else:
                     error_count += 1
-                    results[image_url] = {"error": str(e)}
-                    logger.error(f"❌ 처리 실패: {image_url}", exc_info=True)
+                    results[image_url] = {
+                        "error": "임계값을 넘는 장소가 없음",
+                        "best_guess": best_places[0] if best_places else None,
+                        "all_predictions": [
+                            {"place": p[0], "confidence": p[1]}
+                            for p in best_places[:3]
+                        ],
+                        "embedding": embeddings[processed_count - 1],
+                    }
+                    if verbose:
+                        logger.debug(
+                            "⚠️ 유효한 장소 없음: %s (임계값 %s 미만, 후보: %s)",
+                            image_url, self.threshold, self._format_candidates(best_places),
+                        )
 
             except Exception as e:
                 error_count += 1
                 results[image_url] = {"error": str(e)}
-                logger.error(f"❌ 처리 실패: {image_url}", exc_info=True)
+                logger.error("❌ 처리 실패: %s", image_url, exc_info=True)
 
-        # 최종 통계
+        # 최종 통계 (배치당 1줄)
         total_time = time.time() - batch_start_time
-        success_rate = ((total_images - error_count) / total_images) * 100
-        
         logger.info(
-            f"\n📊 처리 완료 통계:\n"
-            f"   - 총 이미지: {total_images}개\n"
-            f"   - 성공: {total_images - error_count}개\n"
-            f"   - 실패: {error_count}개\n"
-            f"   - 성공률: {success_rate:.1f}%\n"
-            f"   - 총 소요시간: {total_time:.2f}초\n"
-            f"   - 이미지당 평균 처리시간: {total_time/total_images:.2f}초"
+            "📊 장소 태깅 완료: %d개 중 %d개 성공 (%.1f%%), 총 %.2f초, 이미지당 %.3f초",
+            total_images, total_images - error_count,
+            (total_images - error_count) / total_images * 100, total_time, total_time / total_images,
         )
 
-        return results
\ No newline at end of file
+        return results
+
+    def encode_text(self, query: str):
+        """🔹 자유 텍스트 쿼리 → 정규화된 CLIP 텍스트 임베딩 (이미지 임베딩과 같은 공간)"""
+        with torch.no_grad():
+            features = self.model.encode_text(clip.tokenize([query], truncate=True).to(self.device))
+        return F.normalize(features.float(), dim=-1)[0].cpu().numpy()
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from PIL import Image
+from mindlog_common.log import get_logger
+from mindlog_common.tracing import span
+
+from app.utils.image_embeddings import STORE_IMAGE_EMBEDDINGS, ImageEmbeddingStore
+from app.utils.metrics import BATCH_SIZE
+from app.utils.preprocess import ImagePreprocessor
+from app.utils.tracing import stage
+
+# ✅ 태깅 단계와 응답/DB에 기록되는 태그 타입
+STAGES = ("place", "location", "companion")
+TAG_TYPES = {"place": "장소", "location": "지역", "companion": "인물"}
+
+# ✅ API 서버에서 사용할 태깅 단계 (쉼표 구분, 예: CPU 전용 장비에서 "place,location")
+ENABLED_STAGES = tuple(stage.strip() for stage in os.getenv("TAGGING_STAGES", ",".join(STAGES)).split(","))
+
+logger = get_logger(__name__)
+
+
+class TaggingPipeline:
+    """🔹 장소/지역/인물 태거를 묶어 디코딩된 이미지 배치에 태그를 생성 (API 서버와 재태깅 CLI 공용)
+
+    stages로 필요한 태거만 로드할 수 있고 (예: CLIP 모델만 바꿨다면 place만), 단계별 누적 처리
+    시간과 이미지 수를 timings / counts에 기록한다. 장소 단계의 CLIP 이미지 임베딩은
+    embedding_store(사용자별 검색 인덱스)에 저장된다.
+    """
+
+    def __init__(self, stages=ENABLED_STAGES, place_tagger=None, location_tagger=None, companion_tagger=None,
+                 embedding_store=None):
+        self.stages = tuple(stage for stage in STAGES if stage in stages)
+
+        # 태거 모듈은 torch / tensorflow를 import하므로 사용하는 단계만 로드
+        self.place_tagger = place_tagger
+        if "place" in self.stages and place_tagger is None:
+            from app.models.place_tag import PlaceTagger
+            self.place_tagger = PlaceTagger()
+
+        self.location_tagger = location_tagger
+        if "location" in self.stages and location_tagger is None:
+            from app.models.location_tag import LocationTagger
+            self.location_tagger = LocationTagger()
+
+        self.companion_tagger = companion_tagger
+        if "companion" in self.stages and companion_tagger is None:
+            from app.models.companion_tag import CompanionTagger
+            self.companion_tagger = CompanionTagger()
+
+        self.embedding_store = embedding_store
+        if "place" in self.stages and embedding_store is None and STORE_IMAGE_EMBEDDINGS:
+            self.embedding_store = ImageEmbeddingStore()
+
+        n_px = self.place_tagger.input_resolution if self.place_tagger else 224
+        tta = self.place_tagger.tta if self.place_tagger else True
+        self.preprocessor = ImagePreprocessor(n_px=n_px, tta=tta)
+
+        self.timings = Counter()  # 단계 → 누적 처리 시간 (초)
+        self.counts = Counter()  # 단계 → 누적 처리 이미지 수
+        self._lock = threading.Lock()
+
+    def _record(self, stage: str, start: float, count: int):
+        with self._lock:
+            self.timings[stage] += time.perf_counter() - start
+            self.counts[stage] += count
+
+    def tag(self, images: Dict[str, Image.Image], image_bytes: Optional[Dict[str, bytes]] = None,
+            user_id: Optional[str] = None, coordinates: Optional[Dict[str, tuple]] = None,
+            embeddings: Optional[dict] = None, stages=None) -> Dict[str, List[dict]]:
+        """🔹 url → [{"type", "tag_name"}] (CPU/GPU 작업이므로 이벤트 루프 밖에서 호출)
+
+        image_bytes(원본 바이트)가 있으면 지역 태깅이 이미지를 다시 다운로드하지 않고 EXIF를 읽고,
+        coordinates(url → (위도, 경도))가 있는 이미지는 EXIF 파싱도 건너뛴다.
+        embeddings(dict)를 넘기면 url → 정규화된 CLIP 이미지 임베딩을 채워 준다.
+        stages를 넘기면 로드된 단계 중 그 단계만 실행한다 (예: 재태깅 요청).
+        """
+        stages = self.stages if stages is None else tuple(stage for stage in self.stages if stage in stages)
+        urls = list(images.keys())
+        place_tags, location_tags, companion_tags = {}, {}, {}
+        BATCH_SIZE.observe(len(urls))
+
+        # 이미지별 CLIP 텐서 / 얼굴 검출 배열을 한 번만 생성
+        inputs = None
+        if "place" in stages or "companion" in stages:
+            start = time.perf_counter()
+            with stage("preprocess", images=len(urls)):
+                inputs = self.preprocessor(images)
+            self._record("preprocess", start, len(urls))
+
+        # 태깅 수행
+        if "place" in stages:
+            start = time.perf_counter()
+            with span("place", images=len(urls)):
+                place_tags = self.place_tagger.predict_places_batch(inputs.urls, inputs.clip, views=inputs.views)
+            self._record("place", start, len(urls))
+
+            image_embeddings = {url: r["embedding"] for url, r in place_tags.items() if "embedding" in r}
+            if embeddings is not None:
+                embeddings.update(image_embeddings)
+            if self.embedding_store is not None and user_id is not None and image_embeddings:
+                try:
+                    with stage("embedding_store"):
+                        self.embedding_store.add(user_id, image_embeddings)
+                except Exception as e:
+                    logger.warning("⚠️ 이미지 임베딩 저장 실패: %s", e)
+
+        if "location" in stages:
+            start = time.perf_counter()
+            with span("location", images=len(urls), coordinates=len(coordinates or {})):
+                location_tags = self.location_tagger.predict_locations(urls, image_bytes, coordinates)
+            self._record("location", start, len(urls))
+
+        # 인물 태그 생성
+        if "companion" in stages:
+            start = time.perf_counter()
+            try:
+                with span("companion", images=len(urls)):
+                    companion_tags = self.companion_tagger.process_faces(inputs.faces, user_id=user_id) or {}
+            except Exception as e:
+                logger.warning("⚠️ 인물 태깅 실패: %s", e, exc_info=True)
+            self._record("companion", start, len(urls))
+
+        # 이미지별 응답 구조화
+        results = {}
+        for url in urls:
+            tags = []
+
+            # 장소 태그 추가
+            if url in place_tags and "error" not in place_tags[url]:
+                tags.append({"type": TAG_TYPES["place"], "tag_name": place_tags[url]["place"]})
+
+            # 지역 태그 추가
+            if url in location_tags and "error" not in location_tags[url]:
+                tags.append({"type": TAG_TYPES["location"], "tag_name": location_tags[url]["region"]})
+
+            # 인물 태그 추가
+            person_tags = companion_tags.get(url)
+            if isinstance(person_tags, list):
+                for person_tag in person_tags:
+                    tags.append({"type": TAG_TYPES["companion"], "tag_name": person_tag})
+
+            results[url] = tags
+
+        return results
+
+    def stats(self) -> dict:
+        """🔹 단계별 누적 처리 이미지 수 / 시간 / 처리량"""
+        with self._lock:
+            return {
+                stage: {
+                    "images": self.counts[stage],
+                    "seconds": round(self.timings[stage], 3),
+                    "images_per_sec": round(self.counts[stage] / self.timings[stage], 2) if self.timings[stage] else None,
+                }
+                for stage in self.timings
+            }
@@ -1,174 +1,312 @@
-from fastapi import APIRouter, HTTPException
-from app.models.place_tag import PlaceTagger
-from app.models.location_tag import LocationTagger
-from app.models.companion_tag import CompanionTagger
-from typing import List, Dict
-from pydantic import BaseModel
-import re
-import requests
-from io import BytesIO
-from PIL import Image, ExifTags
-import piexif
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from app.models.tagging_pipeline import TaggingPipeline
+from app.utils.image_decode import decode_image
+from app.utils.image_fetch import fetch_image_bytes, read_shared_image
+from app.utils.admission import AdmissionController, QueueFullError, INTERACTIVE
+from app.utils.single_flight import SingleFlight
+from app.utils.metrics import REGISTRY, REQUEST_SECONDS
+from app.utils.tracing import stage
+from mindlog_common.tracing import current_span
+from mindlog_common.log import get_logger
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict, Literal, Optional
+from pydantic import BaseModel, Field, ValidationError
+import hashlib
+from collections import defaultdict
 import aiohttp
-import io
 
 router = APIRouter()
+logger = get_logger(__name__)
 
-def convert_image_url(url: str) -> str:
-    """Google Drive URL 변환"""
-    match = re.search(r"file/d/([^/]+)/view", url)
-    if match:
-        image_id = match.group(1)
-        return f"https://drive.google.com/uc?id={image_id}"
-    
-    return url  # ✅ 기타 URL은 그대로 반환
-
-def download_image(image_url: str):
-    """🔹 이미지 다운로드 후 PIL 객체로 변환 (EXIF 데이터 유지)"""
+# ✅ 요청 스키마 정의
+class ImageMetadata(BaseModel):
+    """🔹 호출자(백엔드)가 업로드 시 이미 알고 있는 이미지 정보 (있으면 AI 서버가 그대로 신뢰)"""
+    image_url: str
+    latitude: Optional[float] = None  # 위도/경도가 모두 있으면 EXIF GPS 파싱 생략
+    longitude: Optional[float] = None
+    content_hash: Optional[str] = None  # 저장된 바이트의 sha256 (있으면 다운로드 전에 중복 확인)
+    width: Optional[int] = None  # 참고용 (디코딩은 어차피 헤더만 읽고 필요한 배율을 고름)
+    height: Optional[int] = None
+    user_id: Optional[str] = None  # 없으면 요청의 user_id 사용
+    path: Optional[str] = None  # 공유 볼륨(SHARED_IMAGE_DIR) 기준 경로 (있으면 URL 대신 파일에서 읽음)
+
+class TaggingRequest(BaseModel):
+    image_urls: List[str] = []  # 메타데이터 없는 URL (기존 형식)
+    images: List[ImageMetadata] = []
+    user_id: Optional[str] = None  # 얼굴 DB 샤드 선택용 (백엔드 사용자 ID)
+    priority: Literal["interactive", "bulk"] = INTERACTIVE  # 재태깅 등 일괄 작업은 "bulk"
+    stages: Optional[List[Literal["place", "location", "companion"]]] = None  # 일부 단계만 실행 (기본값: 전체)
+    return_embeddings: bool = False  # 결과에 정규화된 CLIP 이미지 임베딩 포함
+
+    def image_items(self) -> List[ImageMetadata]:
+        """🔹 images + image_urls를 요청 순서대로 합친 목록 (user_id 기본값 채움)"""
+        items = [image.model_copy(update={"user_id": image.user_id or self.user_id}) for image in self.images]
+        items.extend(ImageMetadata(image_url=url, user_id=self.user_id) for url in self.image_urls)
+        return items
+
+class SearchRequest(BaseModel):
+    user_id: str
+    query: str  # 자유 텍스트 (예: "rainy café")
+    k: int = Field(20, ge=1, le=100)
+
+# ✅ 이미지별 처리 결과: (태그 목록, 이미지 임베딩 또는 None, 실패 단계 또는 None)
+# 실패한 이미지는 응답에 status "failed" + error로 표시 (재태깅이 기존 태그를 지우지 않도록)
+def failed_outcome(error: str) -> tuple:
+    return [], None, error
+
+# ✅ 태깅 모델 인스턴스 생성 (장소/지역/인물 태거 + 전처리)
+pipeline = TaggingPipeline()
+
+# ✅ 동시 실행 수 / 대기열 제한 (초과 시 429 + Retry-After)
+admission = AdmissionController()
+
+# ✅ 동일 이미지 동시 태깅 합치기 (URL 기준 / 다운로드 후 내용 해시 기준)
+url_flights = SingleFlight("url")
+content_flights = SingleFlight("content")
+
+# ✅ /metrics에 노출할 대기열 / 중복 합치기 / 얼굴 품질 검사 / 검출기 통계 (스크레이프 시점에 읽음)
+REGISTRY.gauge("mindlog_admission_queue_depth", "Tagging requests waiting for a slot", lambda: {
+    (("priority", priority),): depth for priority, depth in admission.stats()["queue_depth"].items()
+})
+REGISTRY.gauge("mindlog_admission_running", "Tagging requests currently running", lambda: {
+    (("priority", priority),): running for priority, running in admission.stats()["running"].items()
+})
+REGISTRY.gauge("mindlog_admission_total", "Admission decisions by result and priority", lambda: {
+    (("priority", name.split("_", 1)[1]), ("result", name.split("_", 1)[0])): count
+    for name, count in admission.counters.items()
+}, kind="counter")
+REGISTRY.gauge("mindlog_single_flight_total", "Image work executed vs coalesced onto an in-flight request", lambda: {
+    (("key", flights.name), ("result", result)): count
+    for flights in (url_flights, content_flights) for result, count in flights.counters.items()
+}, kind="counter")
+if pipeline.companion_tagger is not None:
+    REGISTRY.gauge("mindlog_face_quality_total", "Face quality gate decisions", lambda: {
+        (("result", result),): count for result, count in pipeline.companion_tagger.quality_gate.stats.items()
+    }, kind="counter")
+    if hasattr(pipeline.companion_tagger.detector, "stats"):
+        REGISTRY.gauge("mindlog_face_detector_total", "Images resolved by the fast detector vs the fallback", lambda: {
+            (("detector", name),): count for name, count in pipeline.companion_tagger.detector.stats.items()
+        }, kind="counter")
+
+@router.get("/admission")
+async def admission_stats():
+    """🔹 태깅 대기열 상태 (실행 중 / 대기 중 요청 수, 누적 승인/거절 수)"""
+    return admission.stats()
+
+@router.get("/single-flight")
+async def single_flight_stats():
+    """🔹 중복 태깅 합치기 현황 (executed: 실제 실행, coalesced: 진행 중 작업 결과 공유)"""
+    return {"url": url_flights.stats(), "content": content_flights.stats()}
+
+@router.post("/search")
+async def search_images(request: SearchRequest):
+    """🔹 텍스트 쿼리로 사용자의 사진 검색 (쿼리만 CLIP 텍스트 인코더로 1회 인코딩, 이미지는 저장된 임베딩 사용)"""
+    if pipeline.place_tagger is None or pipeline.embedding_store is None:
+        raise HTTPException(status_code=503, detail="이미지 검색을 사용할 수 없습니다. (장소 태깅 / 임베딩 저장 비활성화)")
     try:
-        response = requests.get(image_url, timeout=5)
-        response.raise_for_status()
-        
-        # 이미지 데이터를 BytesIO에 저장
-        image_data = BytesIO(response.content)
-        
-        # PIL Image로 열기
-        image = Image.open(image_data)
-        
-        # EXIF 데이터 디버깅
-        print(f"📸 이미지 정보: {image_url}")
-        print(f"- 이미지 모드: {image.mode}")
-        print(f"- 이미지 포맷: {image.format}")
-        print(f"- info 키: {list(image.info.keys())}")
-        
-        # EXIF 데이터 보존을 위한 처리
-        if "exif" in image.info:
-            exif_dict = piexif.load(image.info["exif"])
-            print(f"- EXIF 데이터: {list(exif_dict.keys())}")
-            
-            # GPS 데이터 상세 확인
-            if "GPS" in exif_dict:
-                print(f"- GPS 데이터: {exif_dict['GPS']}")
-            
-            # RGB로 변환이 필요한 경우
-            if image.mode != "RGB":
-                original_exif = image.info.get("exif")
-                image = image.convert("RGB")
-                image.info["exif"] = original_exif
-        else:
-            print("- EXIF 데이터 없음")
-            if image.mode != "RGB":
-                image = image.convert("RGB")
-        
-        return image
+        pipeline.embedding_store.path(request.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-    except Exception as e:
-        print(f"⚠️ 이미지 다운로드 실패: {image_url}, 오류: {e}")
-        return None
-
-def resize_image(image: Image.Image, max_width: int, max_height: int):
-    """🔹 이미지 크기를 조정하여 메모리 최적화"""
-    width, height = image.size
-    if width > max_width or height > max_height:
-        scale = min(max_width / width, max_height / height)
-        new_size = (int(width * scale), int(height * scale))
-        image = image.resize(new_size, Image.LANCZOS)
-    
-    return image
+    try:
+        with REQUEST_SECONDS.time(route="search"):
+            async with admission.admit(INTERACTIVE):
+                query = await run_in_threadpool(pipeline.place_tagger.encode_text, request.query)
+            matches = await run_in_threadpool(pipeline.embedding_store.search, request.user_id, query, request.k)
+    except QueueFullError as e:
+        raise _too_many_requests(e)
 
-# ✅ 요청 스키마 정의
-class TaggingRequest(BaseModel):
-    image_urls: List[str]
+    return {
+        "query": request.query,
+        "results": [{"image_url": url, "score": round(score, 4)} for url, score in matches],
+    }
 
-# ✅ 태깅 모델 인스턴스 생성
-place_tagger = PlaceTagger()
-location_tagger = LocationTagger()
-companion_tagger = CompanionTagger()
+def _too_many_requests(e: QueueFullError) -> HTTPException:
+    logger.warning("⚠️ 태깅 대기열 가득 참 (%s): %s", e.priority, admission.stats()["queue_depth"])
+    return HTTPException(
+        status_code=429,
+        detail="태깅 요청이 많아 잠시 후 다시 시도해주세요.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
 
 @router.post("/generate-tags")
 async def generate_tags(request: TaggingRequest):
     try:
+        with REQUEST_SECONDS.time(route="generate-tags"):
+            return await _generate_tags(request)
+    except QueueFullError as e:
+        raise _too_many_requests(e)
+
+@router.post("/generate-tags/upload")
+async def generate_tags_upload(metadata: str = Form(...), files: List[UploadFile] = File(...)):
+    """🔹 이미지 바이트를 multipart로 직접 받아 태깅 (S3 재다운로드 없음)
+
+    metadata는 TaggingRequest JSON이며, files는 metadata의 images 순서와 같아야 한다.
+    """
+    try:
+        request = TaggingRequest.model_validate_json(metadata)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if request.image_urls or len(request.images) != len(files):
+        raise HTTPException(status_code=422, detail="metadata.images와 files의 개수가 같아야 합니다.")
+
+    uploaded = {image.image_url: await file.read() for image, file in zip(request.images, files)}
+    try:
+        with REQUEST_SECONDS.time(route="generate-tags/upload"):
+            return await _generate_tags(request, uploaded)
+    except QueueFullError as e:
+        raise _too_many_requests(e)
+
+async def _generate_tags(request: TaggingRequest, uploaded: Optional[Dict[str, bytes]] = None):
+    items = request.image_items()
+    stages = tuple(stage for stage in pipeline.stages if request.stages is None or stage in request.stages)
+
+    owned, shared = {}, {}
+    outcomes = {}  # (user_id, url) → (태그 목록, 이미지 임베딩 또는 None, 실패 단계 또는 None)
+    try:
+        # 인물 태그가 사용자별 얼굴 DB에 따라 달라지므로 키에 user_id 포함 (실행 단계가 다르면 결과도 다름)
+        for item in items:
+            key = (item.user_id, item.image_url)
+            if key in owned or key in shared:
+                continue
+            flight, is_owner = url_flights.claim((*key, stages))
+            if is_owner:
+                owned[key] = item
+            else:
+                shared[key] = flight
+
+        request_span = current_span()
+        if request_span is not None:
+            request_span.set(images=len(items), owned=len(owned), coalesced=len(shared), priority=request.priority)
+
+        if owned:
+            # 다른 요청이 이미 처리 중인 이미지만 있으면 슬롯을 차지하지 않음
+            async with admission.admit(request.priority):
+                outcomes.update(await _tag_images(list(owned.values()), uploaded or {}, stages))
+            for key in owned:
+                url_flights.resolve((*key, stages), outcomes.get(key, failed_outcome("tagging")))
+
+        for key, flight in shared.items():
+            try:
+                outcomes[key] = await SingleFlight.wait(flight)
+            except QueueFullError:
+                raise
+            except Exception:
+                outcomes[key] = failed_outcome("tagging")
+
         results = []
-        image_urls = []
-        converted_urls = []  # 변환된 URL 저장
-        image_data_dict = {}
+        for item in items:
+            tags, embedding, error = outcomes.get((item.user_id, item.image_url), failed_outcome("tagging"))
+            result = {"image_url": item.image_url, "tags": tags, "status": "failed" if error else "ok"}
+            if error:
+                result["error"] = error
+            if request.return_embeddings:
+                result["embedding"] = embedding.tolist() if embedding is not None else None
+            results.append(result)
+        return {"results": results}
+
+    except QueueFullError as e:
+        for key in owned:
+            url_flights.fail((*key, stages), e)
+        raise
+
+    except Exception as e:
+        logger.error("🚨 전역 에러 발생: %s", e, exc_info=True)
+        results = [{"image_url": item.image_url, "tags": [], "status": "failed", "error": "tagging"} for item in items]
+        return {"results": results}
+
+    finally:
+        # 처리되지 못한 이미지를 기다리는 요청이 멈추지 않도록 실패로 마무리
+        for key in owned:
+            url_flights.resolve((*key, stages), outcomes.get(key, failed_outcome("tagging")))
+
+async def _load_image_bytes(session: aiohttp.ClientSession, item: ImageMetadata,
+                           uploaded: Dict[str, bytes]) -> Optional[bytes]:
+    """🔹 이미지 원본 바이트 (multipart로 받은 바이트 → 공유 볼륨 파일 → URL 다운로드 순)"""
+    if item.image_url in uploaded:
+        return uploaded[item.image_url]
+    if item.path:
+        with stage("read_shared", url=item.image_url):
+            return await run_in_threadpool(read_shared_image, item.path)
+    with stage("download", url=item.image_url):
+        return await fetch_image_bytes(session, item.image_url)
+
+async def _tag_images(items: List[ImageMetadata], uploaded: Dict[str, bytes], stages: tuple) -> Dict[tuple, tuple]:
+    """🔹 이미지 로드 → 내용 해시로 중복 제거 → 사용자별 태깅 ((user_id, url) → (태그 목록, 이미지 임베딩, 실패 단계))"""
+    outcomes = {}
+    images = defaultdict(dict)  # user_id → url → 디코딩된 이미지
+    image_bytes = {}  # 지역 태깅용 원본 바이트 (다시 다운로드하지 않음)
+    coordinates = {}  # 호출자가 보낸 GPS 좌표 (EXIF 파싱 생략)
+    owned_hashes, shared_hashes = {}, {}
 
+    # 내용 해시 flight를 claim한 뒤에는 취소/예외가 나더라도 반드시 resolve (기다리는 요청이 멈추지 않도록)
+    try:
         # 이미지 URL 처리
-        for url in request.image_urls:
-            try:
-                # Google Drive URL 변환
-                converted_url = convert_image_url(url)
-                
-                # 이미지 다운로드 및 변환
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(converted_url) as response:
-                        if response.status == 200:
-                            image_data = await response.read()
-                            image = Image.open(io.BytesIO(image_data))
-                            
-                            # 이미지를 RGB로 변환
-                            if image.mode != 'RGB':
-                                image = image.convert('RGB')
-                            
-                            # 각 태거에 맞는 이미지 크기로 복사
-                            image_data_dict[url] = {
-                                "place": image.copy().resize((512, 512)),
-                                "face": image.copy().resize((1024, 1024))
-                            }
-                            image_urls.append(url)
-                            converted_urls.append(converted_url)  # 변환된 URL 저장
-                        else:
-                            print(f"⚠️ 이미지 다운로드 실패: {url}")
-                            results.append({"image_url": url, "tags": []})
+        async with aiohttp.ClientSession() as session:
+            for item in items:
+                key = (item.user_id, item.image_url)
+                try:
+                    # 내용 해시를 알고 있으면 다운로드 전에 중복 확인
+                    content_key = (item.user_id, item.content_hash, stages) if item.content_hash else None
+                    if content_key is not None:
+                        flight, is_owner = content_flights.claim(content_key)
+                        if not is_owner:
+                            shared_hashes[key] = flight
                             continue
+                        owned_hashes[key] = content_key
 
-            except Exception as e:
-                print(f"⚠️ 이미지 처리 실패: {url}, 오류: {str(e)}")
-                results.append({"image_url": url, "tags": []})
-                continue
+                    image_data = await _load_image_bytes(session, item, uploaded)
+                    if image_data is None:
+                        outcomes[key] = failed_outcome("download")
+                        continue
+
+                    # 다른 URL로 같은 이미지가 처리 중이면 그 결과를 공유
+                    if content_key is None:
+                        content_key = (item.user_id, hashlib.sha256(image_data).hexdigest(), stages)
+                        flight, is_owner = content_flights.claim(content_key)
+                        if not is_owner:
+                            shared_hashes[key] = flight
+                            continue
+                        owned_hashes[key] = content_key
 
-        # 이미지가 하나도 처리되지 않은 경우
-        if not image_data_dict:
-            return {"results": results}
+                    # 필요한 해상도까지만 디코딩 (JPEG draft 모드)
+                    with stage("decode"):
+                        images[item.user_id][item.image_url] = decode_image(image_data)
+                    image_bytes[item.image_url] = image_data
+                    if item.latitude is not None and item.longitude is not None:
+                        coordinates[item.image_url] = (item.latitude, item.longitude)
 
-        # 태깅 수행
-        place_tags = place_tagger.predict_places({url: data["place"] for url, data in image_data_dict.items()})
-        location_tags = location_tagger.predict_locations(converted_urls)  # 변환된 URL 사용
+                except Exception as e:
+                    logger.warning("⚠️ 이미지 처리 실패: %s, 오류: %s", item.image_url, e)
+                    outcomes[key] = failed_outcome("decode")
+                    continue
 
-        # 인물 태그 생성
-        companion_tags = {}
+        for user_id, user_images in images.items():
+            # 모델 추론 / 지오코딩은 블로킹 작업이므로 이벤트 루프 밖에서 실행
+            embeddings = {}
+            user_tags = await run_in_threadpool(pipeline.tag, user_images, image_bytes, user_id, coordinates,
+                                                embeddings, stages)
+            outcomes.update(((user_id, url), (url_tags, embeddings.get(url), None))
+                            for url, url_tags in user_tags.items())
+    finally:
+        for key, content_key in owned_hashes.items():
+            content_flights.resolve(content_key, outcomes.get(key, failed_outcome("tagging")))
+
+    aliases = defaultdict(dict)  # 같은 내용을 다른 URL로 올린 이미지도 검색되도록 임베딩 저장
+    for key, flight in shared_hashes.items():
         try:
-            companion_tags = companion_tagger.process_faces({url: data["face"] for url, data in image_data_dict.items()})
-            if companion_tags is None:
-                companion_tags = {url: [] for url in image_urls}
-        except Exception as e:
-            print(f"⚠️ 인물 태깅 실패: {str(e)}")
-            companion_tags = {url: [] for url in image_urls}
-
-        # 이미지별 응답 구조화
-        for url, converted_url in zip(image_urls, converted_urls):
-            tags = []
-            
-            # 장소 태그 추가
-            if url in place_tags and "error" not in place_tags[url]:
-                tags.append({"type": "장소", "tag_name": place_tags[url]["place"]})
-            
-            # 지역 태그 추가 (변환된 URL 사용)
-            if converted_url in location_tags and "error" not in location_tags[converted_url]:
-                tags.append({"type": "지역", "tag_name": location_tags[converted_url]["region"]})
-            
-            # 인물 태그 추가
-            if companion_tags and url in companion_tags:
-                person_tags = companion_tags[url]
-                if isinstance(person_tags, list):
-                    for person_tag in person_tags:
-                        tags.append({"type": "인물", "tag_name": person_tag})
-            
-            results.append({"image_url": url, "tags": tags})
+            outcomes[key] = await SingleFlight.wait(flight)
+        except Exception:
+            outcomes[key] = failed_outcome("tagging")
+        user_id, url = key
+        if outcomes[key][1] is not None and user_id is not None:
+            aliases[user_id][url] = outcomes[key][1]
 
-        return {"results": results}
-        
-    except Exception as e:
-        print(f"🚨 전역 에러 발생: {str(e)}")
-        results = [{"image_url": url, "tags": []} for url in request.image_urls]
-        return {"results": results}
\ No newline at end of file
+    if pipeline.embedding_store is not None:
+        for user_id, embeddings in aliases.items():
+            try:
+                await run_in_threadpool(pipeline.embedding_store.add, user_id, embeddings)
+            except Exception as e:
+                logger.warning("⚠️ 이미지 임베딩 저장 실패: %s", e)
+
+    return outcomes
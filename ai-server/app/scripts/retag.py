@@ -0,0 +1,518 @@
+"""저장된 이미지 일괄 재태깅 (CLIP 모델 / 장소 레이블 / 얼굴 임계값 변경 후)
+
+입력 (하나 선택):
+    --urls FILE   한 줄에 URL 하나 (탭으로 구분한 두 번째 열은 user_id)
+    --from-db     백엔드 DB의 image 테이블 (DATABASE_URL, diary.user_id 포함)
+    --dir DIR     로컬 이미지 폴더 (오프라인 실행, --url-prefix로 DB의 image_url과 연결 가능)
+출력 (하나 이상):
+    --output FILE NDJSON ({"image_url", "image_id", "user_id", "tags"} 한 줄씩)
+    --write-db    image_tag 갱신 (재태깅한 단계의 태그 타입만 교체, 다운로드 실패 이미지는 유지)
+
+실행 예시 (ai-server 디렉토리에서):
+    python -m app.scripts.retag --from-db --stages place --write-db --checkpoint data/retag.ckpt
+    python -m app.scripts.retag --dir ~/photos --user-id test --output data/retag.ndjson
+    python -m app.scripts.retag --from-db --write-db --server http://localhost:8001/ai
+
+--server를 주면 모델을 따로 로드하지 않고 실행 중인 AI 서버에 bulk 우선순위로 태깅을 요청한다
+(다운로드한 이미지를 /generate-tags/upload로 전달). 서버의 대기열 제한 안에서 다이어리 작성 요청이
+먼저 처리되므로 운영 중인 서버에 재태깅을 걸 때 사용하고, 429를 받으면 Retry-After만큼 기다렸다 다시 보낸다.
+
+체크포인트에는 입력 순서상 완료된 레코드 수(DB 입력은 마지막 image id도)가 배치 단위로 기록되며,
+같은 인자로 다시 실행하면 이어서 처리한다 (배치 기록 직후 중단되면 그 배치가 한 번 더 기록될 수 있음).
+인물 단계는 재태깅한 얼굴이 사용자 얼굴 DB에 다시 추가되므로 기본 단계에서 제외했다.
+--face-shard-dir로 새 샤드 폴더를 지정해 얼굴 DB를 처음부터 다시 만드는 용도로 사용한다.
+DB 입출력에는 sqlalchemy, psycopg2가 필요하다 (backend/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import aiohttp
+
+from app.models.tagging_pipeline import STAGES, TAG_TYPES, TaggingPipeline
+from app.utils.admission import BULK, RETRY_AFTER
+from app.utils.image_decode import decode_image
+from app.utils.image_fetch import fetch_image_bytes
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".heic", ".webp")
+
+
+# ---------------------------------------------------------------- 입력
+
+def iter_url_file(path: str, user_id=None):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            url, _, line_user_id = line.partition("\t")
+            yield {"image_url": url, "user_id": line_user_id or user_id}
+
+
+def iter_directory(path: str, user_id=None, url_prefix: str = None):
+    """🔹 폴더 안 이미지 (정렬된 상대 경로 순서, 재개 시 같은 순서 보장)"""
+    names = []
+    for root, _, files in os.walk(path):
+        names.extend(
+            os.path.relpath(os.path.join(root, name), path)
+            for name in files if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+    for name in sorted(names):
+        yield {
+            "image_url": f"{url_prefix}{name}" if url_prefix else name,
+            "path": os.path.join(path, name),
+            "user_id": user_id,
+        }
+
+
+def iter_database(engine, last_id=None, user_id=None, offset: int = 0, page_size: int = 1000):
+    """🔹 image 테이블을 id 순서로 페이지 단위 조회 (keyset: WHERE i.id > 마지막 id)
+
+    재개할 때 이미 처리한 행을 건너뛰느라 다시 읽지 않고, 페이지마다 연결을 새로 잡으므로
+    긴 재태깅 중에도 트랜잭션을 오래 열어 두지 않는다. offset은 last_id가 없는 이전 형식의
+    체크포인트를 이어서 처리할 때만 첫 페이지에 사용한다.
+    """
+    from sqlalchemy import text
+
+    conditions = ["d.user_id = :user_id"] if user_id else []
+    while True:
+        where = conditions + (["i.id > :last_id"] if last_id is not None else [])
+        query = """
+            SELECT i.id, i.image_url, d.user_id, i.latitude, i.longitude
+            FROM image i JOIN diary d ON d.id = i.diary_id
+            {where}
+            ORDER BY i.id
+            LIMIT :limit OFFSET :offset
+        """.format(where=f"WHERE {' AND '.join(where)}" if where else "")
+        params = {"limit": page_size, "offset": offset, **({"user_id": user_id} if user_id else {})}
+        if last_id is not None:
+            params["last_id"] = last_id
+
+        with engine.connect() as conn:
+            rows = conn.execute(text(query), params).all()
+        for image_id, image_url, owner_id, latitude, longitude in rows:
+            record = {"image_url": image_url, "image_id": str(image_id), "user_id": str(owner_id)}
+            if latitude is not None and longitude is not None:
+                record["coordinates"] = (latitude, longitude)  # 업로드 시 저장된 GPS (EXIF 파싱 생략)
+            yield record
+
+        if len(rows) < page_size:
+            return
+        last_id, offset = rows[-1][0], 0
+
+
+def create_engine_from_env(database_url: str = None):
+    try:
+        from sqlalchemy import create_engine
+    except ImportError:
+        raise SystemExit("⚠️ --from-db / --write-db 에는 sqlalchemy, psycopg2가 필요합니다")
+
+    database_url = database_url or os.getenv("DATABASE_URL")
+    if not database_url:
+        raise SystemExit("⚠️ DATABASE_URL 환경 변수 또는 --database-url이 필요합니다")
+    return create_engine(database_url)
+
+
+def batched(records, size: int):
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---------------------------------------------------------------- 출력
+
+class NdjsonWriter:
+    def __init__(self, path: str, append: bool):
+        self.file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, records, tags: dict):
+        for record in records:
+            row = {"image_url": record["image_url"], "image_id": record.get("image_id"),
+                   "user_id": record.get("user_id")}
+            if record["image_url"] in tags:
+                row["tags"] = tags[record["image_url"]]
+            else:
+                row["error"] = record.get("error", "태깅 실패")
+            self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())  # 체크포인트보다 먼저 디스크에 기록
+
+    def close(self):
+        self.file.close()
+
+
+class DatabaseWriter:
+    """🔹 image_tag 갱신 (배치당 트랜잭션 1회, 재태깅한 태그 타입만 삭제 후 삽입)
+
+    인물 태그는 사용자별 얼굴 DB 샤드에서 발급되므로 이미지가 속한 다이어리 작성자의 태그로 저장한다.
+    """
+
+    def __init__(self, engine, stages):
+        from sqlalchemy import bindparam, text
+
+        self.engine = engine
+        self.tag_types = [TAG_TYPES[stage] for stage in stages]
+        self.tag_ids = {}  # (소유자 또는 None, tag_name) → tag.id
+        self.missing = 0  # DB에 없는 image_url 수
+        self._find_image = text(
+            "SELECT i.id, d.user_id FROM image i JOIN diary d ON d.id = i.diary_id WHERE i.image_url = :image_url"
+        )
+        self._find_owner = text("SELECT d.user_id FROM image i JOIN diary d ON d.id = i.diary_id WHERE i.id = :image_id")
+        self._delete_tags = text(
+            "DELETE FROM image_tag WHERE image_id = :image_id "
+            "AND tag_id IN (SELECT id FROM tag WHERE type IN :types)"
+        ).bindparams(bindparam("types", expanding=True))
+        self._insert_shared_tag = text(
+            "INSERT INTO tag (id, tag_name, type) VALUES (:id, :tag_name, :type) "
+            "ON CONFLICT (tag_name) WHERE user_id IS NULL DO NOTHING"
+        )
+        self._insert_user_tag = text(
+            "INSERT INTO tag (id, tag_name, type, user_id) VALUES (:id, :tag_name, :type, :user_id) "
+            "ON CONFLICT (user_id, tag_name) WHERE user_id IS NOT NULL DO NOTHING"
+        )
+        self._find_shared_tag = text("SELECT id FROM tag WHERE tag_name = :tag_name AND user_id IS NULL")
+        self._find_user_tag = text("SELECT id FROM tag WHERE tag_name = :tag_name AND user_id = :user_id")
+        self._insert_image_tag = text(
+            "INSERT INTO image_tag (image_id, tag_id) VALUES (:image_id, :tag_id) ON CONFLICT DO NOTHING"
+        )
+
+    def _tag_id(self, conn, tag: dict, owner_id):
+        owner_id = owner_id if tag["type"] == TAG_TYPES["companion"] else None
+        tag_id = self.tag_ids.get((owner_id, tag["tag_name"]))
+        if tag_id is None:
+            params = {"id": str(uuid.uuid4()), "tag_name": tag["tag_name"], "type": tag["type"], "user_id": owner_id}
+            if owner_id is None:
+                conn.execute(self._insert_shared_tag, params)
+                tag_id = conn.execute(self._find_shared_tag, params).scalar()
+            else:
+                conn.execute(self._insert_user_tag, params)
+                tag_id = conn.execute(self._find_user_tag, params).scalar()
+            self.tag_ids[(owner_id, tag["tag_name"])] = tag_id
+        return tag_id
+
+    def write(self, records, tags: dict):
+        with self.engine.begin() as conn:
+            for record in records:
+                if record["image_url"] not in tags:
+                    continue  # 다운로드/디코딩 실패 → 기존 태그 유지
+
+                if record.get("image_id"):
+                    image_id = record["image_id"]
+                    owner_id = conn.execute(self._find_owner, {"image_id": image_id}).scalar()
+                else:
+                    image_id, owner_id = conn.execute(
+                        self._find_image, {"image_url": record["image_url"]}).first() or (None, None)
+                if image_id is None:
+                    self.missing += 1
+                    continue
+
+                conn.execute(self._delete_tags, {"image_id": image_id, "types": self.tag_types})
+                for tag in tags[record["image_url"]]:
+                    conn.execute(self._insert_image_tag,
+                                 {"image_id": image_id, "tag_id": self._tag_id(conn, tag, owner_id)})
+
+    def close(self):
+        if self.missing:
+            print(f"⚠️ DB에 없는 이미지 {self.missing}개는 건너뜀")
+
+
+# ---------------------------------------------------------------- 체크포인트 / 처리량
+
+class Checkpoint:
+    """🔹 완료된 레코드 수 + 마지막 image id (DB 입력) + 누적 처리량 (tmp 파일 → os.replace로 원자적 저장)"""
+
+    def __init__(self, path: str, job: dict, restart: bool = False):
+        self.path = path
+        self.job = job
+        self.done = 0
+        self.last_id = None
+        self.stats = {}
+        if path and os.path.exists(path) and not restart:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("job") != job:
+                raise SystemExit(f"⚠️ 체크포인트의 작업 설정이 다릅니다: {saved.get('job')} (처음부터 하려면 --restart)")
+            self.done = saved.get("done", 0)
+            self.last_id = saved.get("last_id")
+            self.stats = saved.get("stats", {})
+            print(f"✅ 체크포인트에서 재개: {self.done}개 완료됨")
+
+    def save(self, done: int, stats: dict, last_id: str = None):
+        self.done = done
+        self.last_id = last_id or self.last_id
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"job": self.job, "done": done, "last_id": self.last_id, "stats": stats},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class Throughput:
+    """🔹 단계별 처리 시간 / 이미지 수 (다운로드는 배치 단위 wall time, 나머지는 태깅 스레드 시간)"""
+
+    def __init__(self, previous: dict = None):
+        self.seconds = Counter()
+        self.images = Counter()
+        self.counters = Counter()
+        for stage, row in (previous or {}).get("stages", {}).items():
+            self.seconds[stage] = row["seconds"]
+            self.images[stage] = row["images"]
+        self.counters.update((previous or {}).get("counters", {}))
+
+    def add(self, stage: str, seconds: float, images: int):
+        self.seconds[stage] += seconds
+        self.images[stage] += images
+
+    def report(self, pipeline: TaggingPipeline = None) -> dict:
+        stages = {
+            stage: {"images": self.images[stage], "seconds": round(self.seconds[stage], 3)}
+            for stage in self.seconds
+        }
+        for stage, row in (pipeline.stats() if pipeline is not None else {}).items():
+            previous = stages.get(stage, {"images": 0, "seconds": 0})
+            stages[stage] = {"images": previous["images"] + row["images"],
+                             "seconds": round(previous["seconds"] + row["seconds"], 3)}
+        for row in stages.values():
+            row["images_per_sec"] = round(row["images"] / row["seconds"], 2) if row["seconds"] else None
+        return {"stages": stages, "counters": dict(self.counters)}
+
+
+# ---------------------------------------------------------------- 실행
+
+async def fetch_batch(session, records, semaphore: asyncio.Semaphore) -> dict:
+    """🔹 배치 내 이미지 병렬 다운로드 (로컬 파일은 스레드에서 읽기) → url → bytes"""
+    async def fetch(record):
+        async with semaphore:
+            try:
+                if "path" in record:
+                    return await asyncio.to_thread(_read_file, record["path"])
+                return await fetch_image_bytes(session, record["image_url"])
+            except Exception as e:
+                record["error"] = f"다운로드 실패: {e}"
+                return None
+
+    blobs = await asyncio.gather(*(fetch(record) for record in records))
+    return {record["image_url"]: blob for record, blob in zip(records, blobs) if blob is not None}
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def process_batch(pipeline: TaggingPipeline, records, blobs: dict, writers, throughput: Throughput) -> dict:
+    """🔹 디코딩 → 사용자별 태깅 → 기록 (태깅 전용 스레드에서 실행)"""
+    start = time.perf_counter()
+    images = {}
+    for record in records:
+        url = record["image_url"]
+        if url not in blobs:
+            continue
+        try:
+            images[url] = decode_image(blobs[url])
+        except Exception as e:
+            record["error"] = f"디코딩 실패: {e}"
+    throughput.add("decode", time.perf_counter() - start, len(images))
+
+    # 인물 태그는 사용자별 얼굴 DB 기준이므로 user_id별로 나눠 태깅
+    by_user = defaultdict(dict)
+    for record in records:
+        if record["image_url"] in images:
+            by_user[record.get("user_id")][record["image_url"]] = images[record["image_url"]]
+
+    coordinates = {record["image_url"]: record["coordinates"] for record in records if "coordinates" in record}
+    tags = {}
+    for user_id, user_images in by_user.items():
+        tags.update(pipeline.tag(user_images, {url: blobs[url] for url in user_images}, user_id=user_id,
+                                 coordinates=coordinates))
+
+    start = time.perf_counter()
+    for writer in writers:
+        writer.write(records, tags)
+    throughput.add("write", time.perf_counter() - start, len(records))
+
+    throughput.counters["tagged"] += len(tags)
+    throughput.counters["failed"] += len(records) - len(tags)
+    return tags
+
+
+async def tag_remote(session, server: str, records, blobs: dict, stages) -> dict:
+    """🔹 AI 서버에 bulk 우선순위로 태깅 요청 (다운로드한 바이트를 multipart로 전달) → url → 태그 (성공한 이미지만)"""
+    sent = [record for record in records if record["image_url"] in blobs]
+    if not sent:
+        return {}
+
+    images = []
+    for record in sent:
+        image = {"image_url": record["image_url"], "user_id": record.get("user_id")}
+        if "coordinates" in record:
+            image["latitude"], image["longitude"] = record["coordinates"]
+        images.append(image)
+    metadata = json.dumps({"images": images, "priority": BULK, "stages": list(stages)})
+
+    while True:
+        form = aiohttp.FormData()
+        form.add_field("metadata", metadata)
+        for record in sent:
+            form.add_field("files", blobs[record["image_url"]], content_type="application/octet-stream",
+                           filename=os.path.basename(record["image_url"]) or "image")
+        async with session.post(f"{server.rstrip('/')}/generate-tags/upload", data=form) as response:
+            if response.status == 429:  # 대화형 요청이 밀려 있음 → 기다렸다 다시 요청
+                await asyncio.sleep(float(response.headers.get("Retry-After", RETRY_AFTER)))
+                continue
+            response.raise_for_status()
+            results = (await response.json())["results"]
+        # 실패한 이미지(다운로드/디코딩/태깅 오류)는 빼서 failed로 집계하고 기존 태그를 지우지 않음
+        return {result["image_url"]: result["tags"] for result in results if result.get("status", "ok") == "ok"}
+
+
+async def process_batch_remote(session, args, records, blobs: dict, writers, throughput: Throughput) -> dict:
+    """🔹 AI 서버 태깅 → 기록 (기록은 DB 입출력이므로 스레드에서 실행)"""
+    start = time.perf_counter()
+    tags = await tag_remote(session, args.server, records, blobs, args.stages)
+    throughput.add("remote", time.perf_counter() - start, len(tags))
+
+    start = time.perf_counter()
+    for writer in writers:
+        await asyncio.to_thread(writer.write, records, tags)
+    throughput.add("write", time.perf_counter() - start, len(records))
+
+    throughput.counters["tagged"] += len(tags)
+    throughput.counters["failed"] += len(records) - len(tags)
+    return tags
+
+
+async def run(args, records, pipeline, writers, checkpoint: Checkpoint, throughput: Throughput):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)  # 태깅은 한 스레드 (전처리 버퍼 재사용)
+    done = checkpoint.done
+    started = time.perf_counter()
+
+    async with aiohttp.ClientSession() as session:
+        pending = None  # 이전 배치 태깅 (다음 배치 다운로드와 겹쳐 실행)
+        for batch in batched(records, args.batch_size):
+            start = time.perf_counter()
+            blobs = await fetch_batch(session, batch, semaphore)
+            throughput.add("download", time.perf_counter() - start, len(blobs))
+            throughput.counters["bytes"] += sum(len(blob) for blob in blobs.values())
+
+            if pending is not None:
+                done = await _finish(pending, done, checkpoint, throughput, pipeline, started)
+            if args.server:
+                future = asyncio.ensure_future(process_batch_remote(session, args, batch, blobs, writers, throughput))
+            else:
+                future = loop.run_in_executor(executor, process_batch, pipeline, batch, blobs, writers, throughput)
+            pending = (batch, future)
+
+        if pending is not None:
+            done = await _finish(pending, done, checkpoint, throughput, pipeline, started)
+
+    executor.shutdown()
+    return done
+
+
+async def _finish(pending, done: int, checkpoint: Checkpoint, throughput: Throughput, pipeline, started: float) -> int:
+    batch, future = pending
+    await future
+    done += len(batch)
+    checkpoint.save(done, throughput.report(pipeline), last_id=batch[-1].get("image_id"))
+    elapsed = time.perf_counter() - started
+    print(f"📊 {done}개 완료 (이번 실행 {elapsed:.1f}초, 누적 태깅 {throughput.counters['tagged']}개)")
+    return done
+
+
+def print_report(report: dict):
+    print("📊 단계별 처리량")
+    for stage, row in report["stages"].items():
+        rate = row["images_per_sec"]
+        print(f"- {stage:<10} {row['images']:>8}개 {row['seconds']:>10.1f}초 {rate if rate is not None else '-':>10} images/s")
+    print(f"- 결과: {report['counters']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="저장된 이미지 일괄 재태깅")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--urls", help="URL 목록 파일 (줄마다 URL[\\tuser_id])")
+    source.add_argument("--from-db", action="store_true", help="백엔드 DB의 image 테이블 전체")
+    source.add_argument("--dir", help="로컬 이미지 폴더")
+    parser.add_argument("--user-id", help="사용자 ID (DB 입력은 해당 사용자로 제한, 나머지는 기본 user_id)")
+    parser.add_argument("--url-prefix", help="--dir 입력의 image_url 접두사 (예: S3 버킷 URL)")
+    parser.add_argument("--database-url", help="기본값: DATABASE_URL 환경 변수")
+    parser.add_argument("--output", help="NDJSON 출력 경로")
+    parser.add_argument("--write-db", action="store_true", help="image_tag 테이블 갱신")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=["place", "location"])
+    parser.add_argument("--face-shard-dir", help="인물 단계에서 사용할 얼굴 DB 샤드 폴더")
+    parser.add_argument("--server", help="AI 서버 주소 (예: http://localhost:8001/ai, 모델을 로드하지 않고 bulk로 요청)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16, help="동시 다운로드 수")
+    parser.add_argument("--checkpoint", help="체크포인트 경로 (있으면 이어서 처리)")
+    parser.add_argument("--restart", action="store_true", help="체크포인트 무시하고 처음부터")
+    parser.add_argument("--limit", type=int, help="최대 처리 이미지 수 (이번 실행 기준)")
+    args = parser.parse_args()
+
+    if not args.output and not args.write_db:
+        parser.error("--output 또는 --write-db 중 하나 이상이 필요합니다")
+    if args.server and args.face_shard_dir:
+        parser.error("--server 사용 시 얼굴 DB는 서버의 것을 사용하므로 --face-shard-dir를 지정할 수 없습니다")
+
+    job = {
+        "source": args.urls or args.dir or "db",
+        "user_id": args.user_id,
+        "url_prefix": args.url_prefix,
+        "stages": sorted(args.stages),
+    }
+    checkpoint = Checkpoint(args.checkpoint, job, restart=args.restart)
+    throughput = Throughput(checkpoint.stats)
+
+    engine = create_engine_from_env(args.database_url) if args.from_db or args.write_db else None
+    if args.from_db:
+        # 이전 형식 체크포인트(last_id 없음)는 완료된 수만큼 건너뜀
+        offset = checkpoint.done if checkpoint.last_id is None else 0
+        records = iter_database(engine, last_id=checkpoint.last_id, user_id=args.user_id, offset=offset)
+    else:
+        if args.urls:
+            records = iter_url_file(args.urls, args.user_id)
+        else:
+            records = iter_directory(args.dir, args.user_id, args.url_prefix)
+        records = islice(records, checkpoint.done, None)
+    if args.limit:
+        records = islice(records, args.limit)
+
+    companion_tagger = None
+    if "companion" in args.stages:
+        print("⚠️ 인물 단계: 재태깅한 얼굴이 얼굴 DB에 추가됩니다 (새 DB는 --face-shard-dir 사용)")
+    if "companion" in args.stages and not args.server:
+        from app.models.companion_tag import CompanionTagger
+        from app.utils.face_store import FaceStore
+        companion_tagger = CompanionTagger(FaceStore(args.face_shard_dir) if args.face_shard_dir else None)
+    pipeline = None if args.server else TaggingPipeline(stages=args.stages, companion_tagger=companion_tagger)
+
+    writers = []
+    if args.output:
+        writers.append(NdjsonWriter(args.output, append=checkpoint.done > 0))
+    if args.write_db:
+        writers.append(DatabaseWriter(engine, args.stages))
+
+    try:
+        asyncio.run(run(args, records, pipeline, writers, checkpoint, throughput))
+    finally:
+        for writer in writers:
+            writer.close()
+
+    print_report(throughput.report(pipeline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import asyncio
+import os
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+from mindlog_common.tracing import span
+
+INTERACTIVE = "interactive"  # 다이어리 작성 중 요청 (사용자가 기다림)
+BULK = "bulk"  # 재태깅 등 일괄 작업
+PRIORITIES = (INTERACTIVE, BULK)
+
+# ✅ 동시에 처리할 태깅 요청 수 (워커당)
+MAX_CONCURRENCY = int(os.getenv("TAGGING_MAX_CONCURRENCY", "2"))
+
+# ✅ bulk 요청이 동시에 차지할 수 있는 최대 슬롯 수 (나머지는 interactive 전용)
+BULK_MAX_CONCURRENCY = int(os.getenv("TAGGING_BULK_MAX_CONCURRENCY", str(max(1, MAX_CONCURRENCY - 1))))
+
+# ✅ 대기열 최대 길이 (초과 시 429)
+MAX_QUEUE_DEPTH = {
+    INTERACTIVE: int(os.getenv("TAGGING_MAX_QUEUE", "16")),
+    BULK: int(os.getenv("TAGGING_BULK_MAX_QUEUE", "4")),
+}
+
+# ✅ 429 응답의 Retry-After (초)
+RETRY_AFTER = int(os.getenv("TAGGING_RETRY_AFTER", "5"))
+
+
+class QueueFullError(Exception):
+    """🔹 대기열이 가득 차 요청을 받을 수 없음"""
+
+    def __init__(self, priority: str, retry_after: int = RETRY_AFTER):
+        super().__init__(f"{priority} 대기열 가득 참")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """🔹 태깅 요청 동시 실행 수 / 대기열 길이 제한 (우선순위 2단계)
+
+    interactive 대기 요청이 항상 bulk보다 먼저 슬롯을 받고, bulk는 BULK_MAX_CONCURRENCY개까지만
+    동시에 실행되므로 재태깅 작업 중에도 interactive 요청의 대기 시간이 일정하게 유지된다.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, bulk_max_concurrency: int = BULK_MAX_CONCURRENCY,
+                 max_queue_depth: dict = None):
+        self.max_concurrency = max_concurrency
+        self.bulk_max_concurrency = min(bulk_max_concurrency, max_concurrency)
+        self.max_queue_depth = max_queue_depth or dict(MAX_QUEUE_DEPTH)
+        self._running = {priority: 0 for priority in PRIORITIES}
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+        self.counters = Counter()
+
+    @asynccontextmanager
+    async def admit(self, priority: str = INTERACTIVE):
+        """🔹 실행 슬롯을 얻을 때까지 대기 (대기열이 가득 차면 QueueFullError)"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"알 수 없는 우선순위: {priority}")
+
+        if self._can_start(priority):
+            self._running[priority] += 1
+        else:
+            if len(self._waiting[priority]) >= self.max_queue_depth[priority]:
+                self.counters[f"rejected_{priority}"] += 1
+                raise QueueFullError(priority)
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiting[priority].append(waiter)
+            try:
+                with span("admission_wait", priority=priority, queue_depth=len(self._waiting[priority])):
+                    await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release(priority)  # 슬롯을 받은 직후 취소된 경우 반납
+                else:
+                    self._waiting[priority].remove(waiter)
+                raise
+
+        self.counters[f"admitted_{priority}"] += 1
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    def _can_start(self, priority: str) -> bool:
+        """🔹 대기 중인 요청을 앞지르지 않고 바로 실행 가능한지"""
+        if self._waiting[INTERACTIVE] or (priority == BULK and self._waiting[BULK]):
+            return False
+        return self._has_slot(priority)
+
+    def _has_slot(self, priority: str) -> bool:
+        if sum(self._running.values()) >= self.max_concurrency:
+            return False
+        return priority == INTERACTIVE or self._running[BULK] < self.bulk_max_concurrency
+
+    def _release(self, priority: str):
+        self._running[priority] -= 1
+        # interactive 대기 요청부터 슬롯 배정
+        for waiting_priority in PRIORITIES:
+            queue = self._waiting[waiting_priority]
+            while queue and self._has_slot(waiting_priority):
+                waiter = queue.popleft()
+                if waiter.done():  # 대기 중 취소됨
+                    continue
+                self._running[waiting_priority] += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict:
+        """🔹 현재 실행/대기 수 및 누적 승인/거절 수"""
+        return {
+            "running": dict(self._running),
+            "queue_depth": {priority: len(queue) for priority, queue in self._waiting.items()},
+            "max_concurrency": self.max_concurrency,
+            "max_queue_depth": dict(self.max_queue_depth),
+            "counters": dict(self.counters),
+        }
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+from mindlog_common.log import Sampler, get_logger
+
+from app.utils.face_compaction import person_centroid, person_count
+from app.utils.vector_index import VectorIndex, normalize
+
+# ✅ 얼굴 ↔ 인물 centroid 코사인 유사도 임계값 (배치 내/기존 DB 공통)
+MATCH_THRESHOLD = float(os.getenv("FACE_MATCH_THRESHOLD", "0.6"))
+
+# ✅ 얼굴 1개당 기존 DB 인덱스에서 가져올 후보 인물 수
+CANDIDATES = int(os.getenv("FACE_MATCH_CANDIDATES", "5"))
+
+logger = get_logger(__name__)
+assign_trace = Sampler(logger)  # 배정 1건당 debug 로그 (N건에 1건만 기록)
+
+
+class OnlineFaceClusterer:
+    """🔹 running centroid 기반 증분 얼굴 클러스터링
+
+    얼굴 임베딩을 하나씩 받아 가장 가까운 인물 centroid에 배정하거나 새 인물을 만든다.
+    기존 DB 인물과 이번 요청에서 새로 생긴 인물을 같은 임계값으로 한 번에 비교하며,
+    후보는 DB 인덱스 top-k + 이번 요청에서 갱신된 인물로 제한되어 얼굴당 비용이 일정하다.
+    """
+
+    def __init__(self, database: dict, index: VectorIndex = None, threshold: float = MATCH_THRESHOLD,
+                 candidates: int = CANDIDATES):
+        self.database = database
+        self.index = index
+        self.threshold = threshold
+        self.candidates = candidates
+        self.updates = {}  # person_id → 이번 요청에서 추가된 임베딩 목록
+        self.new_ids = []  # 이번 요청에서 새로 만든 인물 ID (DB 기록 전 임시 ID)
+        self._centroids = {}  # person_id → (centroid 합, count) : 이번 요청에서 갱신/생성된 인물
+        self._next_id = max([int(pid.split('_')[1]) for pid in database.keys()], default=0) + 1
+
+    def assign(self, url: str, embedding: np.ndarray):
+        """🔹 얼굴 임베딩을 인물에 배정 → (person_id, 새 인물 여부, 유사도)"""
+        query = normalize(embedding)[0]
+
+        candidate_ids = set(self._centroids)
+        if self.index is not None and len(self.index):
+            # 인덱스는 스냅샷 이후 다른 요청의 인물이 추가됐을 수 있으므로 스냅샷에 있는 인물만 사용
+            candidate_ids.update(person_id for person_id, _ in self.index.search(query, k=self.candidates)
+                                 if person_id in self.database)
+
+        best_match, max_similarity = None, -1.0
+        for person_id in candidate_ids:
+            similarity = float(normalize(self._centroid(person_id))[0] @ query)
+            if similarity > max_similarity:
+                best_match, max_similarity = person_id, similarity
+
+        assign_trace.debug("얼굴 배정 후보: %s → 후보 %d명, 최고 %s (유사도: %.3f)",
+                           url, len(candidate_ids), best_match, max_similarity)
+        is_new = best_match is None or max_similarity < self.threshold
+        if is_new:
+            best_match = f"person_{self._next_id}"
+            self._next_id += 1
+            self.new_ids.append(best_match)
+
+        total, count = self._centroids.get(best_match, (None, 0))
+        if total is None and best_match in self.database:
+            count = person_count(self.database[best_match])
+            total = person_centroid(self.database[best_match]) * count
+        self._centroids[best_match] = ((0 if total is None else total) + np.asarray(embedding, dtype=np.float32), count + 1)
+
+        self.updates.setdefault(best_match, []).append({"url": url, "embedding": np.asarray(embedding).tolist()})
+        return best_match, is_new, max_similarity
+
+    def _centroid(self, person_id: str) -> np.ndarray:
+        if person_id in self._centroids:
+            total, count = self._centroids[person_id]
+            return total / count
+        return person_centroid(self.database[person_id])
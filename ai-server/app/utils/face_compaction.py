@@ -0,0 +1,222 @@
+"""얼굴 DB 인물별 프로토타입 압축
+
+인물마다 모든 임베딩을 쌓는 대신 running centroid + 최대 K개의 대표 임베딩(exemplar)만 유지한다.
+- 온라인 정책: add_embeddings() → 요청 처리 중 임베딩 추가 시 centroid 갱신 및 exemplar 정리
+- 오프라인 작업: compact_database() / CLI → exemplar 재선정 + centroid가 가까운 인물 병합
+
+CLI 실행 예시 (ai-server 디렉토리에서):
+    python -m app.utils.face_compaction --all --max-exemplars 10 --merge-threshold 0.8 --id-map-out merges.jsonl
+
+병합된 person ID는 백엔드에 인물 태그로 저장되어 있으므로, --id-map-out 파일을 백엔드에서 적용한다:
+    python -m app.scripts.apply_person_merges merges.jsonl   (backend 디렉토리에서)
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from app.utils.vector_index import normalize
+
+# ✅ 인물별 최대 exemplar 수 (K)
+MAX_EXEMPLARS = int(os.getenv("FACE_MAX_EXEMPLARS", "10"))
+
+# ✅ centroid 코사인 유사도가 이 값 이상이면 같은 인물로 병합
+MERGE_THRESHOLD = float(os.getenv("FACE_MERGE_THRESHOLD", "0.8"))
+
+
+def person_centroid(person_data: dict) -> np.ndarray:
+    """🔹 저장된 centroid 반환 (기존 데이터는 임베딩 평균으로 계산)"""
+    if "centroid" in person_data:
+        return np.asarray(person_data["centroid"], dtype=np.float32)
+    vectors = np.array([data["embedding"] for data in person_data["embeddings"]], dtype=np.float32)
+    return vectors.mean(axis=0)
+
+
+def person_count(person_data: dict) -> int:
+    return person_data.get("count", len(person_data["embeddings"]))
+
+
+def _replace_embeddings(person_data: dict, embeddings: list):
+    """🔹 임베딩 목록을 통째로 교체 (추가만 한 게 아니므로 generation을 올려 검색 인덱스가 다시 만들어지게 함)"""
+    person_data["embeddings"] = embeddings
+    person_data["generation"] = person_data.get("generation", 0) + 1
+
+
+def select_exemplars(embeddings: list, k: int, centroid: np.ndarray) -> list:
+    """🔹 farthest-point sampling으로 서로 가장 다른 k개의 임베딩 선택
+
+    centroid에 가장 가까운 임베딩에서 시작해, 이미 선택된 것들과의 최소 거리가
+    가장 큰 임베딩을 차례로 추가한다.
+    """
+    if len(embeddings) <= k:
+        return list(embeddings)
+
+    vectors = normalize([data["embedding"] for data in embeddings])
+    first = int(np.argmax(vectors @ normalize(centroid)[0]))
+    selected = [first]
+    min_distance = 1 - vectors @ vectors[first]
+    for _ in range(k - 1):
+        min_distance[selected] = -1
+        next_idx = int(np.argmax(min_distance))
+        selected.append(next_idx)
+        min_distance = np.minimum(min_distance, 1 - vectors @ vectors[next_idx])
+
+    return [embeddings[i] for i in sorted(selected)]
+
+
+def add_embeddings(person_data: dict, new_embeddings: list, max_exemplars: int = MAX_EXEMPLARS):
+    """🔹 온라인 정책: centroid/count 갱신 후 exemplar가 2K개에 도달하면 K개로 정리
+
+    매 요청마다 정리하면 검색 인덱스를 계속 다시 만들어야 하므로 2K까지는 그대로 쌓는다.
+    """
+    if not new_embeddings:
+        return person_data
+
+    count = person_count(person_data) if person_data.get("embeddings") else 0
+    centroid = person_centroid(person_data) * count if count else 0
+    new_vectors = np.array([data["embedding"] for data in new_embeddings], dtype=np.float32)
+    count += len(new_vectors)
+    centroid = (centroid + new_vectors.sum(axis=0)) / count
+
+    person_data.setdefault("embeddings", []).extend(new_embeddings)
+    person_data["centroid"] = centroid.tolist()
+    person_data["count"] = count
+
+    if len(person_data["embeddings"]) >= 2 * max_exemplars:
+        _replace_embeddings(person_data, select_exemplars(person_data["embeddings"], max_exemplars, centroid))
+    return person_data
+
+
+def merge_identities(database: dict, threshold: float = MERGE_THRESHOLD):
+    """🔹 centroid 유사도가 threshold 이상인 인물을 병합 (번호가 작은 인물로 통합)
+
+    반환값: (병합된 database, {병합되어 사라진 person_id: 남은 person_id})
+    """
+    person_ids = sorted(database.keys(), key=lambda x: int(x.split('_')[1]))
+    if len(person_ids) < 2:
+        return database, {}
+
+    centroids = normalize([person_centroid(database[pid]) for pid in person_ids])
+    similarity = centroids @ centroids.T
+
+    parent = list(range(len(person_ids)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*np.nonzero(np.triu(similarity >= threshold, k=1))):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    merged = {}
+    mapping = {}
+    for i, person_id in enumerate(person_ids):
+        target = person_ids[find(i)]
+        person_data = database[person_id]
+        if target == person_id:
+            merged[person_id] = dict(person_data)
+            continue
+
+        mapping[person_id] = target
+        base = merged[target]
+        base_count, count = person_count(base), person_count(person_data)
+        centroid = (person_centroid(base) * base_count + person_centroid(person_data) * count) / (base_count + count)
+        _replace_embeddings(base, base["embeddings"] + person_data["embeddings"])
+        base["centroid"] = centroid.tolist()
+        base["count"] = base_count + count
+
+    return merged, mapping
+
+
+def compact_database(database: dict, max_exemplars: int = MAX_EXEMPLARS, merge_threshold: float = MERGE_THRESHOLD):
+    """🔹 오프라인 압축: 인물 병합 후 인물별 exemplar를 K개로 재선정"""
+    before = sum(len(person["embeddings"]) for person in database.values())
+    if merge_threshold is not None:
+        database, mapping = merge_identities(database, merge_threshold)
+    else:
+        mapping = {}
+
+    for person_data in database.values():
+        centroid = person_centroid(person_data)
+        person_data["count"] = person_count(person_data)
+        person_data["centroid"] = centroid.tolist()
+        _replace_embeddings(person_data, select_exemplars(person_data["embeddings"], max_exemplars, centroid))
+
+    stats = {
+        "people": len(database),
+        "merged": mapping,
+        "embeddings_before": before,
+        "embeddings_after": sum(len(person["embeddings"]) for person in database.values()),
+    }
+    return database, stats
+
+
+def remap_face_images(faces_dir: str, mapping: dict):
+    """🔹 병합되어 사라진 인물의 대표 얼굴 이미지를 남은 인물 것으로 옮기거나 (없으면) 삭제"""
+    for merged_id, target_id in mapping.items():
+        merged_path = os.path.join(faces_dir, f"{merged_id}.jpg")
+        if not os.path.exists(merged_path):
+            continue
+        target_path = os.path.join(faces_dir, f"{target_id}.jpg")
+        if os.path.exists(target_path):
+            os.remove(merged_path)
+        else:
+            os.replace(merged_path, target_path)
+
+
+def _shard_user_ids(store):
+    user_ids = [None]  # 기존 전역 DB
+    if os.path.isdir(store.shard_dir):
+        user_ids += sorted(name[:-5] for name in os.listdir(store.shard_dir) if name.endswith(".json"))
+    return user_ids
+
+
+def main():
+    from app.utils.face_store import FaceStore  # face_store가 이 모듈을 import하므로 지연 import
+
+    parser = argparse.ArgumentParser(description="얼굴 DB 프로토타입 압축")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--user-id", help="압축할 사용자 샤드")
+    target.add_argument("--all", action="store_true", help="모든 샤드 압축")
+    parser.add_argument("--max-exemplars", type=int, default=MAX_EXEMPLARS)
+    parser.add_argument("--merge-threshold", type=float, default=MERGE_THRESHOLD)
+    parser.add_argument("--no-merge", action="store_true", help="인물 병합 생략")
+    parser.add_argument("--dry-run", action="store_true", help="저장하지 않고 결과만 출력")
+    parser.add_argument("--id-map-out", help="병합된 person ID 매핑을 추가할 JSON Lines 파일 (백엔드 태그 반영용)")
+    args = parser.parse_args()
+
+    store = FaceStore()
+    user_ids = _shard_user_ids(store) if args.all else [args.user_id]
+    merge_threshold = None if args.no_merge else args.merge_threshold
+
+    for user_id in user_ids:
+        if not store.load(user_id):
+            continue
+
+        stats = {}
+
+        def compact(database):
+            database, result = compact_database(database, args.max_exemplars, merge_threshold)
+            stats.update(result)
+            return database
+
+        if args.dry_run:
+            compact(json.loads(json.dumps(store.load(user_id))))
+        else:
+            # writer lock 안에서 최신 상태 기준으로 압축 (서버가 동시에 써도 유실 없음)
+            store.rewrite(compact, user_id)
+            if stats["merged"]:
+                remap_face_images(store.faces_dir(user_id), stats["merged"])
+                if args.id_map_out:
+                    with open(args.id_map_out, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"user_id": user_id, "id_map": stats["merged"]}) + "\n")
+        print(f"✅ {store.shard_id(user_id)}: {json.dumps(stats, ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
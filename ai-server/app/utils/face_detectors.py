@@ -0,0 +1,157 @@
+import os
+import threading
+from collections import Counter
+
+import cv2
+import numpy as np
+
+from mindlog_common.log import get_logger
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # ai-server 경로
+
+logger = get_logger(__name__)
+
+# ✅ 사용할 검출기: cascade(YuNet → 애매하면 RetinaFace) / yunet / retinaface
+FACE_DETECTOR = os.getenv("FACE_DETECTOR", "cascade")
+
+# ✅ YuNet ONNX 가중치 (opencv_zoo의 face_detection_yunet_2023mar.onnx)
+YUNET_MODEL_PATH = os.getenv(
+    "YUNET_MODEL_PATH", os.path.join(BASE_DIR, "data", "models", "face_detection_yunet_2023mar.onnx")
+)
+
+# ✅ cascade 기준: 빠른 검출기 점수가 ACCEPT 이상이면 그대로 사용, FLOOR~ACCEPT 사이 얼굴이 있으면 RetinaFace로 재검출
+CASCADE_ACCEPT = float(os.getenv("FACE_CASCADE_ACCEPT", "0.9"))
+CASCADE_FLOOR = float(os.getenv("FACE_CASCADE_FLOOR", "0.5"))
+
+
+class FaceDetector:
+    """🔹 얼굴 검출기 인터페이스
+
+    detect()는 RGB uint8 이미지를 받아 DeepFace.extract_faces와 같은 형식의 목록을 반환한다.
+    [{"face": 정렬된 얼굴 (RGB uint8), "facial_area": {"x", "y", "w", "h"}, "confidence": float}]
+    """
+
+    name = "base"
+
+    def detect(self, image: np.ndarray) -> list:
+        raise NotImplementedError
+
+
+class RetinaFaceDetector(FaceDetector):
+    """🔹 DeepFace RetinaFace (정확하지만 CPU에서 가장 느림)"""
+
+    name = "retinaface"
+
+    def detect(self, image: np.ndarray) -> list:
+        from deepface import DeepFace
+
+        faces = DeepFace.extract_faces(
+            img_path=image[:, :, ::-1],  # DeepFace 입력은 BGR
+            detector_backend='retinaface',
+            enforce_detection=False,
+            align=True
+        )
+        results = []
+        for face in faces:
+            # enforce_detection=False일 때 얼굴이 없으면 전체 이미지가 confidence 0으로 반환됨
+            if not face.get('confidence'):
+                continue
+            face_array = face['face']
+            if face_array.dtype != np.uint8:
+                face_array = (face_array * 255).astype(np.uint8)
+            results.append({
+                "face": face_array,
+                "facial_area": face['facial_area'],
+                "confidence": float(face['confidence']),
+            })
+        return results
+
+
+class YuNetDetector(FaceDetector):
+    """🔹 OpenCV YuNet (cv2.FaceDetectorYN, opencv-python-headless에 포함된 경량 검출기)"""
+
+    name = "yunet"
+
+    def __init__(self, model_path: str = YUNET_MODEL_PATH, score_threshold: float = CASCADE_FLOOR):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet 모델 파일 없음: {model_path}")
+        self.model_path = model_path
+        self.score_threshold = score_threshold
+        self._local = threading.local()  # cv2 검출기 객체는 스레드별로 생성
+
+    def _detector(self, width: int, height: int):
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = cv2.FaceDetectorYN.create(self.model_path, "", (width, height), self.score_threshold)
+            self._local.detector = detector
+        detector.setInputSize((width, height))
+        return detector
+
+    def detect(self, image: np.ndarray) -> list:
+        height, width = image.shape[:2]
+        _, detections = self._detector(width, height).detect(np.ascontiguousarray(image[:, :, ::-1]))
+        if detections is None:
+            return []
+
+        results = []
+        for row in detections:
+            x, y, w, h = (int(round(v)) for v in row[:4])
+            x, y = max(x, 0), max(y, 0)
+            w, h = min(w, width - x), min(h, height - y)
+            if w <= 0 or h <= 0:
+                continue
+            results.append({
+                "face": self._align(image, row, (x, y, w, h)),
+                "facial_area": {"x": x, "y": y, "w": w, "h": h},
+                "confidence": float(row[-1]),
+            })
+        return results
+
+    @staticmethod
+    def _align(image: np.ndarray, row: np.ndarray, box) -> np.ndarray:
+        """🔹 두 눈이 수평이 되도록 회전 후 얼굴 영역 잘라내기"""
+        x, y, w, h = box
+        right_eye, left_eye = row[4:6], row[6:8]
+        angle = np.degrees(np.arctan2(left_eye[1] - right_eye[1], left_eye[0] - right_eye[0]))
+        center = (float((right_eye[0] + left_eye[0]) / 2), float((right_eye[1] + left_eye[1]) / 2))
+        rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(image, rotation, (image.shape[1], image.shape[0]))
+        return rotated[y:y + h, x:x + w].copy()
+
+
+class CascadeDetector(FaceDetector):
+    """🔹 빠른 검출기 우선, 애매한(낮은 점수) 얼굴이 있을 때만 RetinaFace로 재검출"""
+
+    name = "cascade"
+
+    def __init__(self, fast: FaceDetector, fallback: FaceDetector,
+                 accept: float = CASCADE_ACCEPT, floor: float = CASCADE_FLOOR):
+        self.fast = fast
+        self.fallback = fallback
+        self.accept = accept
+        self.floor = floor
+        self.stats = Counter()
+
+    def detect(self, image: np.ndarray) -> list:
+        faces = [face for face in self.fast.detect(image) if face["confidence"] >= self.floor]
+        if any(face["confidence"] < self.accept for face in faces):
+            self.stats["fallback"] += 1
+            return self.fallback.detect(image)
+        self.stats["fast"] += 1
+        return faces
+
+
+def create_detector(name: str = FACE_DETECTOR) -> FaceDetector:
+    """🔹 설정에 맞는 검출기 생성 (YuNet 모델이 없으면 RetinaFace로 대체)"""
+    if name not in ("cascade", "yunet", "retinaface"):
+        raise ValueError(f"알 수 없는 얼굴 검출기: {name}")
+    if name == "retinaface":
+        return RetinaFaceDetector()
+    try:
+        fast = YuNetDetector()
+    except Exception as e:
+        logger.warning("⚠️ YuNet 검출기 사용 불가 → RetinaFace 사용: %s", e)
+        return RetinaFaceDetector()
+    if name == "yunet":
+        return fast
+    return CascadeDetector(fast, RetinaFaceDetector())
@@ -0,0 +1,58 @@
+import os
+import threading
+from collections import Counter
+
+import cv2
+import numpy as np
+
+# ✅ 검출기 confidence 최솟값
+MIN_CONFIDENCE = float(os.getenv("FACE_MIN_CONFIDENCE", "0.9"))
+
+# ✅ 얼굴 박스 짧은 변 / 이미지 짧은 변 최솟값 (1024x1024 기준 0.04 ≈ 41px)
+MIN_SIZE_RATIO = float(os.getenv("FACE_MIN_SIZE_RATIO", "0.04"))
+
+# ✅ Laplacian 분산 최솟값 (낮을수록 흐린 얼굴)
+MIN_BLUR_SCORE = float(os.getenv("FACE_MIN_BLUR_SCORE", "30"))
+
+# 흐림 점수는 얼굴 크기에 영향을 받으므로 같은 크기로 맞춘 뒤 계산 (Facenet 입력 크기)
+BLUR_SIZE = 160
+
+
+class FaceQualityGate:
+    """🔹 임베딩 전 얼굴 품질 검사 (confidence / 크기 / 흐림)
+
+    배경의 작은 얼굴이나 흐린 얼굴은 Facenet 연산만 늘리고 얼굴 DB를 오염시키므로
+    임베딩 추출 전에 걸러낸다. 통과/탈락 사유별 개수는 stats에 누적된다.
+    """
+
+    def __init__(self, min_confidence: float = MIN_CONFIDENCE, min_size_ratio: float = MIN_SIZE_RATIO,
+                 min_blur_score: float = MIN_BLUR_SCORE):
+        self.min_confidence = min_confidence
+        self.min_size_ratio = min_size_ratio
+        self.min_blur_score = min_blur_score
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def check(self, face: np.ndarray, facial_area: dict, confidence, image_size) -> str:
+        """🔹 품질 검사 → 탈락 사유 반환 (통과 시 None)
+
+        face: 정렬된 얼굴 (RGB uint8), facial_area: {"x", "y", "w", "h"}, image_size: (width, height)
+        """
+        reason = None
+        if confidence is not None and confidence < self.min_confidence:
+            reason = "confidence"
+        elif min(facial_area.get("w", 0), facial_area.get("h", 0)) < self.min_size_ratio * min(image_size):
+            reason = "size"
+        elif self.blur_score(face) < self.min_blur_score:
+            reason = "blur"
+
+        with self._lock:
+            self.stats["accepted" if reason is None else f"rejected_{reason}"] += 1
+        return reason
+
+    @staticmethod
+    def blur_score(face: np.ndarray) -> float:
+        """🔹 Laplacian 분산 (고정 크기 흑백 이미지 기준)"""
+        gray = cv2.cvtColor(face, cv2.COLOR_RGB2GRAY) if face.ndim == 3 else face
+        gray = cv2.resize(gray, (BLUR_SIZE, BLUR_SIZE), interpolation=cv2.INTER_AREA)
+        return float(cv2.Laplacian(gray, cv2.CV_64F).var())
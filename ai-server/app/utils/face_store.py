@@ -0,0 +1,389 @@
+import fcntl
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from app.utils.face_compaction import add_embeddings
+from app.utils.vector_index import VectorIndex
+from mindlog_common.log import get_logger
+from app.utils.metrics import CACHE_EVENTS
+
+# ✅ ai-server/data 경로 기준으로 샤드 저장 위치 설정
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # ai-server 경로
+DATA_DIR = os.path.join(BASE_DIR, "data")
+LEGACY_DATABASE_PATH = os.path.join(DATA_DIR, "face_database.json")  # user_id 없는 요청용 (기존 전역 DB)
+SHARD_DIR = os.path.join(DATA_DIR, "face_shards")  # ai-server/data/face_shards/{user_id}.json
+
+DEFAULT_SHARD = "default"
+
+logger = get_logger(__name__)
+
+# ✅ 메모리에 유지할 샤드들의 최대 크기 (MB)
+SHARD_MEMORY_BUDGET = int(os.getenv("FACE_SHARD_MEMORY_BUDGET_MB", "256")) * 1024 * 1024
+
+# ✅ WAL이 이 크기(KB)를 넘으면 스냅샷으로 체크포인트 후 WAL 비움
+WAL_CHECKPOINT_BYTES = int(os.getenv("FACE_WAL_CHECKPOINT_KB", "4096")) * 1024
+
+# JSON에서 로드된 임베딩 1개(float 128개 리스트 + url)가 차지하는 대략적인 메모리
+EMBEDDING_BYTES = 128 * 32 + 256
+INDEX_BYTES = 128 * 4  # 검색 인덱스의 float32 벡터
+
+_SAFE_USER_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class _Shard:
+    """🔹 캐시에 올라간 샤드 상태 (스냅샷 + 반영된 WAL 위치 + 검색 인덱스)"""
+
+    def __init__(self, database: dict, seq: int, wal_offset: int, signature, last_id: int = 0):
+        self.database = database  # 변경 시 통째로 교체 (읽는 쪽은 받은 dict를 그대로 사용)
+        self.seq = seq  # 마지막으로 반영된 WAL 레코드 번호
+        self.last_id = last_id  # 지금까지 발급한 가장 큰 person 번호 (병합으로 사라진 번호도 재사용하지 않음)
+        self.wal_offset = wal_offset
+        self.signature = signature  # 스냅샷 파일 (inode, mtime, size)
+        self.size = 0
+        self.index = None
+        self.index_counts = {}
+        self.lock = threading.Lock()  # WAL 따라 읽기 / 인덱스 갱신 직렬화 (전역 lock과 달리 오래 잡을 수 있음)
+
+
+class FaceStore:
+    """🔹 사용자별 얼굴 DB 샤드 관리 (지연 로드 + LRU 캐시 + 단일 writer/WAL)
+
+    샤드 파일 구성:
+    - {shard}.json : 체크포인트 스냅샷 {"seq": N, "people": {...}}
+    - {shard}.json.wal : 스냅샷 이후 변경분 (JSON Lines, 레코드마다 seq)
+    - {shard}.json.lock : 워커 간 쓰기 직렬화용 lock 파일 (flock)
+
+    쓰기는 lock을 잡은 한 워커만 WAL에 append → fsync 후 메모리 스냅샷을 교체한다.
+    읽기는 lock 없이 현재 스냅샷을 받고, 다른 워커가 WAL에 추가한 레코드만 따라 읽는다.
+    서버가 비정상 종료되면 다음 로드 시 스냅샷 + WAL 재생으로 복구된다.
+
+    person ID는 백엔드 태그 이름으로 쓰이므로 샤드 안에서 한 번 발급한 번호는 다시 쓰지 않는다.
+    새 샤드의 번호는 기존 전역 DB(face_database.json)의 마지막 번호 다음부터 시작해,
+    샤드 도입 전에 저장된 인물 태그와 겹치지 않는다.
+    """
+
+    def __init__(self, shard_dir: str = SHARD_DIR, memory_budget: int = SHARD_MEMORY_BUDGET,
+                 checkpoint_bytes: int = WAL_CHECKPOINT_BYTES, legacy_path: str = LEGACY_DATABASE_PATH):
+        self.shard_dir = shard_dir
+        self.legacy_path = legacy_path
+        self.memory_budget = memory_budget
+        self.checkpoint_bytes = checkpoint_bytes
+        self._shards = OrderedDict()  # shard_id → _Shard
+        self._memory_used = 0
+        self._lock = threading.Lock()  # 캐시 구조 보호 (짧게만 잡음)
+        self._write_locks = {}  # shard_id → threading.Lock (프로세스 내 writer 직렬화)
+        self._legacy_last_id = None  # 기존 전역 DB의 마지막 person 번호 (처음 필요할 때 한 번 읽음)
+
+    def shard_id(self, user_id) -> str:
+        """🔹 user_id를 파일명으로 안전한 샤드 ID로 변환"""
+        if user_id is None:
+            return DEFAULT_SHARD
+        user_id = str(user_id)
+        if not _SAFE_USER_ID.match(user_id):
+            raise ValueError(f"잘못된 user_id: {user_id}")
+        return user_id
+
+    def shard_path(self, user_id) -> str:
+        shard_id = self.shard_id(user_id)
+        if shard_id == DEFAULT_SHARD:
+            return self.legacy_path
+        return os.path.join(self.shard_dir, f"{shard_id}.json")
+
+    def faces_dir(self, user_id) -> str:
+        """🔹 샤드별 대표 얼굴 이미지 저장 경로"""
+        shard_id = self.shard_id(user_id)
+        if shard_id == DEFAULT_SHARD:
+            return os.path.join(DATA_DIR, "faces")
+        return os.path.join(os.path.dirname(self.shard_dir), "faces", shard_id)
+
+    def load(self, user_id=None) -> dict:
+        """🔹 샤드의 현재 스냅샷 반환 (캐시 미스 시 지연 로드, 다른 워커의 WAL 변경분 반영)
+
+        반환된 dict는 이후 쓰기로 변경되지 않으므로 읽기 전용으로 사용한다.
+        """
+        return self._get(user_id).database
+
+    def index(self, user_id=None) -> VectorIndex:
+        """🔹 샤드의 검색 인덱스 반환 (없으면 샤드 내용으로 생성)"""
+        return self.snapshot(user_id)[1]
+
+    def snapshot(self, user_id=None):
+        """🔹 같은 시점의 (스냅샷, 검색 인덱스) 반환"""
+        shard = self._get(user_id)
+        with shard.lock:
+            database = shard.database
+            return database, self._sync_index(shard, database)
+
+    def commit(self, updates: dict, user_id=None, new_ids=()) -> dict:
+        """🔹 인물별 임베딩 추가를 WAL에 기록하고 스냅샷 교체
+
+        new_ids는 이번 요청에서 새로 만든 인물의 임시 ID이다. 그 사이 다른 워커가 같은 ID를
+        만들었거나 이미 발급된 적 있는 번호라면 새 번호로 바꿔 기록하고, {임시 ID: 최종 ID} 매핑을 반환한다.
+        """
+        shard_id = self.shard_id(user_id)
+        path = self.shard_path(user_id)
+
+        with self._writer(shard_id, path):
+            shard = self._get(user_id)
+            database = shard.database
+
+            id_map = {}
+            next_id = max([shard.last_id, *map(_person_number, new_ids)]) + 1
+            for person_id in new_ids:
+                if person_id in database or _person_number(person_id) <= shard.last_id:
+                    id_map[person_id] = f"person_{next_id}"
+                    next_id += 1
+            updates = {id_map.get(pid, pid): embeddings for pid, embeddings in updates.items()}
+
+            record = {"seq": shard.seq + 1, "updates": updates}
+            with open(path + ".wal", "ab") as f:
+                f.truncate(shard.wal_offset)  # 비정상 종료로 남은 쓰다 만 줄 제거
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+                wal_offset = f.tell()
+
+            new_database = _apply(database, updates)
+            with self._lock:
+                if shard.seq < record["seq"]:  # 읽기 쪽에서 이미 재생했을 수 있음
+                    shard.database, shard.seq = new_database, record["seq"]
+                    shard.last_id = max(shard.last_id, _max_person_number(updates))
+                shard.wal_offset = max(shard.wal_offset, wal_offset)
+                self._resize(shard_id, shard)
+
+            if wal_offset >= self.checkpoint_bytes:
+                self._checkpoint(shard, path)
+
+        return id_map
+
+    def rewrite(self, transform, user_id=None):
+        """🔹 샤드 전체를 변환해 새 스냅샷으로 저장 (오프라인 압축 등, writer lock 안에서 실행)"""
+        shard_id = self.shard_id(user_id)
+        path = self.shard_path(user_id)
+
+        with self._writer(shard_id, path):
+            shard = self._get(user_id)
+            new_database = transform(json.loads(json.dumps(shard.database)))
+            with self._lock:
+                shard.database = new_database
+                self._resize(shard_id, shard)
+            self._checkpoint(shard, path)
+        return new_database
+
+    @contextmanager
+    def _writer(self, shard_id: str, path: str):
+        """🔹 프로세스 내 lock + 워커 간 lock 파일(flock)으로 샤드 writer를 하나로 제한"""
+        with self._lock:
+            write_lock = self._write_locks.setdefault(shard_id, threading.Lock())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with write_lock, open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _checkpoint(self, shard: _Shard, path: str):
+        """🔹 현재 스냅샷을 원자적으로 저장(tmp → rename) 후 WAL 비우기 (writer lock 안에서 호출)"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": shard.seq, "last_id": shard.last_id, "people": shard.database}, f,
+                      ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        open(path + ".wal", "w").close()
+
+        with self._lock:
+            shard.signature = _signature(path)
+            shard.wal_offset = 0
+
+    def _get(self, user_id) -> _Shard:
+        shard_id = self.shard_id(user_id)
+        path = self.shard_path(user_id)
+        with self._lock:
+            shard = self._shards.get(shard_id)
+            if shard is not None:
+                self._shards.move_to_end(shard_id)
+        if shard is not None:
+            CACHE_EVENTS.inc(cache="face_shard", result="hit")
+            self._refresh(shard_id, shard, path)
+            return shard
+
+        CACHE_EVENTS.inc(cache="face_shard", result="miss")
+        shard = self._open(path, seed=shard_id != DEFAULT_SHARD)
+        with self._lock:
+            if shard_id in self._shards:  # 다른 스레드가 먼저 로드한 경우
+                return self._shards[shard_id]
+            self._shards[shard_id] = shard
+            self._resize(shard_id, shard)
+        return shard
+
+    def _open(self, path: str, seed: bool = False) -> _Shard:
+        """🔹 스냅샷 로드 후 WAL 재생 (비정상 종료 후 복구 포함)
+
+        seed가 True이고 스냅샷에 last_id가 없으면 (새 샤드) 기존 전역 DB의 마지막 번호부터 발급한다.
+        """
+        signature = _signature(path)
+        database, seq, last_id = {}, 0, None
+        if signature is not None:
+            with open(path, "r", encoding="utf-8") as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError:
+                    logger.warning("⚠️ 얼굴 DB 샤드 JSON 로드 실패 → 초기화 진행: %s", path)
+                    data = {}
+            if "people" in data and "seq" in data:
+                database, seq, last_id = data["people"], data["seq"], data.get("last_id")
+            else:
+                database = data  # 기존 형식 (person_id → 데이터)
+
+        if last_id is None:
+            last_id = self._legacy_floor() if seed else 0
+        shard = _Shard(database, seq, 0, signature, max(last_id, _max_person_number(database)))
+        self._replay(shard, path)
+        return shard
+
+    def _legacy_floor(self) -> int:
+        """🔹 기존 전역 DB에서 발급된 마지막 person 번호 (백엔드에 이미 그 번호의 태그가 있음)"""
+        if self._legacy_last_id is None:
+            self._legacy_last_id = self._open(self.legacy_path).last_id
+        return self._legacy_last_id
+
+    def _refresh(self, shard_id: str, shard: _Shard, path: str):
+        """🔹 다른 워커가 쓴 변경분 반영 (스냅샷이 바뀌었으면 다시 로드)
+
+        파일 확인/읽기는 전역 lock 밖에서 샤드별 lock으로만 직렬화하고 (다른 샤드 조회를 막지 않음),
+        읽은 결과는 전역 lock 안에서 교체한다. 그 사이 이 워커의 commit/체크포인트로 샤드가 바뀌었다면
+        읽은 결과를 버린다 (다음 조회 때 다시 확인).
+        """
+        with shard.lock:
+            with self._lock:
+                base = (shard.signature, shard.wal_offset, shard.seq)
+                current = _Shard(shard.database, shard.seq, shard.wal_offset, shard.signature, shard.last_id)
+
+            wal_size = _size(path + ".wal")
+            if _signature(path) != current.signature or wal_size < current.wal_offset:
+                fresh = self._open(path, seed=shard_id != DEFAULT_SHARD)
+            elif wal_size > current.wal_offset:
+                fresh = current
+                self._replay(fresh, path)
+            else:
+                return
+
+            with self._lock:
+                if (shard.signature, shard.wal_offset, shard.seq) != base:
+                    return
+                if fresh.seq >= shard.seq:
+                    shard.database, shard.seq = fresh.database, fresh.seq
+                    shard.last_id = max(shard.last_id, fresh.last_id)
+                shard.wal_offset, shard.signature = fresh.wal_offset, fresh.signature
+                self._resize(shard_id, shard)
+
+    def _replay(self, shard: _Shard, path: str):
+        """🔹 WAL에서 아직 반영하지 않은 레코드 적용 (쓰다 만 마지막 줄은 무시)"""
+        wal_path = path + ".wal"
+        if not os.path.exists(wal_path):
+            return
+        with open(wal_path, "rb") as f:
+            f.seek(shard.wal_offset)
+            chunk = f.read()
+
+        end = chunk.rfind(b"\n") + 1
+        database = shard.database
+        for line in chunk[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("⚠️ 손상된 WAL 레코드 무시: %s", wal_path)
+                continue
+            if record["seq"] > shard.seq:
+                database = _apply(database, record["updates"])
+                shard.seq = record["seq"]
+                shard.last_id = max(shard.last_id, _max_person_number(record["updates"]))
+        shard.database = database
+        shard.wal_offset += end
+
+    def _sync_index(self, shard: _Shard, database: dict) -> VectorIndex:
+        """🔹 DB에 새로 추가된 임베딩만 인덱스에 증분 반영 (ID 삭제나 exemplar 재선정 시 재생성)
+
+        임베딩 목록이 교체되면 (압축/병합) 인물의 generation이 바뀌므로, 개수가 다시 늘어났더라도
+        이전에 인덱스에 넣은 임베딩과 다르다는 것을 알 수 있다. (shard.lock 안에서 호출)
+        """
+        index, counts = shard.index, shard.index_counts
+        stale = index is None or any(
+            person_id not in database
+            or database[person_id].get("generation", 0) != generation
+            or len(database[person_id]["embeddings"]) < count
+            for person_id, (generation, count) in counts.items()
+        )
+        if stale:
+            index, counts = VectorIndex(), {}
+
+        for person_id, person_data in database.items():
+            embeddings = person_data["embeddings"]
+            new = embeddings[counts.get(person_id, (0, 0))[1]:]
+            if new:
+                index.add([data["embedding"] for data in new], [person_id] * len(new))
+                counts[person_id] = (person_data.get("generation", 0), len(embeddings))
+
+        shard.index, shard.index_counts = index, counts
+        return index
+
+    def _resize(self, shard_id: str, shard: _Shard):
+        """🔹 샤드 크기 재계산 후 메모리 예산 초과 시 오래된 샤드부터 제거"""
+        if self._shards.get(shard_id) is not shard:  # 이미 캐시에서 제거된 샤드
+            return
+        self._memory_used -= shard.size
+        shard.size = self._estimate_size(shard.database)
+        self._memory_used += shard.size
+
+        # 방금 사용한 샤드는 예산을 넘더라도 유지
+        while self._memory_used > self.memory_budget and len(self._shards) > 1:
+            evicted_id, evicted = next(iter(self._shards.items()))
+            if evicted_id == shard_id:
+                break
+            del self._shards[evicted_id]
+            self._memory_used -= evicted.size
+            logger.debug("♻️ 얼굴 DB 샤드 캐시 제거: %s", evicted_id)
+
+    @staticmethod
+    def _estimate_size(database: dict) -> int:
+        count = sum(len(person.get("embeddings", [])) for person in database.values())
+        return count * (EMBEDDING_BYTES + INDEX_BYTES)
+
+
+def _apply(database: dict, updates: dict) -> dict:
+    """🔹 copy-on-write로 변경 적용 (기존 스냅샷 dict는 그대로 둠)"""
+    new_database = dict(database)
+    for person_id, embeddings in updates.items():
+        person_data = dict(new_database.get(person_id, {"embeddings": []}))
+        person_data["embeddings"] = list(person_data["embeddings"])
+        new_database[person_id] = add_embeddings(person_data, embeddings)
+    return new_database
+
+
+def _person_number(person_id: str) -> int:
+    return int(person_id.split('_')[1])
+
+
+def _max_person_number(person_ids) -> int:
+    return max(map(_person_number, person_ids), default=0)
+
+
+def _signature(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
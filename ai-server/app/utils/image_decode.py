@@ -0,0 +1,24 @@
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# ✅ 얼굴 검출 입력 크기 (가장 큰 입력, CLIP 입력은 여기서 다시 축소)
+FACE_SIZE = (1024, 1024)
+
+
+def decode_image(image_bytes: bytes, min_size=FACE_SIZE) -> Image.Image:
+    """🔹 필요한 크기까지만 디코딩 (JPEG draft 모드 + EXIF 회전 반영, RGB)
+
+    JPEG는 draft 모드로 DCT 단계에서 1/2, 1/4, 1/8 축소 디코딩되므로 12~48MP 원본을
+    전체 해상도로 풀지 않는다. min_size 이상을 보장하는 가장 작은 배율이 선택된다.
+    """
+    image = Image.open(BytesIO(image_bytes))
+    if image.format == "JPEG":
+        image.draft("RGB", min_size)
+
+    # EXIF Orientation 반영 (세로 사진이 눕혀져 태깅되는 문제 방지)
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
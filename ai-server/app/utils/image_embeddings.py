@@ -0,0 +1,175 @@
+import fcntl
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from mindlog_common.log import get_logger
+
+from app.utils.vector_index import VectorIndex, normalize
+from app.utils.face_store import DATA_DIR
+from app.utils.metrics import CACHE_EVENTS
+
+# ✅ 사용자별 CLIP 이미지 임베딩 저장 위치 (ai-server/data/image_embeddings/{user_id}.jsonl)
+EMBEDDING_DIR = os.getenv("IMAGE_EMBEDDING_DIR", os.path.join(DATA_DIR, "image_embeddings"))
+
+# ✅ 태깅할 때 이미지 임베딩을 저장할지 여부 (끄면 /ai/search 사용 불가, 응답으로 반환만 가능)
+STORE_IMAGE_EMBEDDINGS = os.getenv("STORE_IMAGE_EMBEDDINGS", "true").lower() == "true"
+
+# ✅ 메모리에 유지할 사용자별 임베딩의 최대 크기 (MB, 넘으면 오래 조회하지 않은 사용자부터 제거)
+MEMORY_BUDGET = int(os.getenv("IMAGE_EMBEDDING_MEMORY_BUDGET_MB", "256")) * 1024 * 1024
+
+# 임베딩 1개의 벡터 외 메모리 (numpy 배열 객체 + url 키)
+ENTRY_OVERHEAD_BYTES = 256
+
+_SAFE_USER_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+logger = get_logger(__name__)
+
+
+class _UserEmbeddings:
+    def __init__(self):
+        self.vectors = {}  # image_url → 정규화된 임베딩 (같은 URL을 다시 저장하면 마지막 값)
+        self.offset = 0  # 파일에서 읽은 위치 (다른 워커가 추가한 줄만 이어서 읽음)
+        self.index = None  # 검색 시 지연 생성, URL 덮어쓰기가 생기면 다시 생성
+        self.size = 0  # 메모리 예산 계산용 추정 크기 (bytes)
+
+
+class ImageEmbeddingStore:
+    """🔹 사용자별 정규화된 CLIP 이미지 임베딩 저장 + 텍스트 쿼리 검색
+
+    저장은 JSON Lines append (flock으로 워커 간 직렬화), 검색은 메모리의 VectorIndex
+    (작으면 exact, 커지면 IVF)로 한다. 다른 워커가 추가한 줄은 다음 조회 때 이어서 읽는다.
+    메모리에는 최근 조회한 사용자만 memory_budget 안에서 유지하고 (LRU), 제거된 사용자는
+    다음 조회 때 파일에서 다시 읽는다.
+    """
+
+    def __init__(self, root: str = EMBEDDING_DIR, memory_budget: int = MEMORY_BUDGET):
+        self.root = root
+        self.memory_budget = memory_budget
+        self._users = OrderedDict()  # user_id → _UserEmbeddings (오래 조회하지 않은 순)
+        self._memory_used = 0
+        self._lock = threading.Lock()
+
+    def path(self, user_id) -> str:
+        user_id = str(user_id)
+        if not _SAFE_USER_ID.match(user_id):
+            raise ValueError(f"잘못된 user_id: {user_id}")
+        return os.path.join(self.root, f"{user_id}.jsonl")
+
+    def add(self, user_id, embeddings: Dict[str, np.ndarray]):
+        """🔹 url → 임베딩 저장 (정규화 후 기록)"""
+        if not embeddings:
+            return
+        path = self.path(user_id)
+        urls = list(embeddings)
+        vectors = normalize(np.stack([np.asarray(embeddings[url], dtype=np.float32) for url in urls]))
+        lines = "".join(
+            json.dumps({"image_url": url, "embedding": [round(float(v), 6) for v in vector]}) + "\n"
+            for url, vector in zip(urls, vectors)
+        )
+
+        os.makedirs(self.root, exist_ok=True)
+        with open(path, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(lines.encode("utf-8"))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        self._refresh(user_id)
+
+    def get(self, user_id, urls) -> Dict[str, np.ndarray]:
+        entry = self._refresh(user_id)
+        return {url: entry.vectors[url] for url in urls if url in entry.vectors}
+
+    def count(self, user_id) -> int:
+        return len(self._refresh(user_id).vectors)
+
+    def search(self, user_id, query: np.ndarray, k: int = 20) -> List[Tuple[str, float]]:
+        """🔹 query(정규화된 텍스트 임베딩)와 가장 가까운 이미지 k개 → [(image_url, 코사인 유사도)]"""
+        entry = self._refresh(user_id)
+        with self._lock:
+            if not entry.vectors:
+                return []
+            if entry.index is None:
+                urls = list(entry.vectors)
+                entry.index = VectorIndex(dim=len(entry.vectors[urls[0]]))
+                entry.index.add(np.stack([entry.vectors[url] for url in urls]), urls)
+                self._resize(str(user_id), entry)
+            index = entry.index
+        return index.search(normalize(query)[0], k=k)
+
+    def _refresh(self, user_id) -> _UserEmbeddings:
+        """🔹 파일에서 아직 읽지 않은 줄을 메모리에 반영"""
+        path = self.path(user_id)
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                CACHE_EVENTS.inc(cache="image_embeddings", result="hit")
+            else:
+                entry = self._users[user_id] = _UserEmbeddings()
+                CACHE_EVENTS.inc(cache="image_embeddings", result="miss")
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return entry
+            if size <= entry.offset:
+                return entry
+
+            with open(path, "rb") as f:
+                f.seek(entry.offset)
+                chunk = f.read(size - entry.offset)
+            end = chunk.rfind(b"\n") + 1  # 쓰는 중인 마지막 줄은 다음에 읽음
+            entry.offset += end
+
+            added_urls, added_vectors = [], []
+            for line in chunk[:end].splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("⚠️ 손상된 이미지 임베딩 레코드 무시: %s", path)
+                    continue
+                url = record["image_url"]
+                vector = np.asarray(record["embedding"], dtype=np.float32)
+                if url in entry.vectors:
+                    entry.index = None  # 덮어쓴 URL은 인덱스에서 뺄 수 없으므로 다시 생성
+                else:
+                    added_urls.append(url)
+                    added_vectors.append(vector)
+                entry.vectors[url] = vector
+
+            if entry.index is not None and added_urls:
+                entry.index.add(np.stack(added_vectors), added_urls)
+            self._resize(user_id, entry)
+            return entry
+
+    def _resize(self, user_id: str, entry: _UserEmbeddings):
+        """🔹 사용자 임베딩 크기 재계산 후 메모리 예산 초과 시 오래된 사용자부터 제거 (self._lock 안에서 호출)"""
+        if self._users.get(user_id) is not entry:  # 이미 캐시에서 제거된 사용자
+            return
+        self._memory_used -= entry.size
+        entry.size = self._estimate_size(entry)
+        self._memory_used += entry.size
+
+        # 방금 조회한 사용자는 예산을 넘더라도 유지
+        while self._memory_used > self.memory_budget and len(self._users) > 1:
+            evicted_id, evicted = next(iter(self._users.items()))
+            if evicted_id == user_id:
+                break
+            del self._users[evicted_id]
+            self._memory_used -= evicted.size
+            logger.debug("♻️ 이미지 임베딩 캐시 제거: %s", evicted_id)
+
+    @staticmethod
+    def _estimate_size(entry: _UserEmbeddings) -> int:
+        if not entry.vectors:
+            return 0
+        vector_bytes = next(iter(entry.vectors.values())).nbytes
+        size = len(entry.vectors) * (vector_bytes + ENTRY_OVERHEAD_BYTES)
+        return size + (entry.index.nbytes() if entry.index is not None else 0)
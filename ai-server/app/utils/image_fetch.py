@@ -0,0 +1,48 @@
+import os
+import re
+from typing import Optional
+
+import aiohttp
+
+from mindlog_common.log import get_logger
+
+# ✅ 이미지 다운로드 타임아웃 (초)
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+# ✅ 백엔드와 같은 호스트에서 공유하는 이미지 폴더 (설정하지 않으면 경로 입력 비활성화)
+SHARED_IMAGE_DIR = os.getenv("SHARED_IMAGE_DIR")
+
+logger = get_logger(__name__)
+
+
+def convert_image_url(url: str) -> str:
+    """Google Drive URL 변환"""
+    match = re.search(r"file/d/([^/]+)/view", url)
+    if match:
+        image_id = match.group(1)
+        return f"https://drive.google.com/uc?id={image_id}"
+
+    return url  # ✅ 기타 URL은 그대로 반환
+
+
+async def fetch_image_bytes(session: aiohttp.ClientSession, url: str) -> Optional[bytes]:
+    """🔹 이미지 원본 바이트 다운로드 (Google Drive URL 변환 포함, 실패 시 None)"""
+    async with session.get(convert_image_url(url), timeout=DOWNLOAD_TIMEOUT) as response:
+        if response.status != 200:
+            logger.warning("⚠️ 이미지 다운로드 실패: %s (status %s)", url, response.status)
+            return None
+        return await response.read()
+
+
+def read_shared_image(path: str, shared_dir: Optional[str] = SHARED_IMAGE_DIR) -> bytes:
+    """🔹 공유 볼륨의 이미지 읽기 (shared_dir 기준 상대 경로, 폴더 밖 경로는 거부)"""
+    if not shared_dir:
+        raise ValueError("SHARED_IMAGE_DIR이 설정되지 않아 경로 입력을 사용할 수 없습니다")
+
+    root = os.path.realpath(shared_dir)
+    full_path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full_path]) != root:
+        raise ValueError(f"공유 폴더 밖의 경로: {path}")
+
+    with open(full_path, "rb") as f:
+        return f.read()
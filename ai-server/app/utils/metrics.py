@@ -0,0 +1,161 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Tuple
+
+from mindlog_common.log import get_logger
+
+# ✅ 지연 시간 히스토그램 구간 (초): 1ms ~ 60s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# ✅ 배치 크기 히스토그램 구간 (이미지 수)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 100, 200)
+
+logger = get_logger(__name__)
+
+
+def _label_key(labels: dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: Tuple) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """🔹 누적 카운터 (라벨별)"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(key)} {value}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """🔹 구간별 누적 개수 + 합계 (관측 1회당 bisect 1번, 락 1번)"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple, list] = {}  # 라벨 → [구간별 개수..., +Inf 개수, 합계]
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """🔹 with 블록 실행 시간 기록 (예외가 나도 기록)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list:
+        with self._lock:
+            values = [(key, list(row)) for key, row in self._values.items()]
+
+        lines = self.header()
+        for key, row in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {row[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """🔹 스크레이프 시점에 콜백으로 값을 읽는 메트릭 (콜백은 {라벨 튜플: 값} 또는 숫자 반환)
+
+    다른 객체가 이미 세고 있는 누적값(예: 대기열 거절 수)은 kind="counter"로 노출한다.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable, kind: str = "gauge"):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self.kind = kind
+
+    def render(self) -> list:
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning("⚠️ 메트릭 수집 실패: %s, 오류: %s", self.name, e)
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return self.header() + [f"{self.name}{_format_labels(key)} {value}" for key, value in values.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Callable, kind: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, documentation, callback, kind))
+
+    def render(self) -> str:
+        """🔹 Prometheus 텍스트 형식 (version 0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ✅ 공용 메트릭 (stage: download, decode, preprocess, clip_encode, face_detection, face_embedding,
+#    db_match, db_commit, exif, geocode, embedding_store / route: 요청 경로)
+STAGE_SECONDS = REGISTRY.histogram("mindlog_stage_seconds", "Time spent per tagging stage")
+REQUEST_SECONDS = REGISTRY.histogram("mindlog_request_seconds", "Total tagging request time")
+BATCH_SIZE = REGISTRY.histogram("mindlog_batch_size", "Images per tagging batch", BATCH_BUCKETS)
+CACHE_EVENTS = REGISTRY.counter("mindlog_cache_events_total", "Cache lookups by cache and result (hit/miss)")
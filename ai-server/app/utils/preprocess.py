@@ -0,0 +1,80 @@
+import threading
+from typing import Dict
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+from app.utils.image_decode import FACE_SIZE
+
+# ✅ CLIP 정규화 값 (clip.load가 반환하는 preprocess와 동일)
+CLIP_MEAN = np.array([0.48145466, 0.4578275, 0.40821073], dtype=np.float32)
+CLIP_STD = np.array([0.26862954, 0.26130258, 0.27577711], dtype=np.float32)
+
+
+class PreprocessedImages:
+    """🔹 태거들이 바로 사용하는 전처리 결과
+
+    - clip: (이미지 수 * views, 3, n_px, n_px) 정규화된 CLIP 입력 (원본, 좌우 반전 순서)
+    - faces: url → 얼굴 검출 입력 (RGB uint8, FACE_SIZE)
+
+    두 값 모두 스레드별로 재사용되는 버퍼의 view이므로 같은 스레드에서 다음 전처리를
+    호출하기 전까지만 유효하다.
+    """
+
+    def __init__(self, urls: list, clip: torch.Tensor, faces: Dict[str, np.ndarray], views: int):
+        self.urls = urls
+        self.clip = clip
+        self.faces = faces
+        self.views = views
+
+
+class ImagePreprocessor:
+    """🔹 디코딩된 이미지마다 CLIP 텐서와 얼굴 검출 배열을 한 번씩만 생성 (미리 할당된 버퍼 재사용)"""
+
+    def __init__(self, n_px: int = 224, face_size=FACE_SIZE, tta: bool = True):
+        self.n_px = n_px
+        self.face_size = face_size
+        self.views = 2 if tta else 1
+        self._shift = (CLIP_MEAN * 255).reshape(3, 1, 1)
+        self._scale = (1 / (CLIP_STD * 255)).reshape(3, 1, 1)
+        self._local = threading.local()
+
+    def _buffers(self, count: int):
+        """🔹 스레드별 버퍼 (부족할 때만 2배로 늘림)"""
+        faces = getattr(self._local, "faces", None)
+        if faces is None or len(faces) < count:
+            capacity = max(count, 2 * (0 if faces is None else len(faces)), 4)
+            width, height = self.face_size
+            self._local.faces = np.empty((capacity, height, width, 3), dtype=np.uint8)
+            self._local.clip = np.empty((capacity * self.views, 3, self.n_px, self.n_px), dtype=np.float32)
+        return self._local.faces, self._local.clip
+
+    def __call__(self, images: Dict[str, Image.Image]) -> PreprocessedImages:
+        urls = list(images.keys())
+        faces, clip = self._buffers(len(urls))
+
+        for i, url in enumerate(urls):
+            image = images[url]
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+
+            # 얼굴 검출 입력: 원본 → FACE_SIZE (버퍼에 바로 기록)
+            face = faces[i]
+            cv2.resize(np.asarray(image), self.face_size, dst=face, interpolation=cv2.INTER_AREA)
+
+            # CLIP 입력: 얼굴 입력에서 n_px로 축소 후 (x - mean) / std, CHW
+            small = cv2.resize(face, (self.n_px, self.n_px), interpolation=cv2.INTER_AREA)
+            view = clip[i * self.views]
+            np.subtract(small.transpose(2, 0, 1), self._shift, out=view)
+            view *= self._scale
+            if self.views == 2:
+                clip[i * self.views + 1] = view[:, :, ::-1]  # 좌우 반전 TTA
+
+        return PreprocessedImages(
+            urls,
+            torch.from_numpy(clip[:len(urls) * self.views]),
+            {url: faces[i] for i, url in enumerate(urls)},
+            self.views,
+        )
@@ -0,0 +1,47 @@
+import asyncio
+from collections import Counter
+from typing import Hashable, Tuple
+
+
+class SingleFlight:
+    """🔹 같은 키의 동시 작업을 하나로 합침 (먼저 claim한 요청만 실행, 나머지는 결과를 공유)
+
+    결과를 저장하는 캐시가 아니라 진행 중인 작업만 추적한다. 작업이 끝나면(resolve) 키가
+    제거되므로 이후 요청은 다시 실행된다.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights = {}
+        self.counters = Counter()
+
+    def claim(self, key: Hashable) -> Tuple[asyncio.Future, bool]:
+        """🔹 (결과 future, 실행 담당 여부) 반환 — 담당자는 반드시 resolve/fail을 호출해야 함"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.counters["coalesced"] += 1
+            return flight, False
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        self.counters["executed"] += 1
+        return flight, True
+
+    def resolve(self, key: Hashable, result):
+        flight = self._flights.pop(key, None)
+        if flight is not None and not flight.done():
+            flight.set_result(result)
+
+    def fail(self, key: Hashable, error: BaseException):
+        flight = self._flights.pop(key, None)
+        if flight is not None and not flight.done():
+            flight.set_exception(error)
+            flight.exception()  # 대기자가 없어도 "exception was never retrieved" 경고 방지
+
+    @staticmethod
+    async def wait(flight: asyncio.Future):
+        """🔹 공유 결과 대기 (대기자가 취소되어도 공유 작업은 취소되지 않음)"""
+        return await asyncio.shield(flight)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), **self.counters}
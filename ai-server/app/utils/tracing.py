@@ -0,0 +1,12 @@
+from contextlib import contextmanager
+
+from mindlog_common.tracing import span
+
+from app.utils.metrics import STAGE_SECONDS
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """🔹 태깅 단계 기록 (STAGE_SECONDS 히스토그램 + span)"""
+    with span(name, **attributes), STAGE_SECONDS.time(stage=name):
+        yield
@@ -0,0 +1,193 @@
+import os
+import numpy as np
+
+# ✅ 이 개수 이하의 인덱스는 근사 검색 없이 전체 비교 (작으면 exact가 더 빠르고 정확)
+EXACT_SEARCH_MAX = int(os.getenv("VECTOR_INDEX_EXACT_MAX", "2000"))
+
+# ✅ 검색 시 살펴볼 IVF 리스트 수 (클수록 recall↑, latency↑)
+DEFAULT_N_PROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "8"))
+
+
+def normalize(vectors) -> np.ndarray:
+    """🔹 코사인 유사도 계산을 위해 L2 정규화 (float32)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class _VectorTable:
+    """🔹 증분 추가가 가능한 (벡터, 라벨) 저장소 (용량 2배씩 확장)"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.labels = []
+        self.size = 0
+
+    def add(self, vectors: np.ndarray, labels):
+        needed = self.size + len(vectors)
+        if needed > len(self.vectors):
+            capacity = max(needed, 2 * len(self.vectors), 64)
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+        self.vectors[self.size:needed] = vectors
+        self.labels.extend(labels)
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self.vectors[:self.size]
+
+
+class ExactIndex:
+    """🔹 전체 임베딩과 코사인 유사도를 계산하는 brute-force 인덱스"""
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+        self._table = _VectorTable(dim)
+
+    def __len__(self):
+        return self._table.size
+
+    def add(self, vectors, labels):
+        vectors = normalize(vectors)
+        self._table.add(vectors, list(labels))
+
+    def search(self, query, k: int = 1):
+        """🔹 query와 가장 유사한 k개의 (라벨, 유사도) 반환"""
+        if self._table.size == 0:
+            return []
+        similarities = self._table.view() @ normalize(query)[0]
+        return _top_k(similarities, self._table.labels, k)
+
+    def items(self):
+        return self._table.view(), self._table.labels
+
+
+class IVFFlatIndex:
+    """🔹 numpy 기반 IVF-Flat 근사 최근접 이웃 인덱스
+
+    k-means로 만든 중심점(coarse quantizer)별로 임베딩을 나눠 저장하고,
+    검색 시 query와 가까운 n_probe개 리스트만 전체 비교한다.
+    """
+
+    def __init__(self, dim: int = 128, n_probe: int = DEFAULT_N_PROBE, n_lists: int = None,
+                 train_iterations: int = 10, seed: int = 0):
+        self.dim = dim
+        self.n_probe = n_probe
+        self.n_lists = n_lists
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.centroids = None
+        self._lists = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def train(self, vectors):
+        """🔹 k-means(spherical)로 중심점 학습 후 주어진 벡터를 리스트에 배치"""
+        vectors = normalize(vectors)
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            empty = np.bincount(assignments, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]  # 빈 리스트는 기존 중심점 유지
+            centroids = normalize(sums)
+
+        self.centroids = centroids
+        self._lists = [_VectorTable(self.dim) for _ in range(n_lists)]
+        self._size = 0
+
+    def add(self, vectors, labels):
+        if self.centroids is None:
+            raise RuntimeError("IVFFlatIndex는 add 전에 train이 필요합니다")
+        vectors = normalize(vectors)
+        labels = list(labels)
+        assignments = np.argmax(vectors @ self.centroids.T, axis=1)
+        for list_id in np.unique(assignments):
+            members = np.flatnonzero(assignments == list_id)
+            self._lists[list_id].add(vectors[members], [labels[i] for i in members])
+        self._size += len(vectors)
+
+    def search(self, query, k: int = 1):
+        if self._size == 0:
+            return []
+        query = normalize(query)[0]
+        n_probe = min(self.n_probe, len(self._lists))
+        probe_ids = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+
+        candidates = [self._lists[i] for i in probe_ids if self._lists[i].size]
+        if not candidates:
+            return []
+        vectors = np.concatenate([table.view() for table in candidates])
+        labels = [label for table in candidates for label in table.labels]
+        return _top_k(vectors @ query, labels, k)
+
+    def items(self):
+        tables = [table for table in self._lists if table.size]
+        if not tables:
+            return np.empty((0, self.dim), dtype=np.float32), []
+        return (np.concatenate([table.view() for table in tables]),
+                [label for table in tables for label in table.labels])
+
+
+class VectorIndex:
+    """🔹 정규화된 임베딩 검색 인덱스 (얼굴 DB 샤드 / 이미지 임베딩 공용, 작으면 exact, 커지면 IVF로 자동 전환)"""
+
+    def __init__(self, dim: int = 128, exact_max: int = EXACT_SEARCH_MAX, n_probe: int = DEFAULT_N_PROBE):
+        self.dim = dim
+        self.exact_max = exact_max
+        self.n_probe = n_probe
+        self._index = ExactIndex(dim)
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def is_approximate(self) -> bool:
+        return isinstance(self._index, IVFFlatIndex)
+
+    def add(self, vectors, labels):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) == 0:
+            return
+        self._index.add(vectors, labels)
+
+        # 인덱스가 커지면 IVF로 전환하고, 학습 시점 대비 4배 이상 커지면 재학습
+        size = len(self._index)
+        if size > self.exact_max and (not self.is_approximate or size >= 4 * self._trained_size):
+            self._rebuild()
+
+    def search(self, query, k: int = 1):
+        return self._index.search(query, k)
+
+    def _rebuild(self):
+        vectors, labels = self._index.items()
+        index = IVFFlatIndex(self.dim, n_probe=self.n_probe)
+        index.train(vectors)
+        index.add(vectors, labels)
+        self._index = index
+        self._trained_size = len(vectors)
+
+    def nbytes(self) -> int:
+        return len(self._index) * self.dim * 4
+
+
+def _top_k(similarities: np.ndarray, labels, k: int):
+    k = min(k, len(similarities))
+    if k == 1:
+        best = int(np.argmax(similarities))
+        return [(labels[best], float(similarities[best]))]
+    top = np.argpartition(-similarities, k - 1)[:k]
+    top = top[np.argsort(-similarities[top])]
+    return [(labels[i], float(similarities[i])) for i in top]
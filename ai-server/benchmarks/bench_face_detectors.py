@@ -0,0 +1,121 @@
+"""얼굴 검출기 벤치마크 (검출 recall + ms/image)
+
+샘플 이미지 폴더와 정답 파일(JSON)을 받아 검출기별 recall과 처리 시간을 측정한다.
+정답 파일 형식: {"파일명": [[x, y, w, h], ...]} (얼굴 박스) 또는 {"파일명": 얼굴 수}
+
+실행 예시 (ai-server 디렉토리에서):
+    python -m benchmarks.bench_face_detectors --images data/samples --labels data/samples/faces.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.utils.face_detectors import CascadeDetector, RetinaFaceDetector, YuNetDetector
+
+
+def iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = inter_w * inter_h
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def count_hits(label, faces, iou_threshold: float = 0.5) -> int:
+    """🔹 정답 얼굴 중 검출된 개수 (박스 정답은 IoU 매칭, 개수 정답은 min)"""
+    if isinstance(label, int):
+        return min(label, len(faces))
+
+    boxes = [(f["facial_area"]["x"], f["facial_area"]["y"], f["facial_area"]["w"], f["facial_area"]["h"])
+             for f in faces]
+    hits = 0
+    for truth in label:
+        best = max(range(len(boxes)), key=lambda i: iou(truth, boxes[i]), default=None)
+        if best is not None and iou(truth, boxes[best]) >= iou_threshold:
+            hits += 1
+            boxes.pop(best)
+    return hits
+
+
+def load_samples(image_dir: str, labels: dict, size: int):
+    samples = []
+    for name, label in labels.items():
+        image = ImageOps.exif_transpose(Image.open(os.path.join(image_dir, name))).convert("RGB")
+        scale = size / max(image.size)
+        if isinstance(label, list) and scale != 1:
+            label = [[v * scale for v in box] for box in label]
+        # 서버와 같은 입력 크기로 맞춤 (얼굴 태깅 입력은 긴 변 size)
+        image = image.resize((round(image.width * scale), round(image.height * scale)))
+        samples.append((name, np.asarray(image), label))
+    return samples
+
+
+def build_detectors(names):
+    detectors = {}
+    for name in names:
+        try:
+            if name == "retinaface":
+                detectors[name] = RetinaFaceDetector()
+            elif name == "yunet":
+                detectors[name] = YuNetDetector()
+            elif name == "cascade":
+                detectors[name] = CascadeDetector(YuNetDetector(), RetinaFaceDetector())
+        except Exception as e:
+            print(f"⚠️ {name} 검출기 생략: {e}")
+    return detectors
+
+
+def run(samples, detectors, warmup: int = 1):
+    report = []
+    total_faces = sum(label if isinstance(label, int) else len(label) for _, _, label in samples)
+    for name, detector in detectors.items():
+        for _, image, _ in samples[:warmup]:
+            detector.detect(image)  # 모델 로드/초기화 시간 제외
+
+        hits, elapsed = 0, []
+        for _, image, label in samples:
+            start = time.perf_counter()
+            faces = detector.detect(image)
+            elapsed.append((time.perf_counter() - start) * 1000)
+            hits += count_hits(label, faces)
+
+        row = {
+            "detector": name,
+            "images": len(samples),
+            "recall": round(hits / total_faces, 4) if total_faces else None,
+            "ms_per_image_mean": round(float(np.mean(elapsed)), 1),
+            "ms_per_image_p95": round(float(np.percentile(elapsed, 95)), 1),
+        }
+        if isinstance(detector, CascadeDetector):
+            row["fallback_rate"] = round(detector.stats["fallback"] / max(1, sum(detector.stats.values())), 3)
+        report.append(row)
+        print(f"📊 {name}: recall={row['recall']}, {row['ms_per_image_mean']}ms/image (p95 {row['ms_per_image_p95']}ms)")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="얼굴 검출기 벤치마크")
+    parser.add_argument("--images", required=True, help="샘플 이미지 폴더")
+    parser.add_argument("--labels", required=True, help="정답 JSON 경로")
+    parser.add_argument("--detectors", nargs="+", default=["retinaface", "yunet", "cascade"])
+    parser.add_argument("--size", type=int, default=1024, help="입력 이미지 긴 변 크기")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    with open(args.labels, "r", encoding="utf-8") as f:
+        labels = json.load(f)
+
+    report = run(load_samples(args.images, labels, args.size), build_detectors(args.detectors))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""얼굴 DB 검색 인덱스 벤치마크 (brute-force cosine vs IVF-Flat)
+
+실행 예시 (ai-server 디렉토리에서):
+    python -m benchmarks.bench_face_index --sizes 1000 10000 100000 --n-probe 4 8 16
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from scipy.spatial.distance import cosine
+
+from app.utils.vector_index import ExactIndex, IVFFlatIndex, normalize
+
+
+def make_embeddings(n: int, dim: int = 128, per_person: int = 20, noise: float = 0.35, seed: int = 0):
+    """🔹 인물별 중심 + 노이즈로 Facenet 임베딩과 비슷한 분포의 가짜 데이터 생성"""
+    rng = np.random.default_rng(seed)
+    n_people = max(1, n // per_person)
+    centers = normalize(rng.normal(size=(n_people, dim)))
+    person_ids = rng.integers(0, n_people, size=n)
+    vectors = centers[person_ids] + noise * rng.normal(size=(n, dim)) / np.sqrt(dim)
+    queries = centers[rng.integers(0, n_people, size=200)] + noise * rng.normal(size=(200, dim)) / np.sqrt(dim)
+    return vectors.astype(np.float32), [f"person_{i}" for i in person_ids], queries.astype(np.float32)
+
+
+def time_queries(index, queries):
+    start = time.perf_counter()
+    results = [index.search(q, k=1)[0] for q in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+
+def time_scipy_loop(vectors, queries, limit: int = 20):
+    """🔹 기존 process_faces 방식 (임베딩마다 scipy cosine 호출) 기준 시간"""
+    queries = queries[:limit]
+    start = time.perf_counter()
+    for q in queries:
+        max(1 - cosine(q, v) for v in vectors)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def run(sizes, n_probes, dim=128):
+    report = []
+    for n in sizes:
+        vectors, labels, queries = make_embeddings(n, dim)
+
+        exact = ExactIndex(dim)
+        exact.add(vectors, labels)
+        exact_ms, exact_results = time_queries(exact, queries)
+
+        row = {
+            "size": n,
+            "scipy_loop_ms_per_query": round(time_scipy_loop(vectors, queries), 3),
+            "exact_ms_per_query": round(exact_ms, 3),
+            "ivf": [],
+        }
+
+        ivf = IVFFlatIndex(dim)
+        start = time.perf_counter()
+        ivf.train(vectors)
+        ivf.add(vectors, labels)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for n_probe in n_probes:
+            ivf.n_probe = n_probe
+            ivf_ms, ivf_results = time_queries(ivf, queries)
+            recall = np.mean([a[0] == b[0] for a, b in zip(exact_results, ivf_results)])
+            row["ivf"].append({
+                "n_probe": n_probe,
+                "ms_per_query": round(ivf_ms, 3),
+                "recall_at_1": round(float(recall), 4),
+                "speedup_vs_exact": round(exact_ms / ivf_ms, 2) if ivf_ms else None,
+            })
+        row["ivf_build_ms"] = round(build_ms, 1)
+        report.append(row)
+
+        print(f"📊 N={n}: scipy loop {row['scipy_loop_ms_per_query']}ms, exact {row['exact_ms_per_query']}ms, "
+              f"IVF build {row['ivf_build_ms']}ms")
+        for r in row["ivf"]:
+            print(f"   - n_probe={r['n_probe']}: {r['ms_per_query']}ms, recall@1={r['recall_at_1']}, "
+                  f"x{r['speedup_vs_exact']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="얼굴 인덱스 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.n_probe)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
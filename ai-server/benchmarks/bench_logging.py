@@ -0,0 +1,153 @@
+"""얼굴 매칭 루프 로그 오버헤드 벤치마크 (비교마다 print vs 레벨 확인 후 지연 포맷 vs 샘플링)
+
+실행 예시 (ai-server 디렉토리에서):
+    python -m benchmarks.bench_logging --db-size 10000 --faces 30
+    python -m benchmarks.bench_logging --sink /tmp/bench.log --output logging.json
+
+--sink를 파일로 주면 실제 디스크 쓰기 비용까지 포함된다 (기본값은 os.devnull: 포맷/호출 비용만).
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import time
+
+import numpy as np
+from mindlog_common.log import Sampler
+
+from benchmarks.bench_face_index import make_embeddings
+from app.utils.face_clustering import OnlineFaceClusterer
+from app.utils.vector_index import VectorIndex, normalize
+
+logger = logging.getLogger("bench.match")
+
+
+def build_database(vectors, labels):
+    """🔹 가짜 임베딩 → 얼굴 DB 샤드 형식 + 검색 인덱스"""
+    database = {}
+    for vector, label in zip(vectors, labels):
+        database.setdefault(label, {"embeddings": []})["embeddings"].append({"embedding": vector.tolist()})
+    for person in database.values():
+        matrix = np.array([e["embedding"] for e in person["embeddings"]], dtype=np.float32)
+        person["centroid"] = matrix.mean(axis=0).tolist()
+        person["count"] = len(matrix)
+
+    index = VectorIndex(vectors.shape[1])
+    index.add(vectors, labels)
+    return database, index
+
+
+def legacy_print_loop(queries, vectors, labels):
+    """🔹 기존 방식: DB 임베딩과 1개씩 비교하며 매 비교마다 f-string print"""
+    matches = []
+    for i, q in enumerate(queries):
+        best, best_sim = None, -1.0
+        for label, v in zip(labels, vectors):
+            similarity = float(q @ v)
+            print(f"🔍 얼굴 {i} ↔ {label}: 유사도 {similarity:.4f}")
+            if similarity > best_sim:
+                best, best_sim = label, similarity
+        print(f"✅ 인물 매칭: 얼굴 {i} → {best} (유사도: {best_sim:.3f})")
+        matches.append(best)
+    return matches
+
+
+def gated_loop(queries, vectors, labels, trace):
+    """🔹 같은 비교 루프, 로그만 레벨 확인 + 지연 포맷 (trace: logger.debug 또는 Sampler.debug)"""
+    matches = []
+    for i, q in enumerate(queries):
+        best, best_sim = None, -1.0
+        for label, v in zip(labels, vectors):
+            similarity = float(q @ v)
+            trace("🔍 얼굴 %d ↔ %s: 유사도 %.4f", i, label, similarity)
+            if similarity > best_sim:
+                best, best_sim = label, similarity
+        logger.debug("✅ 인물 매칭: 얼굴 %d → %s (유사도: %.3f)", i, best, best_sim)
+        matches.append(best)
+    return matches
+
+
+def silent_loop(queries, vectors, labels):
+    """🔹 같은 비교 루프, 로그 없음 (하한선)"""
+    matches = []
+    for q in queries:
+        best, best_sim = None, -1.0
+        for label, v in zip(labels, vectors):
+            similarity = float(q @ v)
+            if similarity > best_sim:
+                best, best_sim = label, similarity
+        matches.append(best)
+    return matches
+
+
+def clusterer_assign(queries, database, index):
+    """🔹 현재 방식: 인덱스 top-k 후보만 비교 (OnlineFaceClusterer, 샘플링된 debug 로그)"""
+    clusterer = OnlineFaceClusterer(database, index)
+    for i, q in enumerate(queries):
+        clusterer.assign(f"face_{i}", q)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(db_size: int, n_faces: int, sink_path: str, sample_every: int):
+    vectors, labels, queries = make_embeddings(db_size)
+    vectors, queries = normalize(vectors), normalize(queries[:n_faces])
+    database, index = build_database(vectors, labels)
+
+    root = logging.getLogger()
+    previous_handlers, previous_level = root.handlers[:], root.level
+    report = {"db_size": db_size, "faces": n_faces, "sink": sink_path, "sample_every": sample_every}
+
+    with open(sink_path, "w", encoding="utf-8") as sink:
+        root.handlers = [logging.StreamHandler(sink)]
+        try:
+            with contextlib.redirect_stdout(sink):
+                report["legacy_print_ms"] = timed(legacy_print_loop, queries, vectors, labels)
+
+            root.setLevel(logging.INFO)
+            report["gated_info_ms"] = timed(gated_loop, queries, vectors, labels, logger.debug)
+            report["silent_ms"] = timed(silent_loop, queries, vectors, labels)
+            report["clusterer_info_ms"] = timed(clusterer_assign, queries, database, index)
+
+            root.setLevel(logging.DEBUG)
+            report["gated_debug_ms"] = timed(gated_loop, queries, vectors, labels, logger.debug)
+            report["sampled_debug_ms"] = timed(gated_loop, queries, vectors, labels,
+                                               Sampler(logger, sample_every).debug)
+            report["clusterer_debug_ms"] = timed(clusterer_assign, queries, database, index)
+        finally:
+            root.handlers, root.level = previous_handlers, previous_level
+
+    for key in [k for k in report if k.endswith("_ms")]:
+        report[key] = round(report[key] / n_faces, 3)  # 얼굴 1개당 ms
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="얼굴 매칭 로그 오버헤드 벤치마크")
+    parser.add_argument("--db-size", type=int, default=10000, help="DB 임베딩 수")
+    parser.add_argument("--faces", type=int, default=30, help="매칭할 얼굴 수")
+    parser.add_argument("--sink", default=os.devnull, help="로그/print 출력 대상 (기본: os.devnull)")
+    parser.add_argument("--sample-every", type=int, default=100, help="샘플링 debug 주기")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    report = run(args.db_size, args.faces, args.sink, args.sample_every)
+    print(f"📊 DB {report['db_size']}개, 얼굴 {report['faces']}개 (얼굴 1개당 ms, sink={report['sink']})")
+    for key in ("legacy_print_ms", "gated_debug_ms", "sampled_debug_ms", "gated_info_ms", "silent_ms",
+                "clusterer_debug_ms", "clusterer_info_ms"):
+        print(f"   - {key[:-3]}: {report[key]}ms")
+    print(f"   - print 제거 효과 (INFO): x{report['legacy_print_ms'] / report['gated_info_ms']:.1f}, "
+          f"인덱스 매칭까지: x{report['legacy_print_ms'] / report['clusterer_info_ms']:.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""AI 서버 태깅 벤치마크 (합성 이미지 + 로컬 HTTP/Nominatim 스텁)
+
+얼굴과 GPS EXIF가 들어간 합성 사진을 만들어 로컬 HTTP 스텁으로 서빙하고, 역지오코딩도
+로컬 스텁으로 대체해 외부 네트워크 없이 단계별 / 전체 요청 시간을 측정한다.
+
+- 단계: PlaceTagger.predict_places / LocationTagger.predict_locations / CompanionTagger.process_faces
+- 전체: POST /ai/generate-tags (이미지 다운로드 → 디코딩 → 전처리 → 태깅)
+- 배치 크기 x 얼굴 DB 크기 조합마다 반복 측정 후 JSON으로 저장 (실행 간 비교용)
+
+실행 예시 (ai-server 디렉토리에서):
+    python -m benchmarks.bench_tagging --output bench.json
+    python -m benchmarks.bench_tagging --stages place location --batch-sizes 1 5 --db-sizes 0
+    python -m benchmarks.bench_tagging --face-dir data/samples/faces --compare previous.json
+
+합성 얼굴은 단순한 도형이라 검출기가 못 찾을 수 있다. 실제 검출/임베딩 비용까지 재려면
+--face-dir에 얼굴 크롭 이미지를 넣으면 배경에 붙여서 사용한다.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import piexif
+from PIL import Image, ImageDraw
+
+STAGES = ("place", "location", "companion")
+
+# 스텁 Nominatim이 돌려주는 주소 (extract_best_region_tag는 quarter를 먼저 사용)
+STUB_ADDRESS = {"quarter": "성수동", "borough": "성동구", "city": "서울", "country": "대한민국"}
+
+
+def _to_dms(value: float):
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600 * 100)
+    return ((degrees, 1), (minutes, 1), (seconds, 100))
+
+
+def gps_exif(lat: float, lon: float) -> bytes:
+    """🔹 위도/경도를 담은 EXIF 블록"""
+    gps = {
+        piexif.GPSIFD.GPSLatitudeRef: b"N" if lat >= 0 else b"S",
+        piexif.GPSIFD.GPSLatitude: _to_dms(lat),
+        piexif.GPSIFD.GPSLongitudeRef: b"E" if lon >= 0 else b"W",
+        piexif.GPSIFD.GPSLongitude: _to_dms(lon),
+    }
+    return piexif.dump({"0th": {}, "Exif": {}, "GPS": gps, "1st": {}, "thumbnail": None})
+
+
+def draw_face(draw: ImageDraw.ImageDraw, x: int, y: int, size: int, rng):
+    """🔹 단순한 얼굴 도형 (피부색 타원 + 눈/코/입)"""
+    skin = tuple(int(c) for c in rng.integers([170, 120, 90], [240, 190, 160]))
+    draw.ellipse([x, y, x + size, y + int(size * 1.25)], fill=skin)
+    eye_y, eye_r = y + int(size * 0.45), max(2, size // 12)
+    for eye_x in (x + int(size * 0.3), x + int(size * 0.7)):
+        draw.ellipse([eye_x - eye_r, eye_y - eye_r, eye_x + eye_r, eye_y + eye_r], fill=(40, 30, 30))
+    draw.line([x + size // 2, eye_y + eye_r, x + size // 2, y + int(size * 0.8)], fill=(120, 80, 60), width=2)
+    draw.arc([x + int(size * 0.3), y + int(size * 0.8), x + int(size * 0.7), y + int(size * 1.05)],
+             0, 180, fill=(150, 50, 50), width=3)
+
+
+def make_images(count: int, size=(1600, 1200), face_dir: str = None, seed: int = 0):
+    """🔹 합성 JPEG 목록 → [(파일명, 바이트)] (이미지마다 얼굴 0~3개 + 서울 근처 GPS)"""
+    rng = np.random.default_rng(seed)
+    crops = []
+    if face_dir:
+        crops = [Image.open(os.path.join(face_dir, name)).convert("RGB")
+                 for name in sorted(os.listdir(face_dir)) if name.lower().endswith((".jpg", ".jpeg", ".png"))]
+
+    images = []
+    for i in range(count):
+        # 배경: 그라디언트 + 노이즈 (JPEG 크기가 실제 사진과 비슷하도록)
+        top, bottom = rng.integers(0, 255, size=3), rng.integers(0, 255, size=3)
+        ramp = np.linspace(0, 1, size[1])[:, None, None]
+        pixels = top * (1 - ramp) + bottom * ramp + rng.normal(0, 12, size=(size[1], size[0], 3))
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+        draw = ImageDraw.Draw(image)
+
+        for _ in range(int(rng.integers(0, 4))):
+            face_size = int(rng.integers(120, 320))
+            x = int(rng.integers(0, size[0] - face_size))
+            y = int(rng.integers(0, size[1] - int(face_size * 1.3)))
+            if crops:
+                crop = crops[int(rng.integers(len(crops)))]
+                image.paste(crop.resize((face_size, int(face_size * crop.height / crop.width))), (x, y))
+            else:
+                draw_face(draw, x, y, face_size, rng)
+
+        lat, lon = 37.5447 + rng.normal(0, 0.01), 127.0557 + rng.normal(0, 0.01)
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=90, exif=gps_exif(lat, lon))
+        images.append((f"img_{i:03d}.jpg", buffer.getvalue()))
+    return images
+
+
+class StubServer:
+    """🔹 로컬 HTTP 스텁: /images/{파일명} 이미지 서빙 + /reverse Nominatim 응답"""
+
+    def __init__(self, images, latency: float = 0.0):
+        files = dict(images)
+        stub = self
+        self.requests = {"images": 0, "reverse": 0}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                time.sleep(latency)
+                if url.path.startswith("/images/") and url.path[len("/images/"):] in files:
+                    stub.requests["images"] += 1
+                    self._send(200, "image/jpeg", files[url.path[len("/images/"):]])
+                elif url.path == "/reverse":
+                    stub.requests["reverse"] += 1
+                    query = parse_qs(url.query)
+                    body = {"lat": query.get("lat", [""])[0], "lon": query.get("lon", [""])[0],
+                            "address": STUB_ADDRESS}
+                    self._send(200, "application/json", json.dumps(body, ensure_ascii=False).encode("utf-8"))
+                else:
+                    self._send(404, "text/plain", b"not found")
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def image_url(self, name: str) -> str:
+        return f"{self.base_url}/images/{name}"
+
+
+def seed_face_db(store, user_id: str, size: int, per_person: int = 20, seed: int = 0):
+    """🔹 사용자 샤드에 가짜 임베딩 size개 기록 (인물당 per_person개)"""
+    from benchmarks.bench_face_index import make_embeddings
+
+    if size <= 0:
+        return
+    vectors, labels, _ = make_embeddings(size, per_person=per_person, seed=seed)
+    updates = {}
+    for vector, label in zip(vectors, labels):
+        person_id = f"person_{int(label.split('_')[1]) + 1}"
+        updates.setdefault(person_id, []).append({"embedding": vector.tolist()})
+    store.commit(updates, user_id, new_ids=list(updates))
+
+
+def summarize(samples_ms, batch_size: int) -> dict:
+    return {
+        "runs": len(samples_ms),
+        "median_ms": round(statistics.median(samples_ms), 2),
+        "mean_ms": round(statistics.fmean(samples_ms), 2),
+        "min_ms": round(min(samples_ms), 2),
+        "ms_per_image": round(statistics.median(samples_ms) / batch_size, 2),
+    }
+
+
+def measure(fn, repeat: int, warmup: int = 1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def load_server(stub_url: str, stages):
+    """🔹 스텁 주소/단계 설정 후 서버 모듈 로드 (태거는 import 시점에 환경변수를 읽음)"""
+    os.environ["NOMINATIM_URL"] = f"{stub_url}/reverse"
+    os.environ["NOMINATIM_INTERVAL"] = "0"
+    os.environ["TAGGING_STAGES"] = ",".join(stages)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routers import tag as tag_router
+
+    return TestClient(app), tag_router.pipeline
+
+
+def run(args) -> dict:
+    images = make_images(max(args.batch_sizes), face_dir=args.face_dir)
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            "stages": args.stages, "batch_sizes": args.batch_sizes, "db_sizes": args.db_sizes,
+            "repeat": args.repeat, "stub_latency_ms": args.stub_latency * 1000, "face_dir": args.face_dir,
+        },
+        "results": [],
+    }
+
+    with StubServer(images, latency=args.stub_latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        client, pipeline = load_server(stub.base_url, args.stages)
+        report["environment"]["model_load_s"] = round(time.perf_counter() - start, 2)
+
+        from app.utils.face_store import FaceStore
+        from app.utils.image_decode import decode_image
+
+        decoded = {stub.image_url(name): decode_image(data) for name, data in images}
+        raw = {stub.image_url(name): data for name, data in images}
+
+        for db_size in args.db_sizes:
+            user_id = f"bench_{db_size}"
+            indexed = None
+            if pipeline.companion_tagger is not None:
+                # 벤치마크마다 새 샤드 폴더 (실제 data/ 아래 DB는 건드리지 않음)
+                pipeline.companion_tagger.face_store = FaceStore(shard_dir=os.path.join(tmp, f"db_{db_size}", "shards"))
+                seed_face_db(pipeline.companion_tagger.face_store, user_id, db_size)
+                indexed = len(pipeline.companion_tagger.face_store.index(user_id))  # exemplar 정리 후 인덱스 크기
+
+            for batch_size in args.batch_sizes:
+                urls = [stub.image_url(name) for name, _ in images[:batch_size]]
+                batch = {url: decoded[url] for url in urls}
+                row = {"db_size": db_size, "db_indexed": indexed, "batch_size": batch_size, "stages": {}}
+
+                if pipeline.place_tagger is not None:
+                    row["stages"]["place"] = summarize(measure(
+                        lambda: pipeline.place_tagger.predict_places(batch), args.repeat), batch_size)
+
+                if pipeline.location_tagger is not None:
+                    row["stages"]["location"] = summarize(measure(
+                        lambda: pipeline.location_tagger.predict_locations(urls), args.repeat), batch_size)
+                    row["stages"]["location_bytes"] = summarize(measure(
+                        lambda: pipeline.location_tagger.predict_locations(urls, {u: raw[u] for u in urls}),
+                        args.repeat), batch_size)
+
+                if pipeline.companion_tagger is not None:
+                    # 서버와 같은 얼굴 검출 입력 (전처리 버퍼는 다음 호출 전까지만 유효하므로 복사)
+                    faces = {url: array.copy() for url, array in pipeline.preprocessor(batch).faces.items()}
+                    row["stages"]["companion"] = summarize(measure(
+                        lambda: pipeline.companion_tagger.process_faces(faces, user_id=user_id), args.repeat),
+                        batch_size)
+
+                def end_to_end():
+                    response = client.post("/ai/generate-tags", json={"image_urls": urls, "user_id": user_id})
+                    response.raise_for_status()
+
+                row["end_to_end"] = summarize(measure(end_to_end, args.repeat), batch_size)
+                report["results"].append(row)
+                print_row(row)
+
+        report["stub_requests"] = dict(stub.requests)
+    return report
+
+
+def print_row(row: dict):
+    stages = ", ".join(f"{name} {r['median_ms']}ms" for name, r in row["stages"].items())
+    print(f"📊 DB {row['db_size']} / 배치 {row['batch_size']}: 전체 {row['end_to_end']['median_ms']}ms "
+          f"({row['end_to_end']['ms_per_image']}ms/이미지) | {stages}")
+
+
+def compare(report: dict, previous: dict, tolerance: float) -> list:
+    """🔹 이전 결과 대비 median이 tolerance 비율 이상 느려진 항목"""
+    key = lambda row: (row["db_size"], row["batch_size"])
+    previous_rows = {key(row): row for row in previous.get("results", [])}
+    regressions = []
+    for row in report["results"]:
+        old = previous_rows.get(key(row))
+        if old is None:
+            continue
+        pairs = [("end_to_end", row["end_to_end"], old["end_to_end"])]
+        pairs += [(name, r, old["stages"][name]) for name, r in row["stages"].items() if name in old["stages"]]
+        for name, new, before in pairs:
+            if before["median_ms"] and new["median_ms"] > before["median_ms"] * (1 + tolerance):
+                regressions.append({"db_size": row["db_size"], "batch_size": row["batch_size"], "stage": name,
+                                    "before_ms": before["median_ms"], "after_ms": new["median_ms"]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI 서버 태깅 벤치마크")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 5, 10, 30])
+    parser.add_argument("--db-sizes", type=int, nargs="+", default=[0, 1000, 10000], help="사용자 얼굴 DB 임베딩 수")
+    parser.add_argument("--repeat", type=int, default=3, help="조합별 측정 횟수 (워밍업 1회 제외)")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="스텁 응답 지연 (초, 네트워크 흉내)")
+    parser.add_argument("--face-dir", help="합성 이미지에 붙일 얼굴 크롭 폴더")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON (느려진 항목이 있으면 종료 코드 1)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="회귀로 판단할 median 증가 비율")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"⚠️ 성능 저하: DB {r['db_size']} / 배치 {r['batch_size']} / {r['stage']}: "
+                  f"{r['before_ms']}ms → {r['after_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""장소 태깅 정확도 vs 속도 평가 (DVC 데이터셋 기준)
+
+PlaceTagger 설정(모델 / precision / TTA / 프롬프트 세트 / 임계값)별로 데이터셋 전체를 태깅해
+한국어 클래스별 top-1 / top-3 정확도, ms/image, peak RSS를 측정하고 Pareto 표를 만든다.
+설정마다 새 프로세스에서 실행하므로 peak RSS는 설정별 값이다.
+
+데이터셋 CSV: 이미지 열(URL 또는 CSV 기준 상대 경로) + 정답 열(한국어 클래스 또는 places.py의 영문 키)
+
+실행 예시 (ai-server 디렉토리에서, dvc repro eval_places와 동일):
+    python -m benchmarks.eval_places --dataset data/dataset.csv --configs benchmarks/eval_configs.json \\
+        --output eval/place_metrics.json --pareto eval/place_pareto.md
+    python -m benchmarks.eval_places --dataset data/dataset.csv --only baseline vit-b32-fp32
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import requests
+
+from app.utils.places import places
+
+IMAGE_COLUMNS = ("image_url", "image_path", "image", "path", "url", "file")
+LABEL_COLUMNS = ("label", "place", "class", "tag")
+
+# 설정 파일에서 생략한 값은 서버 기본값과 동일하게 맞춤
+DEFAULT_CONFIG = {"model": "ViT-L/14", "precision": "auto", "tta": True, "prompt_set": "photo", "threshold": 0.4}
+
+
+def _pick_column(header, requested, candidates, kind):
+    if requested:
+        if requested not in header:
+            raise ValueError(f"{kind} 열 없음: {requested} (CSV 열: {header})")
+        return requested
+    for name in candidates:
+        if name in header:
+            return name
+    raise ValueError(f"{kind} 열을 찾을 수 없음 (--{kind}-column 지정 필요, CSV 열: {header})")
+
+
+def load_dataset(path: str, image_column: str = None, label_column: str = None, limit: int = None):
+    """🔹 CSV → [(이미지 참조, 한국어 정답)]"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        image_column = _pick_column(reader.fieldnames, image_column, IMAGE_COLUMNS, "image")
+        label_column = _pick_column(reader.fieldnames, label_column, LABEL_COLUMNS, "label")
+        rows = [(row[image_column].strip(), row[label_column].strip()) for row in reader if row[image_column].strip()]
+
+    known = set(places.values())
+    samples, unknown = [], set()
+    for ref, label in rows[:limit]:
+        label = places.get(label, label)  # 영문 키 → 한국어
+        if label not in known:
+            unknown.add(label)
+        samples.append((ref, label))
+    if unknown:
+        print(f"⚠️ places.py에 없는 정답 클래스 (항상 오답 처리): {sorted(unknown)}")
+    return samples
+
+
+def read_image(ref: str, base_dir: str) -> bytes:
+    if ref.startswith(("http://", "https://")):
+        response = requests.get(ref, timeout=30)
+        response.raise_for_status()
+        return response.content
+    with open(os.path.join(base_dir, ref), "rb") as f:
+        return f.read()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024  # macOS는 bytes, Linux는 KB
+
+
+def evaluate_config(config: dict, samples: list, batch_size: int, warmup: int = 1) -> dict:
+    """🔹 설정 1개 평가 (별도 프로세스에서 실행: 모델 로드 + 태깅 + 정확도/속도/메모리)"""
+    from app.models.place_tag import PlaceTagger
+    from app.utils.image_decode import decode_image
+    from app.utils.preprocess import ImagePreprocessor
+
+    start = time.perf_counter()
+    tagger = PlaceTagger(model_name=config["model"], threshold=config["threshold"], precision=config["precision"],
+                         prompt_set=config["prompt_set"], tta=config["tta"])
+    preprocessor = ImagePreprocessor(n_px=tagger.input_resolution, tta=tagger.tta)
+    load_s = time.perf_counter() - start
+
+    # 디코딩은 설정과 무관하므로 시간 측정에서 제외 (서버와 같은 decode_image 사용)
+    keys = [f"{i}:{ref}" for i, (ref, _, _) in enumerate(samples)]
+    images = {key: decode_image(data) for key, (_, _, data) in zip(keys, samples)}
+    batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+
+    for batch in batches[:warmup]:
+        inputs = preprocessor({key: images[key] for key in batch})
+        tagger.predict_places_batch(inputs.urls, inputs.clip, views=inputs.views)
+
+    predictions, batch_ms = {}, []
+    for batch in batches:
+        start = time.perf_counter()
+        inputs = preprocessor({key: images[key] for key in batch})
+        predictions.update(tagger.predict_places_batch(inputs.urls, inputs.clip, views=inputs.views))
+        batch_ms.append((time.perf_counter() - start) * 1000)
+
+    per_class = {}
+    hits = {"top1": 0, "top3": 0, "tagged": 0}
+    for key, (_, label, _) in zip(keys, samples):
+        result = predictions.get(key, {})
+        top1 = result.get("place")  # 임계값 미만이면 태그 없음 (서버 응답과 동일)
+        top3 = []
+        for p in result.get("all_predictions", []):
+            name = places.get(p["place"], p["place"])
+            if name not in top3:
+                top3.append(name)
+
+        row = per_class.setdefault(label, {"n": 0, "top1": 0, "top3": 0})
+        row["n"] += 1
+        row["top1"] += top1 == label
+        row["top3"] += label in top3
+        hits["top1"] += top1 == label
+        hits["top3"] += label in top3
+        hits["tagged"] += top1 is not None
+
+    n = len(samples)
+    for row in per_class.values():
+        row["top1"] = round(row["top1"] / row["n"], 4)
+        row["top3"] = round(row["top3"] / row["n"], 4)
+
+    return {
+        **config,
+        "images": n,
+        "top1": round(hits["top1"] / n, 4),
+        "top3": round(hits["top3"] / n, 4),
+        "macro_top1": round(statistics.fmean(row["top1"] for row in per_class.values()), 4),
+        "coverage": round(hits["tagged"] / n, 4),
+        "ms_per_image": round(sum(batch_ms) / n, 2),
+        "model_load_s": round(load_s, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "device": str(tagger.device),
+        "per_class": dict(sorted(per_class.items())),
+    }
+
+
+def pareto_front(results: list) -> set:
+    """🔹 더 빠르면서 top-1도 같거나 높은 설정이 없는 설정 이름"""
+    front = set()
+    for r in results:
+        dominated = any(
+            o is not r and o["ms_per_image"] <= r["ms_per_image"] and o["top1"] >= r["top1"]
+            and (o["ms_per_image"] < r["ms_per_image"] or o["top1"] > r["top1"])
+            for o in results
+        )
+        if not dominated:
+            front.add(r["name"])
+    return front
+
+
+def pareto_table(results: list, front: set) -> str:
+    lines = [
+        "| 설정 | 모델 | precision | TTA | 프롬프트 | 임계값 | top-1 | top-3 | 태깅 비율 | ms/image | peak RSS (MB) | Pareto |",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in sorted(results, key=lambda r: r["ms_per_image"]):
+        lines.append(
+            f"| {r['name']} | {r['model']} | {r['precision']} | {'on' if r['tta'] else 'off'} | {r['prompt_set']} "
+            f"| {r['threshold']} | {r['top1']:.3f} | {r['top3']:.3f} | {r['coverage']:.3f} | {r['ms_per_image']} "
+            f"| {r['peak_rss_mb']} | {'✅' if r['name'] in front else ''} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def load_configs(path: str, only=None) -> list:
+    with open(path, encoding="utf-8") as f:
+        configs = [{**DEFAULT_CONFIG, **config} for config in json.load(f)]
+    for config in configs:
+        config.setdefault("name", f"{config['model']}-{config['precision']}-{config['prompt_set']}")
+    if only:
+        configs = [config for config in configs if config["name"] in only]
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="장소 태깅 정확도 vs 속도 평가")
+    parser.add_argument("--dataset", default="data/dataset.csv")
+    parser.add_argument("--image-column", help="이미지 열 이름 (기본: 자동 감지)")
+    parser.add_argument("--label-column", help="정답 열 이름 (기본: 자동 감지)")
+    parser.add_argument("--configs", default="benchmarks/eval_configs.json", help="평가할 PlaceTagger 설정 목록 (JSON)")
+    parser.add_argument("--only", nargs="+", help="이 이름의 설정만 평가")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--limit", type=int, help="앞에서부터 N개 이미지만 사용")
+    parser.add_argument("--output", default="eval/place_metrics.json", help="결과 JSON (DVC metrics)")
+    parser.add_argument("--pareto", default="eval/place_pareto.md", help="Pareto 표 (Markdown)")
+    args = parser.parse_args()
+
+    samples = load_dataset(args.dataset, args.image_column, args.label_column, args.limit)
+    base_dir = os.path.dirname(os.path.abspath(args.dataset))
+    loaded = []
+    for ref, label in samples:
+        try:
+            loaded.append((ref, label, read_image(ref, base_dir)))
+        except Exception as e:
+            print(f"⚠️ 이미지 로드 실패 (평가 제외): {ref}, 오류: {e}")
+    print(f"📂 데이터셋: {len(loaded)}/{len(samples)}개 이미지, {len({label for _, label, _ in loaded})}개 클래스")
+
+    results = []
+    for config in load_configs(args.configs, args.only):
+        # 설정마다 새 프로세스 (모델 메모리 / peak RSS가 이전 설정의 영향을 받지 않도록)
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            try:
+                result = executor.submit(evaluate_config, config, loaded, args.batch_size).result()
+            except Exception as e:
+                print(f"⚠️ {config['name']} 평가 실패: {e}")
+                continue
+        results.append(result)
+        print(f"📊 {result['name']}: top-1 {result['top1']:.3f}, top-3 {result['top3']:.3f}, "
+              f"{result['ms_per_image']}ms/image, peak RSS {result['peak_rss_mb']}MB ({result['device']})")
+
+    front = pareto_front(results)
+    table = pareto_table(results, front)
+    print(table)
+
+    for path in (args.output, args.pareto):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "dataset": {"path": args.dataset, "images": len(loaded), "batch_size": args.batch_size},
+            "pareto": sorted(front),
+            "configs": {r["name"]: r for r in results},
+        }, f, ensure_ascii=False, indent=2)
+    with open(args.pareto, "w", encoding="utf-8") as f:
+        f.write(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+# ✅ 백엔드 DB를 읽고 쓰는 스크립트(retag) 테스트용 PostgreSQL (없으면 해당 테스트 생략)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# 백엔드 스키마 중 스크립트가 사용하는 테이블만 (backend/app/models 기준)
+BACKEND_SCHEMA = """
+CREATE TABLE users (id UUID PRIMARY KEY, email VARCHAR NOT NULL UNIQUE, username VARCHAR NOT NULL,
+                    hashed_password VARCHAR NOT NULL, created_at TIMESTAMP);
+CREATE TABLE diary (id UUID PRIMARY KEY, user_id UUID NOT NULL REFERENCES users (id), date TIMESTAMP NOT NULL,
+                    text TEXT, emotions VARCHAR, created_at TIMESTAMP DEFAULT now(),
+                    tagging_status VARCHAR NOT NULL DEFAULT 'done');
+CREATE TABLE image (id UUID PRIMARY KEY, diary_id UUID NOT NULL REFERENCES diary (id) ON DELETE CASCADE,
+                    image_url VARCHAR NOT NULL, latitude FLOAT, longitude FLOAT);
+CREATE TABLE tag (id UUID PRIMARY KEY, tag_name VARCHAR NOT NULL, type VARCHAR NOT NULL,
+                  user_id UUID REFERENCES users (id) ON DELETE CASCADE);
+CREATE UNIQUE INDEX uq_tag_tag_name_shared ON tag (tag_name) WHERE user_id IS NULL;
+CREATE UNIQUE INDEX uq_tag_user_id_tag_name ON tag (user_id, tag_name) WHERE user_id IS NOT NULL;
+CREATE TABLE image_tag (image_id UUID REFERENCES image (id) ON DELETE CASCADE,
+                        tag_id UUID REFERENCES tag (id) ON DELETE CASCADE, PRIMARY KEY (image_id, tag_id));
+"""
+
+
+@pytest.fixture
+def backend_db():
+    """🔹 백엔드 테이블을 만든 SQLAlchemy 엔진 (테스트 후 삭제)"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL이 없어 DB 테스트 생략")
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+
+    engine = sqlalchemy.create_engine(TEST_DATABASE_URL)
+    drop = "DROP TABLE IF EXISTS image_tag, tag, image, diary, users CASCADE"
+    with engine.begin() as conn:
+        conn.exec_driver_sql(drop)
+        conn.exec_driver_sql(BACKEND_SCHEMA)
+    try:
+        yield engine
+    finally:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(drop)
+        engine.dispose()
+
+
+class FakePipeline:
+    """🔹 모델 없이 태깅 라우터를 실행하기 위한 TaggingPipeline 대체 (호출 기록 + 실행 중 대기)"""
+
+    stages = ("place", "location")
+    place_tagger = location_tagger = companion_tagger = embedding_store = None
+
+    def __init__(self):
+        import threading
+
+        self.calls = []
+        self.entered = threading.Event()  # tag()가 시작되면 set
+        self.gate = None  # threading.Event를 넣으면 set될 때까지 tag()가 멈춤
+        self.error = None
+
+    def tag(self, images, image_bytes=None, user_id=None, coordinates=None, embeddings=None, stages=None):
+        self.calls.append({"urls": sorted(images), "user_id": user_id, "stages": stages})
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        tags = [{"type": "장소", "tag_name": "카페"}]
+        if stages is None or "location" in stages:
+            tags.append({"type": "지역", "tag_name": "서울"})
+        return {url: list(tags) for url in images}
+
+
+@pytest.fixture
+def tag_router(monkeypatch):
+    """🔹 FakePipeline으로 새로 import한 app.routers.tag 모듈"""
+    import importlib
+    import sys
+
+    pytest.importorskip("torch")  # 전처리 모듈이 torch를 import
+    import app.models.tagging_pipeline as tagging_pipeline
+
+    monkeypatch.setattr(tagging_pipeline, "TaggingPipeline", FakePipeline)
+    sys.modules.pop("app.routers.tag", None)
+    try:
+        yield importlib.import_module("app.routers.tag")
+    finally:
+        sys.modules.pop("app.routers.tag", None)
+
+
+@pytest.fixture
+def jpeg_bytes():
+    from io import BytesIO
+
+    from PIL import Image
+
+    def make(color=(200, 120, 40)) -> bytes:
+        buffer = BytesIO()
+        Image.new("RGB", (64, 48), color).save(buffer, format="JPEG")
+        return buffer.getvalue()
+
+    return make
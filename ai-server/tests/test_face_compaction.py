@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.utils.face_compaction import MAX_EXEMPLARS, compact_database, merge_identities, remap_face_images
+from app.utils.face_store import FaceStore
+
+
+def _face(seed: int, base=None) -> dict:
+    vector = np.random.default_rng(seed).normal(size=128)
+    if base is not None:
+        vector = base + 0.05 * vector
+    return {"url": f"https://bucket/{seed}.jpg", "embedding": (vector / np.linalg.norm(vector)).tolist()}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FaceStore(shard_dir=str(tmp_path / "face_shards"), legacy_path=str(tmp_path / "face_database.json"))
+
+
+def test_index_is_rebuilt_when_exemplars_are_reselected(store):
+    store.commit({"person_1": [_face(i) for i in range(2 * MAX_EXEMPLARS - 1)]}, "alice", new_ids=["person_1"])
+    assert len(store.index("alice")) == 2 * MAX_EXEMPLARS - 1
+
+    # 2K개가 되면 K개로 정리된 뒤 다시 2K-1개까지 늘어남 (개수만 보면 인덱스와 같아 보임)
+    store.commit({"person_1": [_face(100)]}, "alice")
+    store.commit({"person_1": [_face(200 + i) for i in range(MAX_EXEMPLARS - 1)]}, "alice")
+
+    embeddings = store.load("alice")["person_1"]["embeddings"]
+    assert len(embeddings) == 2 * MAX_EXEMPLARS - 1
+    top = store.index("alice").search(np.array(_face(200)["embedding"]), k=1)
+    assert top[0][0] == "person_1" and top[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert len(store.index("alice")) == len(embeddings)
+
+
+def test_merge_identities_merges_close_centroids_into_lowest_id():
+    base = np.random.default_rng(0).normal(size=128)
+    database = {
+        "person_2": {"embeddings": [_face(1, base)]},
+        "person_5": {"embeddings": [_face(2, base)]},
+        "person_7": {"embeddings": [_face(3)]},
+    }
+
+    merged, mapping = merge_identities(database, threshold=0.9)
+
+    assert mapping == {"person_5": "person_2"}
+    assert sorted(merged) == ["person_2", "person_7"]
+    assert merged["person_2"]["count"] == 2
+
+
+def test_compaction_keeps_at_most_k_exemplars():
+    database = {"person_1": {"embeddings": [_face(i) for i in range(30)]}}
+
+    compacted, stats = compact_database(database, max_exemplars=5, merge_threshold=None)
+
+    assert len(compacted["person_1"]["embeddings"]) == 5
+    assert compacted["person_1"]["count"] == 30
+    assert stats["embeddings_before"] == 30 and stats["embeddings_after"] == 5
+
+
+def test_remap_face_images(tmp_path):
+    for person_id in ("person_1", "person_3", "person_4"):
+        (tmp_path / f"{person_id}.jpg").write_bytes(person_id.encode())
+
+    remap_face_images(str(tmp_path), {"person_3": "person_1", "person_4": "person_2"})
+
+    assert sorted(os.listdir(tmp_path)) == ["person_1.jpg", "person_2.jpg"]
+    assert (tmp_path / "person_1.jpg").read_bytes() == b"person_1"
+    assert (tmp_path / "person_2.jpg").read_bytes() == b"person_4"
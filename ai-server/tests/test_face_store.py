@@ -0,0 +1,171 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from app.utils.face_store import FaceStore
+
+
+def _face(seed: int) -> dict:
+    vector = np.random.default_rng(seed).normal(size=128)
+    return {"url": f"https://bucket/{seed}.jpg", "embedding": (vector / np.linalg.norm(vector)).tolist()}
+
+
+@pytest.fixture
+def legacy_path(tmp_path):
+    return str(tmp_path / "face_database.json")
+
+
+@pytest.fixture
+def store(tmp_path, legacy_path):
+    return FaceStore(shard_dir=str(tmp_path / "face_shards"), legacy_path=legacy_path)
+
+
+def test_shards_are_isolated_per_user(store):
+    store.commit({"person_1": [_face(1)]}, "alice", new_ids=["person_1"])
+    store.commit({"person_1": [_face(2)]}, "bob", new_ids=["person_1"])
+
+    assert [e["url"] for e in store.load("alice")["person_1"]["embeddings"]] == ["https://bucket/1.jpg"]
+    assert [e["url"] for e in store.load("bob")["person_1"]["embeddings"]] == ["https://bucket/2.jpg"]
+
+
+def test_invalid_user_id_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.load("../etc/passwd")
+
+
+def test_lru_evicts_least_recently_used_shard(tmp_path, legacy_path):
+    store = FaceStore(shard_dir=str(tmp_path / "face_shards"), legacy_path=legacy_path, memory_budget=1)
+    store.commit({"person_1": [_face(1)]}, "alice", new_ids=["person_1"])
+    store.commit({"person_1": [_face(2)]}, "bob", new_ids=["person_1"])
+
+    assert list(store._shards) == ["bob"]
+    assert "person_1" in store.load("alice")  # 제거된 샤드는 디스크에서 다시 로드
+
+
+def test_new_shard_ids_start_after_legacy_database(store, legacy_path):
+    with open(legacy_path, "w") as f:
+        json.dump({f"person_{i}": {"embeddings": [_face(i)]} for i in (1, 2, 7)}, f)
+
+    id_map = store.commit({"person_1": [_face(10)], "person_2": [_face(11)]}, "alice",
+                          new_ids=["person_1", "person_2"])
+
+    assert id_map == {"person_1": "person_8", "person_2": "person_9"}
+    assert sorted(store.load("alice")) == ["person_8", "person_9"]
+
+
+def test_person_ids_are_never_reused_after_removal(store, tmp_path, legacy_path):
+    store.commit({"person_1": [_face(1)], "person_2": [_face(2)]}, "alice", new_ids=["person_1", "person_2"])
+    store.rewrite(lambda database: {"person_1": database["person_1"]}, "alice")
+
+    reopened = FaceStore(shard_dir=str(tmp_path / "face_shards"), legacy_path=legacy_path)
+    assert reopened.commit({"person_2": [_face(3)]}, "alice", new_ids=["person_2"]) == {"person_2": "person_3"}
+
+
+def _urls(database, person_id):
+    return [e["url"] for e in database[person_id]["embeddings"]]
+
+
+def test_wal_is_replayed_after_restart(store, tmp_path, legacy_path):
+    store.commit({"person_1": [_face(1)]}, "alice", new_ids=["person_1"])
+    store.commit({"person_1": [_face(2)], "person_2": [_face(3)]}, "alice", new_ids=["person_2"])
+    assert not (tmp_path / "face_shards" / "alice.json").exists()  # 아직 체크포인트 전 (WAL만 있음)
+
+    restarted = FaceStore(shard_dir=str(tmp_path / "face_shards"), legacy_path=legacy_path)
+    database = restarted.load("alice")
+    assert _urls(database, "person_1") == ["https://bucket/1.jpg", "https://bucket/2.jpg"]
+    assert _urls(database, "person_2") == ["https://bucket/3.jpg"]
+
+
+def test_torn_wal_record_is_ignored_and_truncated(store, tmp_path, legacy_path):
+    store.commit({"person_1": [_face(1)]}, "alice", new_ids=["person_1"])
+    with open(tmp_path / "face_shards" / "alice.json.wal", "ab") as f:
+        f.write(b'{"seq": 2, "updates": {"person_9"')  # 쓰는 도중 비정상 종료
+
+    recovered = FaceStore(shard_dir=str(tmp_path / "face_shards"), legacy_path=legacy_path)
+    assert sorted(recovered.load("alice")) == ["person_1"]
+    recovered.commit({"person_1": [_face(2)]}, "alice")
+
+    database = FaceStore(shard_dir=str(tmp_path / "face_shards"), legacy_path=legacy_path).load("alice")
+    assert _urls(database, "person_1") == ["https://bucket/1.jpg", "https://bucket/2.jpg"]
+
+
+def test_checkpoint_snapshot_plus_wal_recovers(tmp_path, legacy_path):
+    shard_dir = str(tmp_path / "face_shards")
+    writer = FaceStore(shard_dir=shard_dir, legacy_path=legacy_path, checkpoint_bytes=1)
+    writer.commit({"person_1": [_face(1)]}, "alice", new_ids=["person_1"])  # 바로 체크포인트
+    writer.checkpoint_bytes = 1 << 30
+    writer.commit({"person_2": [_face(2)]}, "alice", new_ids=["person_2"])  # WAL에만 기록
+
+    with open(tmp_path / "face_shards" / "alice.json") as f:
+        assert sorted(json.load(f)["people"]) == ["person_1"]
+    assert sorted(FaceStore(shard_dir=shard_dir, legacy_path=legacy_path).load("alice")) == ["person_1", "person_2"]
+
+
+def test_reader_follows_other_workers_wal_and_checkpoints(tmp_path, legacy_path):
+    shard_dir = str(tmp_path / "face_shards")
+    worker_a = FaceStore(shard_dir=shard_dir, legacy_path=legacy_path)
+    worker_b = FaceStore(shard_dir=shard_dir, legacy_path=legacy_path)
+    assert worker_b.load("alice") == {}
+
+    worker_a.commit({"person_1": [_face(1)]}, "alice", new_ids=["person_1"])
+    assert sorted(worker_b.load("alice")) == ["person_1"]
+
+    worker_a.checkpoint_bytes = 1
+    worker_a.commit({"person_2": [_face(2)]}, "alice", new_ids=["person_2"])
+    assert sorted(worker_b.load("alice")) == ["person_1", "person_2"]
+
+
+def test_concurrent_commits_remap_colliding_new_ids(tmp_path, legacy_path):
+    shard_dir = str(tmp_path / "face_shards")
+    workers = [FaceStore(shard_dir=shard_dir, legacy_path=legacy_path) for _ in range(8)]
+    for worker in workers:
+        worker.load("alice")  # 모두 빈 샤드를 보고 같은 임시 ID(person_1)를 만듦
+    barrier = threading.Barrier(len(workers))
+    results = [None] * len(workers)
+
+    def run(i):
+        barrier.wait()
+        id_map = workers[i].commit({"person_1": [_face(i)]}, "alice", new_ids=["person_1"])
+        results[i] = id_map.get("person_1", "person_1")
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == sorted(f"person_{i}" for i in range(1, len(workers) + 1))
+    database = FaceStore(shard_dir=shard_dir, legacy_path=legacy_path).load("alice")
+    for i, person_id in enumerate(results):
+        assert _urls(database, person_id) == [f"https://bucket/{i}.jpg"]
+
+
+def test_slow_shard_reload_does_not_block_other_shards(store, tmp_path, legacy_path, monkeypatch):
+    store.commit({"person_1": [_face(1)]}, "alice", new_ids=["person_1"])
+    store.commit({"person_1": [_face(2)]}, "bob", new_ids=["person_1"])
+    FaceStore(shard_dir=str(tmp_path / "face_shards"), legacy_path=legacy_path).commit(
+        {"person_1": [_face(3)]}, "alice")  # 다른 워커의 기록 → 다음 조회 때 WAL 따라 읽기
+
+    entered, release = threading.Event(), threading.Event()
+    replay = store._replay
+
+    def slow_replay(shard, path):
+        entered.set()
+        release.wait(5)
+        replay(shard, path)
+
+    monkeypatch.setattr(store, "_replay", slow_replay)
+    reader = threading.Thread(target=store.load, args=("alice",))
+    reader.start()
+    assert entered.wait(5)
+
+    done = threading.Event()
+    threading.Thread(target=lambda: (store.load("bob"), done.set()), daemon=True).start()
+    try:
+        assert done.wait(1), "다른 샤드 조회가 느린 재로드에 막힘"
+    finally:
+        release.set()
+        reader.join()
+    assert _urls(store.load("alice"), "person_1") == ["https://bucket/1.jpg", "https://bucket/3.jpg"]
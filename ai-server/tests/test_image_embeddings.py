@@ -0,0 +1,33 @@
+import numpy as np
+
+from app.utils.image_embeddings import ENTRY_OVERHEAD_BYTES, ImageEmbeddingStore
+
+
+def _embeddings(seed: int, count: int = 4, dim: int = 8) -> dict:
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return {f"https://bucket/{seed}-{n}.jpg": vector for n, vector in enumerate(vectors)}
+
+
+def test_least_recently_used_users_are_evicted_and_reloaded(tmp_path):
+    per_user = 4 * (8 * 4 + ENTRY_OVERHEAD_BYTES)
+    store = ImageEmbeddingStore(str(tmp_path), memory_budget=2 * per_user)
+    for seed, user_id in enumerate(["alice", "bob", "carol"]):
+        store.add(user_id, _embeddings(seed))
+
+    assert list(store._users) == ["bob", "carol"]
+    assert store._memory_used == 2 * per_user
+
+    # 제거된 사용자는 파일에서 다시 읽고, 그 대신 가장 오래된 사용자가 제거됨
+    query = _embeddings(0)["https://bucket/0-2.jpg"]
+    assert store.search("alice", query, k=1)[0][0] == "https://bucket/0-2.jpg"
+    assert store.count("alice") == 4
+    assert "bob" not in store._users and "alice" in store._users
+
+
+def test_recent_user_is_kept_even_over_budget(tmp_path):
+    store = ImageEmbeddingStore(str(tmp_path), memory_budget=1)
+    store.add("alice", _embeddings(0))
+    store.add("bob", _embeddings(1))
+
+    assert list(store._users) == ["bob"]
+    assert store.count("bob") == 4
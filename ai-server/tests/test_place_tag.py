@@ -0,0 +1,34 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("clip")
+
+from app.models.place_tag import PlaceTagger  # noqa: E402
+
+
+class _ExplodingModel:
+    def encode_image(self, tensors):
+        raise AssertionError("빈 배치에서 encode_image를 호출하면 안 됨")
+
+
+def test_empty_batch_returns_without_encoding():
+    tagger = PlaceTagger.__new__(PlaceTagger)  # CLIP 모델 로드 없이 배치 경로만 확인
+    tagger.model = _ExplodingModel()
+
+    assert tagger.predict_places_batch([], torch.empty(0, 3, 224, 224)) == {}
+
+
+def test_single_template_keeps_raw_features():
+    from app.models.place_tag import ensemble_text_features
+
+    features = torch.randn(1, 4, 8) * 5
+    assert torch.allclose(ensemble_text_features(features), features[0], atol=1e-5)
+
+
+def test_templates_are_normalized_before_averaging():
+    from app.models.place_tag import ensemble_text_features
+
+    # 노름이 큰 템플릿이 방향을 좌우하지 않아야 함
+    features = torch.tensor([[[10.0, 0.0]], [[0.0, 1.0]]])
+    ensembled = ensemble_text_features(features)
+    assert torch.allclose(ensembled, torch.tensor([[1.0, 1.0]]) / 2 ** 0.5 * 5.5)
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import uuid
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+pytest.importorskip("torch")  # 태깅 파이프라인 모듈이 전처리(torch)를 import
+
+from app.scripts.retag import DatabaseWriter, tag_remote  # noqa: E402
+
+
+def _insert_image(conn, url: str, user_id=None) -> tuple:
+    from sqlalchemy import text
+
+    user_id = user_id or uuid.uuid4()
+    diary_id, image_id = uuid.uuid4(), uuid.uuid4()
+    conn.execute(text("INSERT INTO users (id, email, username, hashed_password) VALUES (:id, :email, 'u', 'x') "
+                      "ON CONFLICT DO NOTHING"), {"id": user_id, "email": f"{user_id}@example.com"})
+    conn.execute(text("INSERT INTO diary (id, user_id, date) VALUES (:id, :user_id, now())"),
+                 {"id": diary_id, "user_id": user_id})
+    conn.execute(text("INSERT INTO image (id, diary_id, image_url) VALUES (:id, :diary_id, :url)"),
+                 {"id": image_id, "diary_id": diary_id, "url": url})
+    return image_id, user_id
+
+
+def test_database_writer_scopes_person_tags_by_image_owner(backend_db):
+    from sqlalchemy import text
+
+    with backend_db.begin() as conn:
+        alice_image, alice = _insert_image(conn, "https://bucket/a.jpg")
+        bob_image, bob = _insert_image(conn, "https://bucket/b.jpg")
+
+    writer = DatabaseWriter(backend_db, ["place", "companion"])
+    tags = [{"type": "장소", "tag_name": "카페"}, {"type": "인물", "tag_name": "person_1"}]
+    writer.write([{"image_url": "https://bucket/a.jpg", "image_id": str(alice_image)},
+                  {"image_url": "https://bucket/b.jpg"}],
+                 {"https://bucket/a.jpg": tags, "https://bucket/b.jpg": tags})
+
+    with backend_db.connect() as conn:
+        rows = conn.execute(text("SELECT tag_name, user_id FROM tag ORDER BY tag_name, user_id")).fetchall()
+        links = conn.execute(text("SELECT count(*) FROM image_tag")).scalar()
+    assert sorted((name, owner) for name, owner in rows) == sorted(
+        [("person_1", alice), ("person_1", bob), ("카페", None)])
+    assert links == 4
+
+
+def test_tag_remote_sends_bulk_and_retries_after_429():
+    received = []
+
+    async def handler(request):
+        form = await request.post()
+        received.append((json.loads(form["metadata"]), [form.getall("files")[0].file.read()]))
+        if len(received) == 1:
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        images = json.loads(form["metadata"])["images"]
+        return web.json_response({"results": [{"image_url": image["image_url"], "tags": [{"type": "장소",
+                                                                                        "tag_name": "카페"}]}
+                                              for image in images]})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/ai/generate-tags/upload", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            records = [{"image_url": "https://bucket/a.jpg", "user_id": "alice", "coordinates": (37.5, 127.0)},
+                       {"image_url": "https://bucket/missing.jpg", "user_id": "alice"}]
+            async with aiohttp.ClientSession() as session:
+                return await tag_remote(session, f"http://127.0.0.1:{port}/ai", records,
+                                        {"https://bucket/a.jpg": b"jpeg"}, ["place"])
+        finally:
+            await runner.cleanup()
+
+    tags = asyncio.run(scenario())
+
+    assert tags == {"https://bucket/a.jpg": [{"type": "장소", "tag_name": "카페"}]}
+    assert len(received) == 2  # 429 후 재시도
+    metadata, files = received[-1]
+    assert metadata["priority"] == "bulk" and metadata["stages"] == ["place"]
+    assert metadata["images"] == [{"image_url": "https://bucket/a.jpg", "user_id": "alice",
+                                   "latitude": 37.5, "longitude": 127.0}]
+    assert files == [b"jpeg"]
+
+
+def test_tag_remote_drops_images_the_server_failed():
+    async def handler(request):
+        return web.json_response({"results": [
+            {"image_url": "https://bucket/a.jpg", "tags": [{"type": "장소", "tag_name": "카페"}], "status": "ok"},
+            {"image_url": "https://bucket/b.jpg", "tags": [], "status": "failed", "error": "decode"},
+        ]})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/ai/generate-tags/upload", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            records = [{"image_url": "https://bucket/a.jpg", "user_id": "alice"},
+                       {"image_url": "https://bucket/b.jpg", "user_id": "alice"}]
+            async with aiohttp.ClientSession() as session:
+                return await tag_remote(session, f"http://127.0.0.1:{port}/ai", records,
+                                        {"https://bucket/a.jpg": b"jpeg", "https://bucket/b.jpg": b"broken"},
+                                        ["place"])
+        finally:
+            await runner.cleanup()
+
+    tags = asyncio.run(scenario())
+
+    # 실패한 이미지는 결과에서 빠짐 → failed로 집계되고 DatabaseWriter가 기존 태그를 지우지 않음
+    assert tags == {"https://bucket/a.jpg": [{"type": "장소", "tag_name": "카페"}]}
+
+
+def test_iter_database_resumes_after_last_id(backend_db):
+    from app.scripts.retag import iter_database
+
+    alice = uuid.uuid4()
+    with backend_db.begin() as conn:
+        images = [_insert_image(conn, f"https://bucket/{n}.jpg", alice)[0] for n in range(5)]
+        _insert_image(conn, "https://bucket/other.jpg")
+    images.sort()
+
+    records = list(iter_database(backend_db, user_id=str(alice), page_size=2))
+    assert [record["image_id"] for record in records] == [str(image_id) for image_id in images]
+
+    resumed = list(iter_database(backend_db, last_id=records[1]["image_id"], user_id=str(alice), page_size=2))
+    assert [record["image_id"] for record in resumed] == [str(image_id) for image_id in images[2:]]
+
+    # 이전 형식 체크포인트 (완료된 수만 기록)
+    legacy = list(iter_database(backend_db, user_id=str(alice), offset=3, page_size=2))
+    assert [record["image_id"] for record in legacy] == [str(image_id) for image_id in images[3:]]
+
+
+def test_checkpoint_keeps_last_id(tmp_path):
+    from app.scripts.retag import Checkpoint
+
+    path = str(tmp_path / "retag.ckpt")
+    job = {"source": "db"}
+    checkpoint = Checkpoint(path, job)
+    checkpoint.save(64, {}, last_id="abc")
+    checkpoint.save(70, {})  # DB가 아닌 입력은 image id 없음
+
+    resumed = Checkpoint(path, job)
+    assert (resumed.done, resumed.last_id) == (70, "abc")
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+def test_waiters_share_the_owner_result():
+    async def scenario():
+        flights = SingleFlight("test")
+        flight, is_owner = flights.claim("a")
+        shared, is_shared_owner = flights.claim("a")
+        assert is_owner and not is_shared_owner and shared is flight
+
+        waiter = asyncio.ensure_future(SingleFlight.wait(shared))
+        flights.resolve("a", "tags")
+        result = await waiter
+
+        # 끝난 키는 다시 실행됨 (결과 캐시가 아님)
+        _, again = flights.claim("a")
+        return result, again, flights.stats()
+
+    result, again, stats = asyncio.run(scenario())
+    assert result == "tags" and again
+    assert stats == {"in_flight": 1, "executed": 2, "coalesced": 1}
+
+
+def test_cancelled_waiter_does_not_cancel_the_flight():
+    async def scenario():
+        flights = SingleFlight("test")
+        flight, _ = flights.claim("a")
+        waiter = asyncio.ensure_future(SingleFlight.wait(flight))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not flight.cancelled()
+        flights.resolve("a", "tags")
+        return await SingleFlight.wait(flight)
+
+    assert asyncio.run(scenario()) == "tags"
+
+
+def test_failed_flight_raises_in_waiters():
+    async def scenario():
+        flights = SingleFlight("test")
+        flight, _ = flights.claim("a")
+        flights.fail("a", RuntimeError("boom"))
+        await SingleFlight.wait(flight)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
+
+
+def _item(tag_router, url, content_hash="same"):
+    return tag_router.ImageMetadata(image_url=url, user_id="alice", content_hash=content_hash)
+
+
+def test_tagging_error_resolves_content_waiters(tag_router, jpeg_bytes):
+    tag_router.pipeline.error = RuntimeError("model crashed")
+    uploaded = {"https://bucket/1.jpg": jpeg_bytes(), "https://bucket/2.jpg": jpeg_bytes()}
+
+    async def scenario():
+        owner = asyncio.ensure_future(
+            tag_router._tag_images([_item(tag_router, "https://bucket/1.jpg")], uploaded, ("place",)))
+        await asyncio.sleep(0)  # owner가 내용 해시를 먼저 claim
+        waiter = tag_router._tag_images([_item(tag_router, "https://bucket/2.jpg")], uploaded, ("place",))
+        shared = await asyncio.wait_for(waiter, timeout=5)
+        with pytest.raises(RuntimeError):
+            await owner
+        return shared
+
+    shared = asyncio.run(scenario())
+    assert shared == {("alice", "https://bucket/2.jpg"): tag_router.failed_outcome("tagging")}
+    assert tag_router.content_flights.stats()["in_flight"] == 0
+
+
+def test_cancelled_download_resolves_content_waiters(tag_router, monkeypatch):
+    started = None
+
+    async def blocking_load(session, item, uploaded):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(tag_router, "_load_image_bytes", blocking_load)
+
+    async def scenario():
+        nonlocal started
+        started = asyncio.Event()
+        owner = asyncio.ensure_future(
+            tag_router._tag_images([_item(tag_router, "https://bucket/1.jpg")], {}, ("place",)))
+        await started.wait()
+        waiter = asyncio.ensure_future(
+            tag_router._tag_images([_item(tag_router, "https://bucket/2.jpg")], {}, ("place",)))
+        await asyncio.sleep(0)  # waiter가 owner의 flight를 공유
+        owner.cancel()  # 예: 클라이언트 연결 종료
+        shared = await asyncio.wait_for(waiter, timeout=5)
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return shared
+
+    shared = asyncio.run(scenario())
+    assert shared == {("alice", "https://bucket/2.jpg"): tag_router.failed_outcome("tagging")}
+    assert tag_router.content_flights.stats()["in_flight"] == 0
+    assert tag_router.pipeline.calls == []
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import threading
+
+import httpx
+from fastapi import FastAPI
+
+from app.utils.admission import AdmissionController
+
+
+def _client(tag_router) -> httpx.AsyncClient:
+    app = FastAPI()
+    app.include_router(tag_router.router, prefix="/ai")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def _upload(client, urls, blobs, **metadata):
+    body = {"images": [{"image_url": url, "user_id": "alice"} for url in urls], **metadata}
+    files = [("files", (url.rsplit("/", 1)[-1], blob, "image/jpeg")) for url, blob in zip(urls, blobs)]
+    return client.post("/ai/generate-tags/upload", data={"metadata": json.dumps(body)}, files=files)
+
+
+def test_full_queue_returns_429_with_retry_after(tag_router, jpeg_bytes):
+    tag_router.admission = AdmissionController(max_concurrency=1, bulk_max_concurrency=1,
+                                               max_queue_depth={"interactive": 0, "bulk": 0})
+    tag_router.pipeline.gate = threading.Event()
+
+    async def scenario():
+        async with _client(tag_router) as client:
+            first = asyncio.ensure_future(_upload(client, ["https://bucket/1.jpg"], [jpeg_bytes()]))
+            while not tag_router.pipeline.entered.is_set():
+                await asyncio.sleep(0.01)
+            rejected = await _upload(client, ["https://bucket/2.jpg"], [jpeg_bytes((1, 2, 3))])
+            tag_router.pipeline.gate.set()
+            return await first, rejected
+
+    first, rejected = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "5"
+    assert tag_router.admission.stats()["counters"] == {"admitted_interactive": 1, "rejected_interactive": 1}
+
+
+def test_bulk_requests_use_the_bulk_queue(tag_router, jpeg_bytes):
+    tag_router.admission = AdmissionController(max_concurrency=2, bulk_max_concurrency=1,
+                                               max_queue_depth={"interactive": 0, "bulk": 0})
+    tag_router.pipeline.gate = threading.Event()
+
+    async def scenario():
+        async with _client(tag_router) as client:
+            bulk = asyncio.ensure_future(_upload(client, ["https://bucket/1.jpg"], [jpeg_bytes()], priority="bulk"))
+            while not tag_router.pipeline.entered.is_set():
+                await asyncio.sleep(0.01)
+            second_bulk = await _upload(client, ["https://bucket/2.jpg"], [jpeg_bytes((1, 2, 3))], priority="bulk")
+            tag_router.pipeline.gate.set()  # 남은 슬롯은 interactive 전용
+            interactive = await _upload(client, ["https://bucket/3.jpg"], [jpeg_bytes((9, 9, 9))])
+            return await bulk, second_bulk, interactive
+
+    bulk, second_bulk, interactive = asyncio.run(scenario())
+    assert bulk.status_code == 200 and interactive.status_code == 200
+    assert second_bulk.status_code == 429
+
+
+def test_requested_stages_are_passed_to_the_pipeline(tag_router, jpeg_bytes):
+    async def scenario():
+        async with _client(tag_router) as client:
+            return await _upload(client, ["https://bucket/1.jpg"], [jpeg_bytes()], stages=["place"])
+
+    response = asyncio.run(scenario())
+    assert response.json()["results"] == [{"image_url": "https://bucket/1.jpg",
+                                           "tags": [{"type": "장소", "tag_name": "카페"}], "status": "ok"}]
+    assert tag_router.pipeline.calls[0]["stages"] == ("place",)
+
+
+def test_undecodable_image_is_reported_as_failed(tag_router, jpeg_bytes):
+    async def scenario():
+        async with _client(tag_router) as client:
+            return await _upload(client, ["https://bucket/1.jpg", "https://bucket/broken.jpg"],
+                                 [jpeg_bytes(), b"not an image"])
+
+    results = asyncio.run(scenario()).json()["results"]
+    assert results[0]["status"] == "ok"
+    assert results[1] == {"image_url": "https://bucket/broken.jpg", "tags": [], "status": "failed", "error": "decode"}
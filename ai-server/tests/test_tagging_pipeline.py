@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")  # 전처리 모듈이 torch를 import
+
+from PIL import Image  # noqa: E402
+
+from app.models.tagging_pipeline import TaggingPipeline  # noqa: E402
+
+
+class StubPlaceTagger:
+    input_resolution = 32
+    tta = False
+
+    def predict_places_batch(self, urls, tensors, views=1):
+        assert len(tensors) == len(urls) * views
+        return {url: {"place": "카페", "embedding": np.ones(4, dtype=np.float32)} for url in urls}
+
+
+class StubLocationTagger:
+    def predict_locations(self, urls, image_bytes=None, coordinates=None):
+        return {url: {"region": "서울"} for url in urls}
+
+
+class StubCompanionTagger:
+    def process_faces(self, faces, user_id=None):
+        return {url: [f"person_1_{user_id}"] for url in faces}
+
+
+def _pipeline(stages=("place", "location", "companion")):
+    return TaggingPipeline(stages=stages, place_tagger=StubPlaceTagger(), location_tagger=StubLocationTagger(),
+                           companion_tagger=StubCompanionTagger())
+
+
+def test_tag_runs_every_stage_with_real_pipeline():
+    images = {"https://bucket/a.jpg": Image.new("RGB", (64, 48), (200, 120, 40))}
+    embeddings = {}
+    pipeline = _pipeline()
+
+    results = pipeline.tag(images, user_id="alice", embeddings=embeddings)
+
+    assert results == {"https://bucket/a.jpg": [
+        {"type": "장소", "tag_name": "카페"},
+        {"type": "지역", "tag_name": "서울"},
+        {"type": "인물", "tag_name": "person_1_alice"},
+    ]}
+    assert list(embeddings) == ["https://bucket/a.jpg"]
+    assert set(pipeline.stats()) == {"preprocess", "place", "location", "companion"}
+
+
+def test_tag_runs_only_requested_stages():
+    pipeline = _pipeline()
+    images = {"https://bucket/a.jpg": Image.new("RGB", (64, 48))}
+
+    assert pipeline.tag(images, user_id="alice", stages=["location"]) == {
+        "https://bucket/a.jpg": [{"type": "지역", "tag_name": "서울"}]}
+    assert set(pipeline.stats()) == {"location"}
@@ -0,0 +1,39 @@
+"""Add tagging outbox and diary tagging status
+
+Revision ID: c7e4b2a91f3d
+Revises: 9a31deff2193
+Create Date: 2026-10-19 10:12:41.381205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "c7e4b2a91f3d"
+down_revision = "9a31deff2193"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    """diary.tagging_status 컬럼 + tagging_outbox 테이블 추가 (기존 다이어리는 태깅 완료로 간주)"""
+    op.add_column("diary", sa.Column("tagging_status", sa.String(), nullable=False, server_default="done"))
+    op.create_table(
+        "tagging_outbox",
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("diary_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.TIMESTAMP(), nullable=False, server_default=sa.text("now()")),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(), server_default=sa.text("now()"), nullable=True),
+        sa.ForeignKeyConstraint(["diary_id"], ["diary.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tagging_outbox_next_attempt_at", "tagging_outbox", ["next_attempt_at"])
+
+def downgrade() -> None:
+    """다운그레이드 시 tagging_outbox 테이블과 tagging_status 컬럼 삭제"""
+    op.drop_index("ix_tagging_outbox_next_attempt_at", table_name="tagging_outbox")
+    op.drop_table("tagging_outbox")
+    op.drop_column("diary", "tagging_status")
@@ -0,0 +1,83 @@
+"""Scope person tags per user
+
+Revision ID: e2d5f8a3b6c1
+Revises: c7e4b2a91f3d
+Create Date: 2026-10-19 14:03:27.512904
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "e2d5f8a3b6c1"
+down_revision = "c7e4b2a91f3d"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    """tag.user_id 추가 후 기존 인물 태그를 사용자별로 분리
+
+    AI 서버가 사용자별 얼굴 DB 샤드를 쓰면서 person ID가 샤드마다 따로 발급되므로, 같은 "person_3"이라도
+    사용자마다 다른 인물이다. 기존 인물 태그는 그 태그가 붙은 이미지의 다이어리 작성자별로 복제해 연결한다.
+    """
+    op.add_column("tag", sa.Column("user_id", postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key("tag_user_id_fkey", "tag", "users", ["user_id"], ["id"], ondelete="CASCADE")
+    op.create_index("ix_tag_user_id", "tag", ["user_id"])
+    op.drop_constraint("tag_tag_name_key", "tag", type_="unique")
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT DISTINCT t.id, t.tag_name, t.type, d.user_id FROM tag t "
+        "JOIN image_tag it ON it.tag_id = t.id "
+        "JOIN image i ON i.id = it.image_id "
+        "JOIN diary d ON d.id = i.diary_id "
+        "WHERE t.type = '인물' ORDER BY t.id, d.user_id"
+    )).fetchall()
+
+    owned = set()
+    for tag_id, tag_name, tag_type, user_id in rows:
+        if tag_id not in owned:  # 첫 사용자는 기존 태그 행을 그대로 가져감
+            owned.add(tag_id)
+            bind.execute(sa.text("UPDATE tag SET user_id = :user_id WHERE id = :tag_id"),
+                         {"user_id": user_id, "tag_id": tag_id})
+            continue
+        new_id = uuid.uuid4()
+        bind.execute(sa.text("INSERT INTO tag (id, tag_name, type, user_id) VALUES (:id, :tag_name, :type, :user_id)"),
+                     {"id": new_id, "tag_name": tag_name, "type": tag_type, "user_id": user_id})
+        bind.execute(sa.text(
+            "UPDATE image_tag SET tag_id = :new_id WHERE tag_id = :tag_id AND image_id IN "
+            "(SELECT i.id FROM image i JOIN diary d ON d.id = i.diary_id WHERE d.user_id = :user_id)"
+        ), {"new_id": new_id, "tag_id": tag_id, "user_id": user_id})
+
+    # 어떤 이미지에도 연결되지 않은 인물 태그는 소유자를 알 수 없으므로 삭제
+    bind.execute(sa.text("DELETE FROM tag WHERE type = '인물' AND user_id IS NULL"))
+
+    op.create_index("uq_tag_tag_name_shared", "tag", ["tag_name"], unique=True,
+                    postgresql_where=sa.text("user_id IS NULL"))
+    op.create_index("uq_tag_user_id_tag_name", "tag", ["user_id", "tag_name"], unique=True,
+                    postgresql_where=sa.text("user_id IS NOT NULL"))
+
+def downgrade() -> None:
+    """다운그레이드 시 사용자별 인물 태그를 이름 기준으로 다시 합치고 user_id 컬럼 삭제"""
+    op.drop_index("uq_tag_user_id_tag_name", table_name="tag")
+    op.drop_index("uq_tag_tag_name_shared", table_name="tag")
+
+    bind = op.get_bind()
+    bind.execute(sa.text(
+        "WITH keep AS (SELECT tag_name, MIN(id::text)::uuid AS id FROM tag GROUP BY tag_name) "
+        "INSERT INTO image_tag (image_id, tag_id) "
+        "SELECT it.image_id, keep.id FROM image_tag it JOIN tag t ON t.id = it.tag_id "
+        "JOIN keep ON keep.tag_name = t.tag_name WHERE t.id <> keep.id ON CONFLICT DO NOTHING"
+    ))
+    bind.execute(sa.text(
+        "DELETE FROM tag t USING (SELECT tag_name, MIN(id::text)::uuid AS id FROM tag GROUP BY tag_name) keep "
+        "WHERE t.tag_name = keep.tag_name AND t.id <> keep.id"
+    ))
+
+    op.create_unique_constraint("tag_tag_name_key", "tag", ["tag_name"])
+    op.drop_index("ix_tag_user_id", table_name="tag")
+    op.drop_constraint("tag_user_id_fkey", "tag", type_="foreignkey")
+    op.drop_column("tag", "user_id")
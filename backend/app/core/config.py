@@ -1,6 +1,9 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import boto3
+import httpx
+from botocore.config import Config
 
 load_dotenv()
 
@@ -19,6 +22,46 @@ class Settings:
     AWS_REGION = os.getenv("AWS_REGION", "ap-southeast-2")  # ✅ 기본 리전: 서울
     AWS_S3_BUCKET_NAME = os.getenv("AWS_S3_BUCKET_NAME")
 
+    # ✅ S3 호환 스토리지 주소 (비우면 AWS S3, 로컬 테스트는 MinIO 예: http://localhost:9000)
+    S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+    # ✅ 저장된 이미지의 공개 URL 앞부분 (비우면 endpoint/bucket 또는 https://{bucket}.s3.amazonaws.com)
+    S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")
+
+    # ✅ 클라이언트 직접 업로드 (presigned PUT): URL 유효 시간 (초) / 한 번에 발급할 최대 개수 / 이미지 최대 크기
+    PRESIGN_EXPIRES = int(os.getenv("PRESIGN_EXPIRES", "900"))
+    PRESIGN_MAX_FILES = int(os.getenv("PRESIGN_MAX_FILES", "20"))
+    MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(30 * 1024 * 1024)))
+
+    # ✅ 직접 업로드된 이미지에서 EXIF/GPS를 읽을 때 가져오는 앞부분 크기 (JPEG APP1은 최대 64KB)
+    EXIF_HEADER_BYTES = int(os.getenv("EXIF_HEADER_BYTES", str(128 * 1024)))
+
+    # ✅ 태깅 워커가 AI 서버에 이미지를 넘기는 방식
+    # url: S3 URL만 전달 (기본값, AI 서버가 버킷에서 직접 다운로드)
+    # multipart: 워커가 S3에서 읽은 바이트를 태깅 요청에 첨부 (AI 서버가 버킷에 접근할 수 없을 때)
+    # path: 워커가 S3에서 읽어 AI_SHARED_IMAGE_DIR(AI 서버와 공유하는 볼륨)에 저장 후 경로 전달
+    # (워커는 업로드 바이트를 갖고 있지 않으므로 multipart / path는 S3 GetObject + 재전송이 추가됨)
+    AI_TAGGING_INPUT = os.getenv("AI_TAGGING_INPUT", "url")
+    AI_SHARED_IMAGE_DIR = os.getenv("AI_SHARED_IMAGE_DIR")
+
+    # ✅ 다이어리 하나의 이미지를 동시에 올리는 S3 업로드 스레드 수 (워커 프로세스 전체 공유)
+    S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "8"))
+
+    # ✅ AI 서버 주소 (/ai 라우터 prefix까지, 태깅 / 사진 검색 URL은 여기서 만듦)
+    AI_SERVER_URL = os.getenv("AI_SERVER_URL", "http://192.168.0.16:8001/ai").rstrip("/")
+
+    # ✅ AI 서버 요청 타임아웃 (초): 연결 / 응답 대기 (태깅은 이미지 수에 따라 오래 걸릴 수 있음)
+    AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "5"))
+    AI_READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "120"))
+
+    # ✅ 태깅 워커 (app/workers/tagging_worker.py): 한 번에 꺼낼 작업 수 / 빈 outbox 확인 주기 (초)
+    TAGGING_BATCH_SIZE = int(os.getenv("TAGGING_BATCH_SIZE", "8"))
+    TAGGING_POLL_INTERVAL = float(os.getenv("TAGGING_POLL_INTERVAL", "1"))
+
+    # ✅ 태깅 재시도: 최대 시도 횟수 / 지수 백오프 시작·최대 대기 (초)
+    TAGGING_MAX_ATTEMPTS = int(os.getenv("TAGGING_MAX_ATTEMPTS", "8"))
+    TAGGING_BACKOFF_BASE = float(os.getenv("TAGGING_BACKOFF_BASE", "5"))
+    TAGGING_BACKOFF_MAX = float(os.getenv("TAGGING_BACKOFF_MAX", "600"))
+
 
 settings = Settings()
 
@@ -28,6 +71,40 @@ s3_client = boto3.client(
     aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
     aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
     region_name=settings.AWS_REGION,
+    endpoint_url=settings.S3_ENDPOINT_URL,
+    config=Config(
+        max_pool_connections=settings.S3_UPLOAD_WORKERS,  # ✅ 동시 업로드 수만큼 커넥션 유지
+        signature_version="s3v4",  # ✅ presigned URL 서명 방식 (MinIO / 신규 리전 모두 지원)
+        s3={"addressing_style": "path" if settings.S3_ENDPOINT_URL else "auto"},  # ✅ MinIO는 path 방식
+    ),
+)
+
+S3_PUBLIC_URL = (settings.S3_PUBLIC_URL
+                 or (f"{settings.S3_ENDPOINT_URL.rstrip('/')}/{settings.AWS_S3_BUCKET_NAME}" if settings.S3_ENDPOINT_URL
+                     else f"https://{settings.AWS_S3_BUCKET_NAME}.s3.amazonaws.com")).rstrip("/")
+
+# ✅ AI 서버 엔드포인트 (태깅 / 태깅 시 저장된 CLIP 임베딩으로 사진 검색)
+AI_TAGGING_URL = f"{settings.AI_SERVER_URL}/generate-tags"
+AI_SEARCH_URL = f"{settings.AI_SERVER_URL}/search"
+
+
+def s3_object_url(key: str) -> str:
+    """S3 key → 저장되는 이미지 URL"""
+    return f"{S3_PUBLIC_URL}/{key}"
+
+
+def s3_object_key(url: str) -> str:
+    """이미지 URL → S3 key (다른 주소로 저장된 예전 URL은 마지막 경로만 사용)"""
+    if url.startswith(S3_PUBLIC_URL + "/"):
+        return url[len(S3_PUBLIC_URL) + 1:]
+    return url.rsplit("/", 1)[-1]
+
+# ✅ S3 업로드 전용 스레드 풀 (boto3는 동기 API, 이벤트 루프를 막지 않도록 여기서 실행)
+s3_upload_pool = ThreadPoolExecutor(max_workers=settings.S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload")
+
+# ✅ AI 서버 공용 비동기 HTTP 클라이언트 (커넥션 재사용, 앱 종료 시 닫음)
+ai_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(settings.AI_READ_TIMEOUT, connect=settings.AI_CONNECT_TIMEOUT),
 )
 
 S3_BUCKET = settings.AWS_S3_BUCKET_NAME
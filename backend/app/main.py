@@ -1,8 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import auth, diary, feeling
 from app.database import Base, engine
+from app.core.config import ai_client, s3_upload_pool
+from mindlog_common.log import configure_logging
+from mindlog_common.profiling import PROFILE_HEADER, finish_session, route_key, should_profile, start_session
+from mindlog_common.tracing import SPAN_KIND_SERVER, current_span, set_service_name, span
 
+# ✅ 로그 설정 (LOG_LEVEL / LOG_FORMAT 환경 변수) + trace의 서비스 이름
+configure_logging()
+set_service_name("mindlog-backend")
 
 # ✅ DB 테이블 자동 생성 (개발용, Alembic을 사용할 경우 생략 가능)
 Base.metadata.create_all(bind=engine)
@@ -26,11 +33,45 @@ app.add_middleware(
     allow_headers=["*"],  # 모든 HTTP 헤더 허용
 )
 
+# ✅ 요청 단위 샘플링 프로파일링 (PROFILE_TOKEN 헤더 또는 PROFILE_SAMPLE_RATE로 선택, route별로 저장)
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    if not should_profile(request.headers.get(PROFILE_HEADER)):
+        return await call_next(request)
+    profiler = start_session()
+    if profiler is None:
+        return await call_next(request)
+    try:
+        response = await call_next(request)
+    finally:
+        route = request.scope.get("route")
+        request_span = current_span()
+        finish_session(profiler, route_key(request.method, getattr(route, "path", request.url.path)),
+                       request_span.trace_id if request_span else "")
+    return response
+
+# ✅ 요청 단위 trace (클라이언트가 보낸 traceparent가 있으면 이어받음, 응답에 trace id 포함)
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with span(f"{request.method} {request.url.path}", kind=SPAN_KIND_SERVER,
+              traceparent=request.headers.get("traceparent"),
+              **{"http.method": request.method, "http.target": request.url.path}) as request_span:
+        response = await call_next(request)
+        request_span.set(**{"http.status_code": response.status_code})
+        response.headers["X-Trace-Id"] = request_span.trace_id
+        return response
+
 # ✅ 라우터 등록 (API 엔드포인트 설정)
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(diary.router, tags=["Diary"])
 app.include_router(feeling.router)
 
+# ✅ 종료 시 공용 클라이언트 정리 (AI 서버 커넥션 / S3 업로드 스레드)
+@app.on_event("shutdown")
+async def close_clients():
+    await ai_client.aclose()
+    s3_upload_pool.shutdown(wait=False)
+
 # ✅ 기본 엔드포인트
 
 
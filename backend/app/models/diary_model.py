@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, TIMESTAMP, Text, Float
+from sqlalchemy import Column, String, ForeignKey, TIMESTAMP, Text, Float, Integer, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -17,6 +17,8 @@ class Diary(Base):
     emotions = Column(String, nullable=True)  # 감정(emotions) 컬럼 추가
     # server_default 수정
     created_at = Column(TIMESTAMP, server_default=func.now())
+    # ✅ AI 태깅 상태 ("pending": 태깅 대기 중, "done": 완료, "failed": 재시도 횟수 초과)
+    tagging_status = Column(String, nullable=False, server_default="done")
 
     # 다이어리 -> 이미지 관계
     images = relationship("Image", back_populates="diary",
@@ -51,9 +53,19 @@ class Tag(Base):
     __tablename__ = "tag"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    tag_name = Column(String, nullable=False,
-                      unique=True)  # 컬럼명을 tag_name으로 유지
+    tag_name = Column(String, nullable=False)  # 컬럼명을 tag_name으로 유지
     type = Column(String, nullable=False)  # 태그 타입 ("인물", "장소", "지역")
+    # ✅ 인물 태그의 소유자 (AI 서버의 person ID는 사용자별 얼굴 DB 샤드마다 따로 발급됨), 장소/지역 태그는 NULL
+    user_id = Column(UUID(as_uuid=True), ForeignKey(
+        "users.id", ondelete="CASCADE"), nullable=True, index=True)
+
+    __table_args__ = (
+        # 공용 태그는 이름이 전역에서 유일, 인물 태그는 사용자 안에서만 유일
+        Index("uq_tag_tag_name_shared", "tag_name", unique=True,
+              postgresql_where=user_id.is_(None)),
+        Index("uq_tag_user_id_tag_name", "user_id", "tag_name", unique=True,
+              postgresql_where=user_id.isnot(None)),
+    )
 
 
 class ImageTag(Base):
@@ -67,3 +79,17 @@ class ImageTag(Base):
     # 태그 매핑 관계
     image = relationship("Image", back_populates="tags")
     tag = relationship("Tag")
+
+
+class TaggingOutbox(Base):
+    """다이어리 생성과 같은 트랜잭션에 기록되는 태깅 작업 (tagging_worker가 꺼내서 처리)"""
+    __tablename__ = "tagging_outbox"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    diary_id = Column(UUID(as_uuid=True), ForeignKey(
+        "diary.id", ondelete="CASCADE"), nullable=False)
+    payload = Column(JSON, nullable=False)  # AI 서버 요청 본문 (user_id + 이미지 메타데이터)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(TIMESTAMP, nullable=False, server_default=func.now(), index=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, server_default=func.now())
@@ -1,24 +1,53 @@
+import os
 import uuid
-import requests
+import asyncio
+import contextvars
+import hashlib
+import httpx
 import io
+import re
+import time
 import piexif
-from PIL import Image as PILImage, ExifTags
+from PIL import Image as PILImage, UnidentifiedImageError
+from pillow_heif import register_heif_opener
+from botocore.exceptions import ClientError
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.database import get_db
-from app.models.diary_model import Diary, Image, Tag, ImageTag
-from app.schemas.diary_schema import DiaryResponse, TagResponse, ImageResponse, PlaceResponse
+from app.models.diary_model import Diary, Image, Tag, ImageTag, TaggingOutbox
+from app.schemas.diary_schema import (DiaryResponse, TagResponse, ImageResponse, PlaceResponse,
+                                      PresignRequest, PresignedUpload, PresignResponse, DiaryFromUploadsCreate)
 from app.routers.auth import get_current_user
-from app.core.config import s3_client, settings  # ✅ S3 클라이언트 임포트
+from app.core.config import (AI_SEARCH_URL, ai_client, s3_client, s3_object_key, s3_object_url, s3_upload_pool,  # ✅ S3 클라이언트 임포트
+                             settings)
+from mindlog_common.log import get_logger
+from mindlog_common.tracing import SPAN_KIND_CLIENT, inject, span
 from datetime import datetime, timedelta, timezone
 from calendar import monthrange
 from fastapi import Query
 from collections import Counter
 
 router = APIRouter(prefix="/diary", tags=["Diary"])
+logger = get_logger(__name__)
 
-AI_SERVER_URL = "http://192.168.0.16:8001/ai/generate-tags"  # ✅ AI 서버 URL
+# ✅ HEIC/HEIF(iPhone 기본 형식)도 PIL로 열 수 있도록 등록
+register_heif_opener()
+
+# ✅ 재인코딩 없이 원본 그대로 저장하는 형식 (MPO: 여러 장이 들어 있는 JPEG, 아이폰/갤럭시 카메라)
+PASSTHROUGH_FORMATS = ("JPEG", "MPO")
+
+# ✅ JPEG가 아닌 형식을 변환할 때 화질
+TRANSCODE_JPEG_QUALITY = int(os.getenv("TRANSCODE_JPEG_QUALITY", "95"))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# ✅ 직접 업로드 key 앞부분 (uploads/{user_id}/..., 다이어리 생성 시 본인 key인지 확인)
+UPLOAD_KEY_PREFIX = "uploads"
+
+# 발급한 key의 파일 이름 형식 ({uuid4}.{확장자}, presign_uploads 참고)
+_UPLOAD_KEY_NAME = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[a-z0-9]{1,5}")
 
 
 def extract_gps_from_exif(image_data):
@@ -56,146 +85,335 @@ def extract_gps_from_exif(image_data):
         return latitude, longitude
 
     except Exception as e:
-        print(f"❌ GPS 데이터 추출 실패: {e}")
+        logger.warning("❌ GPS 데이터 추출 실패: %s", e)
         return None, None
 
 
-def upload_image_to_s3(image: UploadFile, s3_filename: str):
-    """GPS 메타데이터 포함하여 S3 업로드 및 GPS 정보 반환"""
+def _file_size(fileobj) -> int:
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
 
-    # ✅ 이미지 로드
-    image_data = image.file.read()
-    image.file.seek(0)  # 읽기 위치 리셋
-    pil_image = PILImage.open(io.BytesIO(image_data))
 
-    # ✅ GPS 정보 추출
-    latitude, longitude = extract_gps_from_exif(image_data)
+def _sha256_file(fileobj) -> str:
+    """파일 전체를 메모리에 올리지 않고 청크 단위로 해시"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
 
-    # ✅ EXIF 정보 로드
-    try:
-        exif_dict = piexif.load(image_data)
-        exif_bytes = piexif.dump(exif_dict)
-    except Exception:
-        exif_bytes = None
 
-    # ✅ EXIF 정보 유지하면서 JPEG로 변환
+def _transcode_to_jpeg(pil_image, exif: Optional[bytes]) -> io.BytesIO:
+    """JPEG가 아닌 이미지(PNG / HEIC / WebP 등)만 JPEG로 변환 (투명 배경은 흰색으로 합성, EXIF 유지)"""
+    if pil_image.mode in ("RGBA", "LA") or (pil_image.mode == "P" and "transparency" in pil_image.info):
+        rgba = pil_image.convert("RGBA")
+        converted = PILImage.new("RGB", rgba.size, (255, 255, 255))
+        converted.paste(rgba, mask=rgba.getchannel("A"))
+    else:
+        converted = pil_image.convert("RGB")
+
     buffer = io.BytesIO()
-    if exif_bytes:
-        pil_image.save(buffer, format="JPEG", exif=exif_bytes)
+    if exif:
+        converted.save(buffer, format="JPEG", quality=TRANSCODE_JPEG_QUALITY, exif=exif)
     else:
-        pil_image.save(buffer, format="JPEG")
+        converted.save(buffer, format="JPEG", quality=TRANSCODE_JPEG_QUALITY)
     buffer.seek(0)
+    return buffer
 
-    # ✅ S3 업로드
-    s3_client.upload_fileobj(
-        buffer,
-        settings.AWS_S3_BUCKET_NAME,
-        s3_filename,
-        ExtraArgs={"ContentType": "image/jpeg"},
-    )
 
-    return f"https://{settings.AWS_S3_BUCKET_NAME}.s3.amazonaws.com/{s3_filename}", latitude, longitude
+def upload_image_to_s3(image: UploadFile, s3_filename: str) -> dict:
+    """GPS 메타데이터 포함하여 S3 업로드 후 이미지 정보 반환
 
-    """다이어리 생성 API - 이미지의 GPS 정보 저장"""
+    이미지 정보는 AI 서버 태깅 요청의 이미지 메타데이터로 그대로 전달된다
+    (image_url, latitude, longitude, content_hash, width, height).
+    EXIF / GPS / 크기는 헤더만 읽어서 얻고 (픽셀 디코딩 없음), JPEG는 원본 파일을 그대로 스트리밍한다.
+    JPEG가 아닌 형식만 디코딩 후 JPEG로 변환한다.
+    """
+    cpu_start = time.thread_time()
+    source = image.file
+    source_bytes = _file_size(source)
 
+    # ✅ 헤더만 읽기 (PIL은 open 시 픽셀을 디코딩하지 않음)
+    try:
+        pil_image = PILImage.open(source)
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=415, detail=f"지원하지 않는 이미지 형식: {image.filename}")
+    width, height = pil_image.size
+    exif = pil_image.info.get("exif")
+
+    # ✅ GPS 정보 추출 (EXIF 헤더 바이트만 사용)
+    latitude, longitude = extract_gps_from_exif(exif) if exif else (None, None)
+
+    if pil_image.format in PASSTHROUGH_FORMATS:
+        # ✅ 원본 그대로 업로드 (재인코딩 없음 → 화질 / EXIF 그대로)
+        body, transcoded = source, False
+        source.seek(0)
+    else:
+        body, transcoded = _transcode_to_jpeg(pil_image, exif), True
+        s3_filename = f"{os.path.splitext(s3_filename)[0]}.jpg"
+    stored_bytes = _file_size(body)
+
+    # ✅ 저장되는 바이트 기준 해시 (AI 서버의 중복 태깅 확인용)
+    content_hash = _sha256_file(body)
+    cpu_ms = (time.thread_time() - cpu_start) * 1000
+
+    # ✅ S3 업로드 (파일 객체를 그대로 스트리밍)
+    with span("s3_put", kind=SPAN_KIND_CLIENT, bytes=stored_bytes, transcoded=transcoded):
+        s3_client.upload_fileobj(
+            body,
+            settings.AWS_S3_BUCKET_NAME,
+            s3_filename,
+            ExtraArgs={"ContentType": "image/jpeg"},
+        )
 
-@router.post("/", response_model=DiaryResponse, status_code=status.HTTP_201_CREATED)
-async def create_diary(
-    date: str = Form(...),
-    emotions: List[str] = Form(...),
-    text: Optional[str] = Form(None),
-    images: List[UploadFile] = File(...),
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
-):
+    logger.info("📤 %s: %s %s, %d → %d bytes, CPU %.1fms", image.filename, pil_image.format,
+                "→ JPEG 변환" if transcoded else "원본 그대로", source_bytes, stored_bytes, cpu_ms)
 
-    new_diary = Diary(
-        id=uuid.uuid4(),
-        user_id=user.id,
-        date=date,
-        emotions=", ".join(emotions),
-        text=text if text else "",
-    )
-    db.add(new_diary)
-    db.flush()
+    return {
+        "image_url": s3_object_url(s3_filename),
+        "latitude": latitude,
+        "longitude": longitude,
+        "content_hash": content_hash,
+        "width": width,
+        "height": height,
+    }
 
-    uploaded_images = []
 
-    # ✅ 이미지 S3 업로드 (EXIF 유지 & GPS 저장)
-    for image in images:
-        file_extension = image.filename.split(".")[-1]
-        s3_filename = f"{uuid.uuid4()}.{file_extension}"
+def _upload_image(image: UploadFile):
+    """S3 업로드 스레드 풀에서 실행 (헤더 파싱 / 해시 / 필요 시 JPEG 변환 / 업로드 모두 이벤트 루프 밖에서)"""
+    file_extension = image.filename.split(".")[-1]
+    s3_filename = f"{uuid.uuid4()}.{file_extension}"
+    with span("s3_upload", filename=image.filename or ""):
+        return upload_image_to_s3(image, s3_filename)
 
-        s3_url, latitude, longitude = upload_image_to_s3(image, s3_filename)
 
-        # ✅ Image 테이블에 GPS 정보 함께 저장
-        new_image = Image(
-            id=uuid.uuid4(),
-            diary_id=new_diary.id,
-            image_url=s3_url,
-            latitude=latitude,
-            longitude=longitude,
-        )
-        db.add(new_image)
-        uploaded_images.append(new_image)
+def _is_issued_key(key: str, user_id) -> bool:
+    """presign_uploads가 이 사용자에게 발급한 형식의 key인지 (다른 사용자 / 임의 경로 거부)"""
+    prefix = f"{UPLOAD_KEY_PREFIX}/{user_id}/"
+    return key.startswith(prefix) and _UPLOAD_KEY_NAME.fullmatch(key[len(prefix):]) is not None
 
-    db.commit()
-    db.refresh(new_diary)
 
-    # ✅ AI 서버에 이미지 URL 전달하여 태그 요청
+def _delete_uploaded(image_metadata: list):
+    """업로드된 이미지 삭제 (다이어리를 만들지 못했을 때 저장소에 남지 않도록)"""
+    keys = [{"Key": s3_object_key(meta["image_url"])} for meta in image_metadata]
+    if not keys:
+        return
     try:
-        ai_response = requests.post(AI_SERVER_URL, json={"image_urls": [
-                                    img.image_url for img in uploaded_images]})
-        ai_results = ai_response.json().get("results", [])
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI 서버 요청 실패: {str(e)}")
-
-    tags = set()
+        s3_client.delete_objects(Bucket=settings.AWS_S3_BUCKET_NAME, Delete={"Objects": keys, "Quiet": True})
+    except ClientError as e:
+        logger.warning("⚠️ 업로드된 이미지 정리 실패 (%d개): %s", len(keys), e)
 
-    # ✅ AI 서버 응답을 기반으로 태그 매핑
-    for result in ai_results:
-        image_url = result["image_url"]
-        image = next(
-            (img for img in uploaded_images if img.image_url == image_url), None)
 
-        if not image:
-            continue  # 해당 URL의 이미지가 DB에 없으면 스킵
+def inspect_uploaded_image(key: str) -> dict:
+    """직접 업로드된 이미지의 앞부분(EXIF_HEADER_BYTES)만 range로 읽어서 이미지 정보 반환
 
-        for tag_data in result["tags"]:
-            tag = db.query(Tag).filter(
-                Tag.tag_name == tag_data["tag_name"]).first()
-            if not tag:
-                tag = Tag(id=uuid.uuid4(),
-                          type=tag_data["type"], tag_name=tag_data["tag_name"])
-                db.add(tag)
-                db.flush()
+    JPEG는 그대로 두고 (content_hash 없음 → AI 서버가 다운로드하면서 계산),
+    JPEG가 아닌 형식만 전체를 읽어 JPEG로 변환한 뒤 .jpg key로 교체한다.
+    """
+    cpu_start = time.thread_time()
+    bucket = settings.AWS_S3_BUCKET_NAME
+    try:
+        head = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{settings.EXIF_HEADER_BYTES - 1}")
+    except ClientError:
+        raise HTTPException(status_code=400, detail=f"업로드되지 않은 이미지: {key}")
+    header = head["Body"].read()
+    total_bytes = int(head["ContentRange"].rsplit("/", 1)[-1]) if head.get("ContentRange") else len(header)
+    if total_bytes > settings.MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"이미지가 너무 큽니다: {key}")
 
-            new_image_tag = ImageTag(image_id=image.id, tag_id=tag.id)
-            db.add(new_image_tag)
-            tags.add(tag)
+    try:
+        pil_image = PILImage.open(io.BytesIO(header))
+    except (UnidentifiedImageError, OSError):
+        pil_image = None
+    if pil_image is None and total_bytes > len(header):
+        # ✅ EXIF(썸네일 등)가 EXIF_HEADER_BYTES보다 큰 경우만 전체를 읽음
+        header = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        try:
+            pil_image = PILImage.open(io.BytesIO(header))
+        except (UnidentifiedImageError, OSError):
+            pass
+    if pil_image is None:
+        raise HTTPException(status_code=415, detail=f"지원하지 않는 이미지 형식: {key}")
+
+    width, height = pil_image.size
+    exif = pil_image.info.get("exif")
+    latitude, longitude = extract_gps_from_exif(exif) if exif else (None, None)
+
+    content_hash, stored_bytes, transcoded = None, total_bytes, False
+    if pil_image.format not in PASSTHROUGH_FORMATS:
+        data = header if len(header) >= total_bytes else s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        body = _transcode_to_jpeg(PILImage.open(io.BytesIO(data)), exif)
+        stored_bytes, transcoded = _file_size(body), True
+        content_hash = _sha256_file(body)
+        jpeg_key = f"{os.path.splitext(key)[0]}.jpg"
+        with span("s3_put", kind=SPAN_KIND_CLIENT, bytes=stored_bytes, transcoded=True):
+            s3_client.upload_fileobj(body, bucket, jpeg_key, ExtraArgs={"ContentType": "image/jpeg"})
+        if jpeg_key != key:
+            s3_client.delete_object(Bucket=bucket, Key=key)
+        key = jpeg_key
+    cpu_ms = (time.thread_time() - cpu_start) * 1000
+
+    logger.info("📥 %s: %s %s, %d → %d bytes, CPU %.1fms", key, pil_image.format,
+                "→ JPEG 변환" if transcoded else "원본 그대로", total_bytes, stored_bytes, cpu_ms)
+
+    return {
+        "image_url": s3_object_url(key),
+        "latitude": latitude,
+        "longitude": longitude,
+        "content_hash": content_hash,
+        "width": width,
+        "height": height,
+    }
+
+
+def _inspect_upload(key: str) -> dict:
+    """S3 업로드 스레드 풀에서 실행 (range 읽기 / 필요 시 JPEG 변환 모두 이벤트 루프 밖에서)"""
+    with span("s3_inspect", key=key):
+        return inspect_uploaded_image(key)
+
+
+def _save_diary(db: Session, new_diary: Diary, image_metadata: list, user_id: str):
+    """다이어리 + 이미지(GPS 포함) + 태깅 outbox 작업을 한 트랜잭션으로 저장 후 (date, created_at, 이미지 응답 목록) 반환"""
+    images = [
+        Image(
+            id=uuid.uuid4(),
+            diary_id=new_diary.id,
+            image_url=meta["image_url"],
+            latitude=meta["latitude"],
+            longitude=meta["longitude"],
+        )
+        for meta in image_metadata
+    ]
+    # ✅ commit 후 속성을 다시 읽지 않도록 응답 값은 미리 만들어 둠
+    image_rows = [
+        {"id": img.id, "image_url": img.image_url, "latitude": img.latitude, "longitude": img.longitude}
+        for img in images
+    ]
+    db.add(new_diary)
+    db.add_all(images)
+    # ✅ 태깅 작업 기록 (다이어리와 함께 commit되므로 유실되지 않음, tagging_worker가 처리)
+    db.add(TaggingOutbox(
+        id=uuid.uuid4(),
+        diary_id=new_diary.id,
+        payload={"images": image_metadata, "user_id": user_id, **inject()},  # ✅ traceparent: 워커가 이 요청의 trace를 이어감
+    ))
+    with span("db_commit"):
+        db.commit()
+        db.refresh(new_diary)
+    return new_diary.date, new_diary.created_at, image_rows
+
+
+async def _create_diary(db: Session, user, date, emotions: List[str], text: Optional[str],
+                        image_metadata: list) -> DiaryResponse:
+    """이미 저장소에 올라간 이미지 정보로 다이어리 저장 + 태깅 작업 기록 후 응답 (tags: [], tagging_status: "pending")"""
+    new_diary = Diary(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        date=date,
+        emotions=", ".join(emotions),
+        text=text if text else "",
+        tagging_status="pending",
+    )
 
-    db.commit()
+    # ✅ Image 테이블에 GPS 정보 함께 저장 + 태깅 작업 기록
+    diary_date, created_at, image_rows = await run_in_threadpool(
+        _save_diary, db, new_diary, image_metadata, str(user.id))
 
     return DiaryResponse(
         id=new_diary.id,
-        date=new_diary.date,
-        images=[
-            {
-                "id": img.id,
-                "image_url": img.image_url,
-                "latitude": img.latitude,
-                "longitude": img.longitude,
-            }
-            for img in uploaded_images
-        ],
+        date=diary_date,
+        images=image_rows,
         emotions=emotions,
-        text=new_diary.text,
-        tags=[{"id": tag.id, "type": tag.type, "tag_name": tag.tag_name}
-              for tag in tags],
-        created_at=new_diary.created_at,
+        text=text if text else "",
+        tags=[],
+        created_at=created_at,
+        tagging_status="pending",
     )
 
 
+@router.post("/", response_model=DiaryResponse, status_code=status.HTTP_201_CREATED)
+async def create_diary(
+    date: str = Form(...),
+    emotions: List[str] = Form(...),
+    text: Optional[str] = Form(None),
+    images: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """다이어리 생성 API - 이미지의 GPS 정보 저장
+
+    S3 업로드는 s3_upload_pool에서 동시에, DB 작업은 스레드풀에서 처리해서 한 사용자의 다중 이미지
+    업로드가 같은 워커의 다른 요청을 막지 않는다. AI 태깅은 outbox에 기록만 하고 바로 응답하며
+    (tags: [], tagging_status: "pending"), tagging_worker가 태그를 채운 뒤 "done"으로 바꾼다.
+    이미지 바이트를 백엔드를 거치지 않고 올리려면 /diary/uploads + /diary/from-uploads를 사용한다.
+    """
+
+    # ✅ 이미지 S3 업로드 (EXIF 유지 & GPS 저장, 이미지별 동시 업로드, 순서 유지)
+    loop = asyncio.get_running_loop()
+    uploads = await asyncio.gather(*(
+        loop.run_in_executor(s3_upload_pool, contextvars.copy_context().run, _upload_image, image)
+        for image in images
+    ), return_exceptions=True)
+    image_metadata = [upload for upload in uploads if not isinstance(upload, BaseException)]  # AI 서버에 보낼 이미지 정보
+    errors = [upload for upload in uploads if isinstance(upload, BaseException)]
+    if errors:
+        # ✅ 하나라도 실패하면 이미 올라간 이미지는 다이어리 없이 남지 않도록 삭제
+        await loop.run_in_executor(s3_upload_pool, _delete_uploaded, image_metadata)
+        raise errors[0]
+
+    return await _create_diary(db, user, date, emotions, text, image_metadata)
+
+
+@router.post("/uploads", response_model=PresignResponse)
+def presign_uploads(request: PresignRequest, user=Depends(get_current_user)):
+    """직접 업로드용 presigned PUT URL 발급 (클라이언트가 저장소에 바로 올린 뒤 key로 /diary/from-uploads 호출)"""
+    if not 1 <= len(request.files) <= settings.PRESIGN_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"이미지는 1~{settings.PRESIGN_MAX_FILES}개까지 업로드할 수 있습니다.")
+
+    uploads = []
+    for file in request.files:
+        if not file.content_type.startswith("image/"):
+            raise HTTPException(status_code=415, detail=f"지원하지 않는 이미지 형식: {file.content_type}")
+        extension = os.path.splitext(file.filename)[1].lower()
+        if not re.fullmatch(r"\.[a-z0-9]{1,5}", extension):
+            extension = ".jpg"
+        key = f"{UPLOAD_KEY_PREFIX}/{user.id}/{uuid.uuid4()}{extension}"
+        url = s3_client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": settings.AWS_S3_BUCKET_NAME, "Key": key, "ContentType": file.content_type},
+            ExpiresIn=settings.PRESIGN_EXPIRES,
+        )
+        uploads.append(PresignedUpload(key=key, url=url, headers={"Content-Type": file.content_type}))
+
+    return PresignResponse(uploads=uploads, expires_in=settings.PRESIGN_EXPIRES)
+
+
+@router.post("/from-uploads", response_model=DiaryResponse, status_code=status.HTTP_201_CREATED)
+async def create_diary_from_uploads(
+    request: DiaryFromUploadsCreate,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """직접 업로드한 이미지(S3 key)로 다이어리 생성 - 이미지 앞부분만 읽어서 GPS 저장"""
+    image_keys = list(dict.fromkeys(request.image_keys))  # ✅ 같은 key를 여러 번 보내도 이미지 하나 (순서 유지)
+    if not 1 <= len(image_keys) <= settings.PRESIGN_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"이미지는 1~{settings.PRESIGN_MAX_FILES}개까지 업로드할 수 있습니다.")
+    for key in image_keys:
+        if not _is_issued_key(key, user.id):
+            raise HTTPException(status_code=403, detail=f"업로드 권한이 없는 이미지: {key}")
+
+    loop = asyncio.get_running_loop()
+    uploads = await asyncio.gather(*(
+        loop.run_in_executor(s3_upload_pool, contextvars.copy_context().run, _inspect_upload, key)
+        for key in image_keys
+    ))
+
+    return await _create_diary(db, user, request.date, request.emotions, request.text, list(uploads))
+
+
 @router.get("/", response_model=List[DiaryResponse])
 def get_diary_list(
     year: Optional[int] = Query(None),
@@ -254,7 +472,8 @@ def get_diary_list(
             emotions=diary.emotions.split(", ") if diary.emotions else [],
             text=diary.text,
             tags=tags,
-            created_at=diary.created_at
+            created_at=diary.created_at,
+            tagging_status=diary.tagging_status
         ))
 
     return response
@@ -288,7 +507,7 @@ def get_diary_grouped_by_person(db: Session = Depends(get_db), user=Depends(get_
             .all()
         )
 
-        print(f"📌 Diaries for {person_name}: {len(diaries)}")
+        logger.debug("📌 Diaries for %s: %d", person_name, len(diaries))
 
         if diaries:
             thumbnail_url = diaries[0].images[0].image_url if diaries[0].images else None
@@ -426,6 +645,67 @@ def get_diary_by_person(person_name: str, db: Session = Depends(get_db), user=De
     return {"person_name": person_name, "diaries": response}
 
 
+@router.get("/search")
+async def search_diaries(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """자유 텍스트로 사진 검색 후 해당 다이어리 목록 반환 (예: "rainy café", 유사도 높은 순)"""
+    try:
+        with span("ai_search", kind=SPAN_KIND_CLIENT):
+            response = await ai_client.post(AI_SEARCH_URL, json={"user_id": str(user.id), "query": q, "k": limit},
+                                            headers=inject())
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        # ✅ AI 서버가 바쁘거나(429/503) 내려가 있으면 503, 그 밖의 오류 응답은 502
+        if e.response.status_code in (429, 503):
+            raise HTTPException(status_code=503, detail="사진 검색을 잠시 사용할 수 없습니다")
+        raise HTTPException(status_code=502, detail=f"사진 검색 실패: {e}")
+    except (httpx.TimeoutException, httpx.ConnectError) as e:
+        raise HTTPException(status_code=503, detail=f"사진 검색을 잠시 사용할 수 없습니다: {e}")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"사진 검색 실패: {e}")
+    matches = response.json().get("results", [])
+    if not matches:
+        return {"query": q, "diaries": []}
+
+    scores = {match["image_url"]: match["score"] for match in matches}
+    diaries = await run_in_threadpool(_search_results, db, user.id, scores)  # DB 조회는 스레드에서
+    return {"query": q, "diaries": diaries}
+
+
+def _search_results(db: Session, user_id, scores: dict) -> list:
+    """검색된 사진 URL → 사용자의 다이어리 목록 (다이어리별 가장 유사한 사진을 대표로, 유사도 높은 순)"""
+    images = (
+        db.query(Image)
+        .join(Diary, Diary.id == Image.diary_id)
+        .filter(Diary.user_id == user_id, Image.image_url.in_(list(scores)))
+        .all()
+    )
+
+    # ✅ 다이어리별로 가장 유사한 사진을 대표로 사용
+    best = {}
+    for image in images:
+        current = best.get(image.diary_id)
+        if current is None or scores[image.image_url] > scores[current.image_url]:
+            best[image.diary_id] = image
+
+    diaries = []
+    for image in sorted(best.values(), key=lambda image: scores[image.image_url], reverse=True):
+        diary = image.diary
+        diaries.append({
+            "id": str(diary.id),
+            "date": diary.date,
+            "thumbnail_url": image.image_url,
+            "text": diary.text[:100] if diary.text else "",
+            "emotions": diary.emotions.split(", ") if diary.emotions else [],
+            "score": scores[image.image_url],
+        })
+    return diaries
+
+
 @router.get("/{diary_id}", response_model=DiaryResponse)
 def get_diary(diary_id: uuid.UUID, db: Session = Depends(get_db), user=Depends(get_current_user)):
     """UUID 기반 특정 다이어리 조회"""
@@ -457,5 +737,6 @@ def get_diary(diary_id: uuid.UUID, db: Session = Depends(get_db), user=Depends(g
                 tag_name=tag.tag_name
             ) for tag in diary.tags
         ],
-        created_at=diary.created_at
+        created_at=diary.created_at,
+        tagging_status=diary.tagging_status
     )
@@ -29,6 +29,31 @@ class DiaryCreate(BaseModel):
     emotions: List[str]
     text: str
 
+# ✅ 직접 업로드(presigned PUT) URL 발급 요청 스키마
+class PresignFile(BaseModel):
+    filename: str  # 원본 파일 이름 (확장자만 사용)
+    content_type: str = "image/jpeg"  # 업로드할 때 그대로 Content-Type 헤더로 보내야 함
+
+class PresignRequest(BaseModel):
+    files: List[PresignFile]
+
+# ✅ 발급된 업로드 URL (클라이언트가 url로 PUT 후 key를 다이어리 생성에 사용)
+class PresignedUpload(BaseModel):
+    key: str
+    url: str
+    headers: dict  # PUT 요청에 포함해야 하는 헤더
+
+class PresignResponse(BaseModel):
+    uploads: List[PresignedUpload]
+    expires_in: int  # URL 유효 시간 (초)
+
+# ✅ 직접 업로드한 이미지(S3 key)로 다이어리 생성 요청 스키마
+class DiaryFromUploadsCreate(BaseModel):
+    date: datetime
+    emotions: List[str]
+    text: Optional[str] = None
+    image_keys: List[str]
+
 # ✅ 다이어리 응답 스키마 (태그 및 이미지 정보 포함)
 class DiaryResponse(BaseModel):
     id: uuid.UUID
@@ -38,6 +63,7 @@ class DiaryResponse(BaseModel):
     text: Optional[str]
     tags: List[TagResponse]  # 태그 리스트 추가
     created_at: datetime  # 생성 날짜
+    tagging_status: str = "done"  # AI 태깅 상태 (pending / done / failed), pending이면 나중에 다시 조회
 
     class Config:
         orm_mode = True  # SQLAlchemy 모델 변환 지원
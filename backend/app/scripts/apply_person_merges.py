@@ -0,0 +1,66 @@
+"""AI 서버 얼굴 DB 압축에서 병합된 person ID를 백엔드 인물 태그에 반영
+
+AI 서버의 face_compaction CLI가 --id-map-out으로 남긴 JSON Lines 파일을 읽어, 병합되어 사라진 인물 태그의
+이미지 연결을 남은 인물 태그로 옮기고 사라진 태그를 삭제한다.
+user_id가 null인 줄(기존 전역 DB)은 샤드 도입 전에 만들어진 모든 사용자의 인물 태그에 적용된다.
+
+실행 (backend 디렉토리에서):
+    python -m app.scripts.apply_person_merges merges.jsonl
+"""
+import argparse
+import json
+import uuid
+
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.diary_model import ImageTag, Tag
+
+
+def apply_id_map(db: Session, user_id, id_map: dict) -> int:
+    """사용자(None이면 전체)의 인물 태그에 {사라진 ID: 남은 ID} 매핑 적용 → 옮긴 태그 수"""
+    moved = 0
+    for merged_id, target_id in id_map.items():
+        query = db.query(Tag).filter(Tag.type == "인물", Tag.tag_name == merged_id)
+        if user_id is not None:
+            query = query.filter(Tag.user_id == uuid.UUID(str(user_id)))
+
+        for tag in query.all():
+            target = db.query(Tag).filter(
+                Tag.type == "인물", Tag.tag_name == target_id, Tag.user_id == tag.user_id).first()
+            if target is None:  # 남은 인물의 태그가 아직 없으면 이름만 변경
+                tag.tag_name = target_id
+                moved += 1
+                continue
+
+            linked = {row.image_id for row in db.query(ImageTag.image_id).filter(ImageTag.tag_id == target.id)}
+            for image_tag in db.query(ImageTag).filter(ImageTag.tag_id == tag.id).all():
+                if image_tag.image_id not in linked:
+                    db.add(ImageTag(image_id=image_tag.image_id, tag_id=target.id))
+            db.delete(tag)  # image_tag 행은 ondelete CASCADE로 함께 삭제
+            moved += 1
+        db.flush()
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="병합된 person ID를 인물 태그에 반영")
+    parser.add_argument("id_map_file", help="face_compaction --id-map-out 파일 (JSON Lines)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        with open(args.id_map_file, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                moved = apply_id_map(db, entry["user_id"], entry["id_map"])
+                db.commit()  # 줄 단위로 커밋 (다시 실행해도 이미 반영된 매핑은 대상이 없어 건너뜀)
+                print(f"✅ {entry['user_id']}: 인물 태그 {moved}개 반영")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
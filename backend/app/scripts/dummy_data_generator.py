@@ -74,11 +74,12 @@ def create_dummy_data(db: Session, num_diaries=10):
         for tag_type, tag_names in TAGS_BY_TYPE.items():
             if random.random() < 0.7:  # 70% 확률로 해당 타입의 태그 추가
                 tag_name = random.choice(tag_names)
+                tag_owner = user.id if tag_type == "인물" else None  # 인물 태그는 사용자별
                 tag = db.query(Tag).filter(
-                    Tag.tag_name == tag_name, Tag.type == tag_type).first()
+                    Tag.tag_name == tag_name, Tag.type == tag_type, Tag.user_id == tag_owner).first()
                 if not tag:
                     tag = Tag(id=str(uuid.uuid4()),
-                              type=tag_type, tag_name=tag_name)
+                              type=tag_type, tag_name=tag_name, user_id=tag_owner)
                     db.add(tag)
                     db.flush()
 
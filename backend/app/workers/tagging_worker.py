@@ -0,0 +1,233 @@
+"""AI 태깅 outbox 워커
+
+create_diary가 다이어리와 같은 트랜잭션으로 기록한 tagging_outbox 작업을 배치로 꺼내 AI 서버에 태깅을
+요청하고, Tag / ImageTag 저장 + 다이어리 tagging_status "done" 변경 + 작업 삭제를 한 트랜잭션으로 처리한다.
+실패하면 지수 백오프(지터 포함)로 다시 시도하고, TAGGING_MAX_ATTEMPTS번 실패하면 "failed"로 표시한다
+(작업 행은 last_error와 함께 남겨 두므로 attempts를 0으로 되돌리면 다시 처리됨).
+AI 서버에는 bulk 우선순위로 요청하므로 대기열이 가득 차면 429를 받는데, 이때는 시도 횟수를 쓰지 않고
+Retry-After만큼 미룬다.
+
+워커를 여러 개 띄워도 SELECT ... FOR UPDATE SKIP LOCKED로 같은 작업을 동시에 잡지 않고,
+작업을 잡을 때 next_attempt_at을 lease만큼 미뤄 두므로 처리 중 워커가 죽어도 lease가 지나면 다시 처리된다.
+
+실행 (backend 디렉토리에서):
+    python -m app.workers.tagging_worker
+"""
+import asyncio
+import json
+import os
+import random
+import uuid
+from datetime import timedelta
+
+import httpx
+from mindlog_common.log import get_logger
+from mindlog_common.tracing import SPAN_KIND_CLIENT, inject, set_service_name, span
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import AI_TAGGING_URL, ai_client, s3_client, s3_object_key, s3_upload_pool, settings
+from app.database import SessionLocal
+from app.models.diary_model import Diary, Image, ImageTag, Tag, TaggingOutbox
+
+# 처리 중인 작업을 다른 워커가 다시 잡지 않도록 미뤄 두는 시간 (AI 요청 타임아웃보다 길게)
+LEASE_SECONDS = settings.AI_READ_TIMEOUT + 60
+
+logger = get_logger(__name__)
+
+
+async def request_tags(image_metadata: list, image_contents: list, user_id: str) -> list:
+    """AI 서버에 태깅 요청 (settings.AI_TAGGING_INPUT 방식으로 이미지 전달) 후 results 반환"""
+    payload = {
+        "images": image_metadata,  # ✅ 이미 추출한 GPS/해시는 AI 서버에서 다시 계산하지 않음
+        "user_id": user_id,  # ✅ 사용자별 얼굴 DB 샤드 선택
+        "priority": "bulk",  # ✅ 사용자가 기다리는 요청이 아니므로 대화형 요청에 슬롯을 양보
+    }
+
+    # ✅ S3에서 읽은 바이트를 첨부 (AI 서버가 버킷에 접근할 수 없을 때)
+    if settings.AI_TAGGING_INPUT == "multipart":
+        files = [
+            ("files", (meta["image_url"].rsplit("/", 1)[-1], content, "image/jpeg"))
+            for meta, content in zip(image_metadata, image_contents)
+        ]
+        response = await ai_client.post(f"{AI_TAGGING_URL}/upload", data={"metadata": json.dumps(payload)},
+                                        files=files, headers=inject())
+        response.raise_for_status()
+        return response.json().get("results", [])
+
+    # ✅ 공유 볼륨에 저장 후 경로 전달 (같은 호스트 배포용, 요청 후 삭제)
+    if settings.AI_TAGGING_INPUT == "path" and settings.AI_SHARED_IMAGE_DIR:
+        paths = []
+        try:
+            for meta, content in zip(image_metadata, image_contents):
+                path = meta["image_url"].rsplit("/", 1)[-1]
+                with open(os.path.join(settings.AI_SHARED_IMAGE_DIR, path), "wb") as f:
+                    f.write(content)
+                paths.append(path)
+                meta["path"] = path
+            response = await ai_client.post(AI_TAGGING_URL, json=payload, headers=inject())
+            response.raise_for_status()
+            return response.json().get("results", [])
+        finally:
+            for path in paths:
+                os.remove(os.path.join(settings.AI_SHARED_IMAGE_DIR, path))
+
+    response = await ai_client.post(AI_TAGGING_URL, json=payload, headers=inject())
+    response.raise_for_status()
+    return response.json().get("results", [])
+
+
+def _read_from_s3(image_url: str) -> bytes:
+    return s3_client.get_object(Bucket=settings.AWS_S3_BUCKET_NAME, Key=s3_object_key(image_url))["Body"].read()
+
+
+async def tag_job(payload: dict) -> list:
+    """작업 하나 태깅 (기본 url 방식은 URL만 전달, multipart / path 방식이면 S3에서 원본을 먼저 읽음)"""
+    images = payload["images"]
+    contents = []
+    if settings.AI_TAGGING_INPUT == "multipart" or (
+            settings.AI_TAGGING_INPUT == "path" and settings.AI_SHARED_IMAGE_DIR):
+        loop = asyncio.get_running_loop()
+        contents = await asyncio.gather(*(
+            loop.run_in_executor(s3_upload_pool, _read_from_s3, meta["image_url"]) for meta in images
+        ))
+    with span("ai_tagging", kind=SPAN_KIND_CLIENT, images=len(images), input=settings.AI_TAGGING_INPUT):
+        return await request_tags(images, contents, payload["user_id"])
+
+
+def claim_batch(db: Session) -> list:
+    """처리할 작업을 최대 TAGGING_BATCH_SIZE개 잡아서 [(id, diary_id, payload, attempts)] 반환"""
+    jobs = (
+        db.query(TaggingOutbox)
+        .filter(TaggingOutbox.next_attempt_at <= func.now(),
+                TaggingOutbox.attempts < settings.TAGGING_MAX_ATTEMPTS)
+        .order_by(TaggingOutbox.next_attempt_at)
+        .limit(settings.TAGGING_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    claimed = []
+    for job in jobs:
+        job.attempts += 1
+        job.next_attempt_at = func.now() + timedelta(seconds=LEASE_SECONDS)
+        claimed.append((job.id, job.diary_id, job.payload, job.attempts))
+    db.commit()
+    return claimed
+
+
+def save_tags(db: Session, job_id, diary_id, ai_results: list):
+    """AI 서버 응답을 기반으로 태그 매핑 + 다이어리 태깅 완료 + 작업 삭제 (한 트랜잭션)"""
+    image_ids = {
+        image.image_url: image.id
+        for image in db.query(Image).filter(Image.diary_id == diary_id).all()
+    }
+    owner_id = db.query(Diary.user_id).filter(Diary.id == diary_id).scalar()
+    linked = set()
+
+    for result in ai_results:
+        image_id = image_ids.get(result["image_url"])
+        if not image_id:
+            continue  # 해당 URL의 이미지가 DB에 없으면 스킵
+
+        for tag_data in result["tags"]:
+            # ✅ 인물 태그(person_N)는 사용자별 얼굴 DB 샤드에서 발급되므로 사용자마다 따로 저장
+            tag_owner = owner_id if tag_data["type"] == "인물" else None
+            tag = db.query(Tag).filter(
+                Tag.tag_name == tag_data["tag_name"], Tag.user_id == tag_owner).first()
+            if not tag:
+                tag = Tag(id=uuid.uuid4(), type=tag_data["type"],
+                          tag_name=tag_data["tag_name"], user_id=tag_owner)
+                db.add(tag)
+                db.flush()
+
+            if (image_id, tag.id) not in linked:
+                db.add(ImageTag(image_id=image_id, tag_id=tag.id))
+                linked.add((image_id, tag.id))
+
+    db.query(Diary).filter(Diary.id == diary_id).update({"tagging_status": "done"})
+    db.query(TaggingOutbox).filter(TaggingOutbox.id == job_id).delete()
+    db.commit()
+
+
+def _retry_after(error: Exception):
+    """AI 서버가 대기열이 가득 차 거절(429)했으면 Retry-After (초), 아니면 None"""
+    if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+        try:
+            return float(error.response.headers.get("Retry-After", settings.TAGGING_BACKOFF_BASE))
+        except ValueError:
+            return settings.TAGGING_BACKOFF_BASE
+    return None
+
+
+def record_failure(db: Session, job_id, diary_id, attempts: int, error: Exception):
+    """실패 기록: 다음 시도를 백오프만큼 미루거나, 최대 횟수를 넘으면 다이어리를 failed로 표시"""
+    values = {"last_error": f"{type(error).__name__}: {error}"[:2000]}
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        # ✅ 처리 실패가 아니라 AI 서버가 바쁜 것이므로 이번 시도는 세지 않음
+        values["attempts"] = attempts - 1
+        values["next_attempt_at"] = func.now() + timedelta(seconds=retry_after * random.uniform(1.0, 1.5))
+        logger.info("⏳ AI 서버 대기열 가득 참 (diary %s), %.0f초 후 재시도", diary_id, retry_after)
+    elif attempts >= settings.TAGGING_MAX_ATTEMPTS:
+        db.query(Diary).filter(Diary.id == diary_id).update({"tagging_status": "failed"})
+        logger.error("❌ 태깅 포기 (diary %s, %d회 실패): %s", diary_id, attempts, values["last_error"])
+    else:
+        delay = min(settings.TAGGING_BACKOFF_MAX, settings.TAGGING_BACKOFF_BASE * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.0)  # ✅ 지터 (AI 서버 복구 직후 재시도가 한꺼번에 몰리지 않도록)
+        values["next_attempt_at"] = func.now() + timedelta(seconds=delay)
+        logger.warning("⚠️ 태깅 실패 (diary %s, %d회째), %.0f초 후 재시도: %s",
+                       diary_id, attempts, delay, values["last_error"])
+    db.query(TaggingOutbox).filter(TaggingOutbox.id == job_id).update(values, synchronize_session=False)
+    db.commit()
+
+
+async def run_once(db: Session) -> int:
+    """작업 한 배치 처리 (AI 요청은 작업별로 동시에) → 처리한 작업 수"""
+    jobs = claim_batch(db)
+    if not jobs:
+        return 0
+
+    async def run_job(diary_id, payload, attempts):
+        # ✅ 다이어리를 만든 요청의 trace를 이어감
+        with span("tagging_job", traceparent=payload.get("traceparent"), diary_id=str(diary_id),
+                  attempt=attempts):
+            return await tag_job(payload)
+
+    results = await asyncio.gather(
+        *(run_job(diary_id, payload, attempts) for _, diary_id, payload, attempts in jobs),
+        return_exceptions=True,
+    )
+    for (job_id, diary_id, _, attempts), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            record_failure(db, job_id, diary_id, attempts, result)
+            continue
+        try:
+            save_tags(db, job_id, diary_id, result)
+        except Exception as e:
+            db.rollback()  # 예: 다른 워커와 같은 새 태그를 동시에 만들어 unique 충돌
+            record_failure(db, job_id, diary_id, attempts, e)
+    return len(jobs)
+
+
+async def main():
+    set_service_name("mindlog-tagging-worker")
+    logger.info("🚀 태깅 워커 시작 (배치 %d, 입력 방식 %s)", settings.TAGGING_BATCH_SIZE, settings.AI_TAGGING_INPUT)
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                processed = await run_once(db)
+            except Exception as e:
+                db.rollback()
+                logger.error("❌ outbox 처리 실패: %s", e, exc_info=True)
+                processed = 0
+            finally:
+                db.close()
+            if processed < settings.TAGGING_BATCH_SIZE:
+                await asyncio.sleep(settings.TAGGING_POLL_INTERVAL)
+    finally:
+        await ai_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
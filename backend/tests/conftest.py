@@ -0,0 +1,61 @@
+import os
+import uuid
+
+import pytest
+
+# ✅ DB 테스트는 TEST_DATABASE_URL (비어 있는 테스트용 PostgreSQL)이 있을 때만 실행 (테이블을 만들고 지움)
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# app.database가 import 시점에 엔진을 만들므로 앱 모듈보다 먼저 설정
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql://mindlog@localhost/unused"
+os.environ.setdefault("AWS_S3_BUCKET_NAME", "mindlog-test")
+
+
+@pytest.fixture
+def db():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL이 없어 DB 테스트 생략")
+
+    from app.database import Base, SessionLocal, engine
+    from app.models import diary_model, user_model  # noqa: F401 (테이블 등록)
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def make_user(db):
+    from app.models.user_model import User
+
+    def make_user(name="user"):
+        user = User(id=uuid.uuid4(), email=f"{name}-{uuid.uuid4().hex[:8]}@example.com", username=name,
+                    hashed_password="x")
+        db.add(user)
+        db.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def make_diary(db):
+    from datetime import datetime
+
+    from app.models.diary_model import Diary, Image
+
+    def make_diary(user, image_urls=(), tagging_status="pending"):
+        diary = Diary(id=uuid.uuid4(), user_id=user.id, date=datetime(2025, 3, 1), text="오늘",
+                      emotions="기쁨", tagging_status=tagging_status)
+        db.add(diary)
+        for url in image_urls:
+            db.add(Image(id=uuid.uuid4(), diary_id=diary.id, image_url=url))
+        db.commit()
+        return diary
+
+    return make_diary
@@ -0,0 +1,38 @@
+import uuid
+
+from app.models.diary_model import Image, ImageTag, Tag
+from app.scripts.apply_person_merges import apply_id_map
+
+
+def _tag_images(db, diary, tag_names, user):
+    image_id = db.query(Image.id).filter(Image.diary_id == diary.id).scalar()
+    for tag_name in tag_names:
+        tag = db.query(Tag).filter(Tag.tag_name == tag_name, Tag.user_id == user.id).first()
+        if tag is None:
+            tag = Tag(id=uuid.uuid4(), type="인물", tag_name=tag_name, user_id=user.id)
+            db.add(tag)
+            db.flush()
+        db.add(ImageTag(image_id=image_id, tag_id=tag.id))
+    db.commit()
+    return image_id
+
+
+def _names(db, image_id):
+    return sorted(tag.tag_name for tag in db.query(Tag).join(ImageTag).filter(ImageTag.image_id == image_id))
+
+
+def test_merged_tags_are_moved_to_the_surviving_person(db, make_user, make_diary):
+    alice, bob = make_user("alice"), make_user("bob")
+    first = _tag_images(db, make_diary(alice, ["https://bucket/1.jpg"]), ["person_2"], alice)
+    both = _tag_images(db, make_diary(alice, ["https://bucket/2.jpg"]), ["person_2", "person_5"], alice)
+    only_merged = _tag_images(db, make_diary(alice, ["https://bucket/3.jpg"]), ["person_5", "person_7"], alice)
+    other_user = _tag_images(db, make_diary(bob, ["https://bucket/4.jpg"]), ["person_5"], bob)
+
+    assert apply_id_map(db, str(alice.id), {"person_5": "person_2", "person_7": "person_3"}) == 2
+    db.commit()
+
+    assert _names(db, first) == ["person_2"]
+    assert _names(db, both) == ["person_2"]
+    assert _names(db, only_merged) == ["person_2", "person_3"]
+    assert _names(db, other_user) == ["person_5"]  # 다른 사용자의 샤드는 그대로
+    assert db.query(Tag).filter(Tag.user_id == alice.id, Tag.tag_name == "person_5").count() == 0
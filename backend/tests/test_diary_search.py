@@ -0,0 +1,69 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.routers import diary
+
+
+def _ai_server(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(diary, "ai_client", client)
+    return client
+
+
+def _search(db, user, q="rainy café"):
+    return asyncio.run(diary.search_diaries(q=q, limit=20, db=db, user=user))
+
+
+@pytest.mark.parametrize("handler, status_code", [
+    (lambda request: httpx.Response(500), 502),
+    (lambda request: httpx.Response(503), 503),
+    (lambda request: httpx.Response(429, headers={"Retry-After": "5"}), 503),
+])
+def test_search_maps_ai_server_errors(monkeypatch, handler, status_code):
+    _ai_server(monkeypatch, handler)
+
+    with pytest.raises(HTTPException) as error:
+        _search(db=None, user=SimpleNamespace(id=uuid.uuid4()))
+
+    assert error.value.status_code == status_code
+
+
+def test_search_returns_503_when_the_ai_server_times_out(monkeypatch):
+    def handler(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    _ai_server(monkeypatch, handler)
+
+    with pytest.raises(HTTPException) as error:
+        _search(db=None, user=SimpleNamespace(id=uuid.uuid4()))
+
+    assert error.value.status_code == 503
+
+
+def test_search_returns_the_best_match_per_diary(db, make_user, make_diary, monkeypatch):
+    user, other = make_user("alice"), make_user("bob")
+    first = make_diary(user, ["https://bucket/a1.jpg", "https://bucket/a2.jpg"])
+    second = make_diary(user, ["https://bucket/b.jpg"])
+    make_diary(other, ["https://bucket/c.jpg"])
+    received = []
+
+    def handler(request):
+        received.append(request)
+        return httpx.Response(200, json={"results": [{"image_url": "https://bucket/c.jpg", "score": 0.95},
+                                                     {"image_url": "https://bucket/b.jpg", "score": 0.9},
+                                                     {"image_url": "https://bucket/a1.jpg", "score": 0.5},
+                                                     {"image_url": "https://bucket/a2.jpg", "score": 0.7}]})
+
+    _ai_server(monkeypatch, handler)
+
+    result = _search(db, user)
+
+    # 다른 사용자의 사진은 제외, 다이어리별 가장 유사한 사진이 대표
+    assert [(item["id"], item["thumbnail_url"]) for item in result["diaries"]] == [
+        (str(second.id), "https://bucket/b.jpg"), (str(first.id), "https://bucket/a2.jpg")]
+    assert received[0].url == diary.AI_SEARCH_URL
@@ -0,0 +1,91 @@
+import asyncio
+import io
+import uuid
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image as PILImage
+
+from app.core.config import settings
+from app.routers import diary
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    moto = pytest.importorskip("moto")
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=settings.AWS_S3_BUCKET_NAME)
+        monkeypatch.setattr(diary, "s3_client", client)
+        yield client
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (32, 24), (200, 120, 40)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _keys(s3) -> list:
+    return [item["Key"] for item in s3.list_objects_v2(Bucket=settings.AWS_S3_BUCKET_NAME).get("Contents", [])]
+
+
+def test_failed_upload_removes_already_uploaded_images(s3):
+    images = [UploadFile(io.BytesIO(_jpeg()), filename="a.jpg"),
+              UploadFile(io.BytesIO(b"not an image"), filename="b.jpg"),
+              UploadFile(io.BytesIO(_jpeg()), filename="c.jpg")]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(diary.create_diary(date="2025-03-01", emotions=["기쁨"], text=None, images=images,
+                                       db=None, user=SimpleNamespace(id=uuid.uuid4())))
+
+    assert error.value.status_code == 415
+    assert _keys(s3) == []
+
+
+def _from_uploads(image_keys, user_id):
+    from app.schemas.diary_schema import DiaryFromUploadsCreate
+
+    request = DiaryFromUploadsCreate(date="2025-03-01", emotions=["기쁨"], image_keys=image_keys)
+    return asyncio.run(diary.create_diary_from_uploads(request, db=None, user=SimpleNamespace(id=user_id)))
+
+
+@pytest.mark.parametrize("key", [
+    "uploads/{other}/0b7c1c7e-2f4a-4d0e-9a51-3f1f0f8c2d11.jpg",  # 다른 사용자
+    "uploads/{user}/../{other}/0b7c1c7e-2f4a-4d0e-9a51-3f1f0f8c2d11.jpg",
+    "uploads/{user}/profile.jpg",  # 발급하지 않은 이름
+    "uploads/{user}/nested/0b7c1c7e-2f4a-4d0e-9a51-3f1f0f8c2d11.jpg",
+])
+def test_from_uploads_rejects_keys_not_issued_to_the_user(key, monkeypatch):
+    monkeypatch.setattr(diary, "_inspect_upload", lambda key: pytest.fail("S3를 읽기 전에 거부해야 함"))
+    user_id, other = uuid.uuid4(), uuid.uuid4()
+
+    with pytest.raises(HTTPException) as error:
+        _from_uploads([key.format(user=user_id, other=other)], user_id)
+
+    assert error.value.status_code == 403
+
+
+def test_from_uploads_dedupes_keys(monkeypatch):
+    user_id = uuid.uuid4()
+    first, second = (f"uploads/{user_id}/{uuid.uuid4()}.jpg" for _ in range(2))
+    inspected, saved = [], []
+
+    def inspect(key):
+        inspected.append(key)
+        return {"image_url": key}
+
+    async def create(db, user, date, emotions, text, image_metadata):
+        saved.extend(image_metadata)
+
+    monkeypatch.setattr(diary, "_inspect_upload", inspect)
+    monkeypatch.setattr(diary, "_create_diary", create)
+
+    _from_uploads([first, second, first], user_id)
+
+    assert sorted(inspected) == sorted([first, second])
+    assert saved == [{"image_url": first}, {"image_url": second}]
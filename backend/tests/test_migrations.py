@@ -0,0 +1,52 @@
+import importlib.util
+import os
+import uuid
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from app.models.diary_model import Image, ImageTag, Tag
+
+VERSIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic", "versions")
+
+
+def _migration(name: str):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(VERSIONS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run(db, step):
+    connection = db.connection()
+    with Operations.context(MigrationContext.configure(connection)):
+        step()
+    db.commit()
+
+
+def test_person_tags_are_split_per_user(db, make_user, make_diary):
+    migration = _migration("e2d5f8a3b6c1_scope_person_tags_per_user")
+    _run(db, migration.downgrade)  # 분리 전 스키마 (tag_name 전역 유일)
+
+    alice, bob = make_user("alice"), make_user("bob")
+    diaries = {user: make_diary(user, [f"https://bucket/{user.username}.jpg"]) for user in (alice, bob)}
+    person, place, orphan = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    db.execute(sa.text("INSERT INTO tag (id, tag_name, type) VALUES (:p, 'person_1', '인물'), "
+                       "(:c, '카페', '장소'), (:o, 'person_9', '인물')"), {"p": person, "c": place, "o": orphan})
+    for diary in diaries.values():
+        image_id = db.query(Image.id).filter(Image.diary_id == diary.id).scalar()
+        db.execute(sa.text("INSERT INTO image_tag (image_id, tag_id) VALUES (:i, :p), (:i, :c)"),
+                   {"i": image_id, "p": person, "c": place})
+    db.commit()
+
+    _run(db, migration.upgrade)
+
+    people = db.query(Tag).filter(Tag.type == "인물").all()
+    assert sorted(tag.user_id for tag in people) == sorted([alice.id, bob.id])
+    assert {tag.tag_name for tag in people} == {"person_1"}
+    assert db.query(Tag).filter(Tag.id == place).one().user_id is None
+    for user, diary in diaries.items():
+        image_id = db.query(Image.id).filter(Image.diary_id == diary.id).scalar()
+        tag_ids = {row.tag_id for row in db.query(ImageTag).filter(ImageTag.image_id == image_id)}
+        assert {tag.id for tag in people if tag.user_id == user.id} < tag_ids
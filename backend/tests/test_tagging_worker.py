@@ -0,0 +1,150 @@
+import uuid
+
+from sqlalchemy import func
+
+from app.models.diary_model import Diary, ImageTag, Tag, TaggingOutbox
+from app.workers import tagging_worker
+
+
+def _job(db, diary, payload=None):
+    job = TaggingOutbox(id=uuid.uuid4(), diary_id=diary.id, payload=payload or {"images": [], "user_id": "u"})
+    db.add(job)
+    db.commit()
+    return job
+
+
+def test_save_tags_scopes_person_tags_per_user(db, make_user, make_diary):
+    alice, bob = make_user("alice"), make_user("bob")
+    results = {
+        "alice": [{"image_url": "https://bucket/a.jpg",
+                   "tags": [{"type": "인물", "tag_name": "person_1"}, {"type": "장소", "tag_name": "카페"}]}],
+        "bob": [{"image_url": "https://bucket/b.jpg",
+                 "tags": [{"type": "인물", "tag_name": "person_1"}, {"type": "장소", "tag_name": "카페"}]}],
+    }
+    for user, url in ((alice, "https://bucket/a.jpg"), (bob, "https://bucket/b.jpg")):
+        diary = make_diary(user, [url])
+        tagging_worker.save_tags(db, _job(db, diary).id, diary.id, results[user.username])
+
+    people = db.query(Tag).filter(Tag.type == "인물").all()
+    assert sorted(tag.user_id for tag in people) == sorted([alice.id, bob.id])
+    assert db.query(Tag).filter(Tag.type == "장소").one().user_id is None
+    assert db.query(ImageTag).count() == 4
+    assert db.query(Diary).filter(Diary.tagging_status == "done").count() == 2
+    assert db.query(TaggingOutbox).count() == 0
+
+
+def test_request_tags_asks_for_bulk_priority(monkeypatch):
+    import asyncio
+    import json
+
+    import httpx
+
+    sent = []
+
+    def handler(request):
+        sent.append(json.loads(request.content))
+        return httpx.Response(200, json={"results": []})
+
+    monkeypatch.setattr(tagging_worker.settings, "AI_TAGGING_INPUT", "url")
+    monkeypatch.setattr(tagging_worker, "ai_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    asyncio.run(tagging_worker.request_tags([{"image_url": "https://bucket/a.jpg"}], [], "alice"))
+
+    assert sent[0]["priority"] == "bulk"
+
+
+def test_queue_full_response_defers_without_using_an_attempt(db, make_user, make_diary):
+    import httpx
+
+    diary = make_diary(make_user())
+    job = _job(db, diary)
+    request = httpx.Request("POST", "http://ai/generate-tags")
+    error = httpx.HTTPStatusError("429", request=request,
+                                  response=httpx.Response(429, headers={"Retry-After": "30"}, request=request))
+
+    tagging_worker.record_failure(db, job.id, diary.id, tagging_worker.settings.TAGGING_MAX_ATTEMPTS, error)
+
+    db.expire_all()
+    job = db.query(TaggingOutbox).one()
+    assert job.attempts == tagging_worker.settings.TAGGING_MAX_ATTEMPTS - 1
+    assert db.query(Diary).one().tagging_status == "pending"
+    lag = db.query(TaggingOutbox.next_attempt_at - func.now()).scalar()
+    assert 29 <= lag.total_seconds() <= 46
+
+
+def test_claim_batch_leases_jobs_and_skips_locked_rows(db, make_user, make_diary):
+    from app.database import SessionLocal
+
+    user = make_user()
+    locked, free = _job(db, make_diary(user)), _job(db, make_diary(user))
+
+    # 다른 워커가 처리 중인 작업 (행 잠금을 잡고 있음)
+    other = SessionLocal()
+    try:
+        other.query(TaggingOutbox).filter(TaggingOutbox.id == locked.id).with_for_update().one()
+        claimed = tagging_worker.claim_batch(db)
+    finally:
+        other.rollback()
+        other.close()
+
+    assert [(job_id, attempts) for job_id, _, _, attempts in claimed] == [(free.id, 1)]
+    lease = db.query(TaggingOutbox.next_attempt_at - func.now()).filter(TaggingOutbox.id == free.id).scalar()
+    assert lease.total_seconds() > tagging_worker.LEASE_SECONDS - 5
+
+    # lease 중인 작업은 다시 잡지 않음
+    assert [job_id for job_id, _, _, _ in tagging_worker.claim_batch(db)] == [locked.id]
+    assert tagging_worker.claim_batch(db) == []
+
+
+def test_run_once_retries_failed_job_until_it_succeeds(db, make_user, make_diary, monkeypatch):
+    import asyncio
+
+    import httpx
+
+    url = "https://bucket/a.jpg"
+    diary = make_diary(make_user(), [url])
+    _job(db, diary, {"images": [{"image_url": url}], "user_id": "u"})
+    responses = [httpx.Response(503),
+                 httpx.Response(200, json={"results": [{"image_url": url,
+                                                        "tags": [{"type": "장소", "tag_name": "카페"}]}]})]
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return responses.pop(0)
+
+    monkeypatch.setattr(tagging_worker.settings, "AI_TAGGING_INPUT", "url")
+    monkeypatch.setattr(tagging_worker, "ai_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    assert asyncio.run(tagging_worker.run_once(db)) == 1
+    db.expire_all()
+    job = db.query(TaggingOutbox).one()
+    assert job.attempts == 1 and job.last_error.startswith("HTTPStatusError")
+    assert asyncio.run(tagging_worker.run_once(db)) == 0  # 백오프 중
+
+    db.query(TaggingOutbox).update({"next_attempt_at": func.now()}, synchronize_session=False)
+    db.commit()
+    assert asyncio.run(tagging_worker.run_once(db)) == 1
+
+    db.expire_all()
+    assert db.query(TaggingOutbox).count() == 0
+    assert db.query(Diary).one().tagging_status == "done"
+    assert db.query(ImageTag).count() == 1
+    assert [str(request.url) for request in sent] == [tagging_worker.AI_TAGGING_URL] * 2
+
+
+def test_url_input_does_not_read_from_s3(monkeypatch):
+    import asyncio
+
+    import httpx
+
+    class ExplodingS3:
+        def get_object(self, **kwargs):
+            raise AssertionError("url 방식에서는 S3에서 다시 읽지 않아야 함")
+
+    monkeypatch.setattr(tagging_worker, "s3_client", ExplodingS3())
+    monkeypatch.setattr(tagging_worker, "ai_client", httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"results": []}))))
+
+    assert tagging_worker.settings.AI_TAGGING_INPUT == "url"
+    assert asyncio.run(tagging_worker.tag_job({"images": [{"image_url": "https://bucket/a.jpg"}], "user_id": "u"})) == []
@@ -0,0 +1 @@
+"""MindLog 백엔드 / AI 서버 공용 로깅, 요청 trace, 샘플링 프로파일러"""
@@ -0,0 +1,68 @@
+import itertools
+import json
+import logging
+import os
+import time
+
+# ✅ 로그 레벨 (DEBUG / INFO / WARNING / ERROR)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# ✅ 로그 형식 (text: 사람이 읽는 한 줄 / json: 수집기용 구조화 로그)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# ✅ 내부 루프 debug 로그 샘플링 주기 (N번에 1번만 기록)
+DEBUG_SAMPLE_EVERY = int(os.getenv("LOG_DEBUG_SAMPLE_EVERY", "100"))
+
+# LogRecord 기본 속성 (나머지는 extra={...}로 넘긴 구조화 필드)
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """🔹 한 줄 JSON (extra로 넘긴 필드 포함)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """🔹 루트 로거 설정 (이미 핸들러가 있으면 레벨만 맞춤)"""
+    root = logging.getLogger()
+    root.setLevel(level)
+    if root.handlers:
+        return
+
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s [%(levelname)s] %(name)s: %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+        ))
+    root.addHandler(handler)
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(name)
+
+
+class Sampler:
+    """🔹 내부 루프용 debug 로그 (DEBUG가 꺼져 있으면 레벨 확인 1번, 켜져 있어도 every번에 1번만 기록)"""
+
+    def __init__(self, logger: logging.Logger, every: int = DEBUG_SAMPLE_EVERY):
+        self.logger = logger
+        self.every = max(1, every)
+        self._count = itertools.count()
+
+    def debug(self, msg: str, *args, **kwargs):
+        if self.logger.isEnabledFor(logging.DEBUG) and next(self._count) % self.every == 0:
+            self.logger.debug(msg, *args, **kwargs)
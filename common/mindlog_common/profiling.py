@@ -0,0 +1,170 @@
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from mindlog_common.log import get_logger
+
+# ✅ 프로파일링 결과 저장 위치 (route별 파일)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# ✅ 프로파일링 요청 헤더 / 토큰 (토큰이 비어 있으면 헤더로는 켤 수 없음)
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
+# ✅ 헤더 없이 무작위로 프로파일링할 요청 비율 (0이면 끔)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+
+# ✅ 스택 샘플링 주기 (초, 기본 100Hz)
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+
+# ✅ 저장 형식: collapsed (flamegraph.pl / speedscope에서 열 수 있는 접힌 스택, route별 누적) / speedscope (요청별 JSON)
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "collapsed")
+
+# 프로파일러 자신과 내보내기 스레드는 샘플에서 제외
+_IGNORED_THREADS = {"request-profiler", "trace-exporter"}
+
+# 맨 위 프레임이 여기서 멈춰 있으면 유휴 스레드 (이벤트 루프 대기 / 스레드풀 대기)
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+logger = get_logger(__name__)
+
+# 한 번에 한 요청만 프로파일링 (동시에 여러 개를 켜면 샘플이 섞이고 오버헤드가 늘어남)
+_session_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """🔹 sys._current_frames()로 주기적으로 스택을 떠서 (스택 → 샘플 수)로 모으는 프로파일러
+
+    프로세스의 모든 스레드를 샘플링하므로 (이벤트 루프 + 스레드풀), 프로파일링 중 동시에
+    처리된 다른 요청의 스택이 섞일 수 있다. 유휴 스레드는 제외한다.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()  # (root → leaf 프레임 튜플) → 샘플 수
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or names.get(ident) in _IGNORED_THREADS:
+                    continue
+                if os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                self.samples[tuple(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """🔹 접힌 스택 형식 ("root;...;leaf 샘플수" 한 줄씩)"""
+        return "".join(
+            ";".join(_frame_label(frame) for frame in stack) + f" {count}\n"
+            for stack, count in self.samples.items()
+        )
+
+    def speedscope(self, name: str) -> dict:
+        """🔹 speedscope 파일 형식 (sampled 프로파일, 가중치 = 샘플 수 × 주기)"""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(round(count * self.interval, 6))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "mindlog",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+def _frame_label(frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def route_key(method: str, route: str) -> str:
+    """🔹 "POST /ai/generate-tags/{x}" → 파일 이름으로 쓸 수 있는 키"""
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", f"{method} {route}").strip("_")
+
+
+def should_profile(header_value: Optional[str]) -> bool:
+    """🔹 프로파일링 헤더(토큰 일치) 또는 PROFILE_SAMPLE_RATE 비율로 선택"""
+    if PROFILE_TOKEN and header_value and hmac.compare_digest(header_value, PROFILE_TOKEN):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def start_session() -> Optional[SamplingProfiler]:
+    """🔹 프로파일러 시작 (이미 다른 요청을 프로파일링 중이면 None)"""
+    if not _session_lock.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler()
+    profiler.start()
+    return profiler
+
+
+def finish_session(profiler: SamplingProfiler, key: str, trace_id: str = "") -> Optional[str]:
+    """🔹 프로파일러 종료 후 route별 파일에 저장 → 저장 경로"""
+    try:
+        profiler.stop()
+    finally:
+        _session_lock.release()
+    if not profiler.samples:
+        return None
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    try:
+        if PROFILE_FORMAT == "speedscope":
+            name = f"{key}-{time.strftime('%Y%m%dT%H%M%S')}-{trace_id or os.urandom(4).hex()}"
+            path = os.path.join(PROFILE_DIR, f"{name}.speedscope.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(profiler.speedscope(name), f)
+        else:
+            path = os.path.join(PROFILE_DIR, f"{key}.collapsed")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(profiler.collapsed())
+    except OSError as e:
+        logger.warning("⚠️ 프로파일 저장 실패: %s", e)
+        return None
+
+    logger.info("🔥 프로파일 저장: %s (%.0fms, 샘플 %d개)", path, profiler.duration * 1000,
+                sum(profiler.samples.values()))
+    return path
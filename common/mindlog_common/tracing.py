@@ -0,0 +1,202 @@
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+import requests
+
+from mindlog_common.log import get_logger
+
+# ✅ span 내보내기: "" (끔, trace id 전파만) / file (OTLP JSON Lines 파일) / otlp (OTLP/HTTP JSON 수집기)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+
+# ✅ file 내보내기 경로 (한 줄 = OTLP ExportTraceServiceRequest JSON, collector otlpjsonfile 수신기로 읽을 수 있음)
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+# ✅ otlp 내보내기 주소 (OpenTelemetry Collector / Jaeger / Tempo의 OTLP HTTP 수신기)
+OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+
+# ✅ 서비스 이름 (span resource의 service.name, 기본값은 각 서비스가 set_service_name으로 지정)
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "mindlog")
+
+# ✅ 새로 시작하는 trace의 샘플링 비율 (상위 서비스가 보낸 traceparent가 있으면 그 결정을 따름)
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+# ✅ 내보내기 주기 (초) / 한 번에 내보낼 최대 span 수
+EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "2"))
+EXPORT_BATCH = int(os.getenv("TRACE_EXPORT_BATCH", "256"))
+
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+
+logger = get_logger(__name__)
+
+_current: ContextVar[Optional["Span"]] = ContextVar("mindlog_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "sampled", "attributes",
+                 "start_ns", "end_ns", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[dict] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def traceparent(self) -> str:
+        """🔹 W3C Trace Context 헤더 값"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def parse_traceparent(header: Optional[str]):
+    """🔹 traceparent → (trace_id, parent span_id, sampled) (형식이 틀리면 None)"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3][:2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class _Exporter:
+    """🔹 종료된 span을 모아 주기적으로 OTLP JSON으로 내보내는 백그라운드 스레드"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self._queue = queue.Queue(maxsize=10 * EXPORT_BATCH)
+        self._dropped = 0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self._dropped += 1  # 수집기가 느리면 요청을 막지 않고 버림
+
+    def _run(self):
+        while True:
+            time.sleep(EXPORT_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        while True:
+            spans = []
+            while len(spans) < EXPORT_BATCH:
+                try:
+                    spans.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not spans:
+                return
+            try:
+                self._write(spans)
+            except Exception as e:
+                logger.warning("⚠️ trace 내보내기 실패 (%d개 span): %s", len(spans), e)
+
+    def _write(self, spans):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "mindlog"}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+        if self.mode == "file":
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        else:
+            requests.post(OTLP_ENDPOINT, json=payload, timeout=5).raise_for_status()
+
+
+_exporter = _Exporter(TRACE_EXPORT) if TRACE_EXPORT in ("file", "otlp") else None
+
+
+def set_service_name(default: str):
+    """🔹 서비스 이름 기본값 지정 (TRACE_SERVICE_NAME 환경 변수가 있으면 그 값을 유지)"""
+    global SERVICE_NAME
+    SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", default)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, traceparent: Optional[str] = None, **attributes):
+    """🔹 현재 span의 자식 span (traceparent를 주면 상위 서비스의 trace를 이어감, 없으면 새 trace)"""
+    parent = _current.get()
+    remote = parse_traceparent(traceparent) if parent is None else None
+    if parent is not None:
+        trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+    elif remote is not None:
+        trace_id, parent_id, sampled = remote
+    else:
+        trace_id, parent_id, sampled = os.urandom(16).hex(), None, random.random() < SAMPLE_RATE
+
+    current = Span(name, trace_id, parent_id, sampled, kind, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        if current.sampled and _exporter is not None:
+            _exporter.submit(current)
+
+
+def inject(headers: Optional[dict] = None) -> dict:
+    """🔹 나가는 요청 헤더에 현재 trace 전파 (traceparent)"""
+    headers = dict(headers or {})
+    current = _current.get()
+    if current is not None:
+        headers["traceparent"] = current.traceparent
+    return headers